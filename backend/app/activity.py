@@ -0,0 +1,150 @@
+"""
+Nhật ký hoạt động: các thao tác ghi (tạo/sửa/sửa điểm/xóa học sinh) được ghi lại để hiển thị trên dashboard.
+
+- record() không chặn request: sự kiện vào ring buffer trong bộ nhớ (đọc bởi GET /activities)
+  và hàng đợi; một thread nền gom theo lô rồi INSERT vào bảng activities của tenant.
+- Hàng đợi đầy (ACTIVITY_QUEUE_SIZE) thì bỏ sự kiện và đếm vào `dropped`, không làm chậm API.
+- Bảng được cắt bớt, chỉ giữ ACTIVITY_MAX_ROWS dòng mới nhất.
+- Ghi qua engine (không qua Session) nên không làm tăng data_version/vô hiệu cache.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+from sqlalchemy import delete, func, insert, select
+
+from . import models
+from .db import engine_for
+
+log = logging.getLogger(__name__)
+
+ACTIVITY_RING_SIZE = int(os.getenv("ACTIVITY_RING_SIZE", "200"))
+ACTIVITY_QUEUE_SIZE = int(os.getenv("ACTIVITY_QUEUE_SIZE", "10000"))
+ACTIVITY_BATCH_SIZE = int(os.getenv("ACTIVITY_BATCH_SIZE", "200"))
+ACTIVITY_FLUSH_SECONDS = float(os.getenv("ACTIVITY_FLUSH_SECONDS", "0.5"))
+ACTIVITY_MAX_ROWS = int(os.getenv("ACTIVITY_MAX_ROWS", "10000"))
+PRUNE_EVERY = 500  # số dòng chèn thêm giữa hai lần cắt bảng
+MAX_RING_TENANTS = 256
+
+
+class ActivityLog:
+    """Ring buffer theo tenant + hàng đợi ghi lô vào bảng activities"""
+
+    def __init__(self, ring_size: int, queue_size: int, batch_size: int, flush_seconds: float, max_rows: int):
+        self.ring_size = ring_size
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_rows = max_rows
+        self._rings = OrderedDict()  # tenant -> deque sự kiện (mới nhất ở cuối)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(queue_size)
+        self._thread = None
+        self._since_prune = {}
+        self.dropped = 0
+        self.written = 0
+
+    def _ring(self, tenant):
+        """Ring của tenant; lần đầu nạp các dòng mới nhất từ DB (một truy vấn/tenant/process)"""
+        with self._lock:
+            ring = self._rings.get(tenant)
+            if ring is not None:
+                self._rings.move_to_end(tenant)
+                return ring
+        A = models.Activity
+        with engine_for(tenant).connect() as conn:
+            rows = conn.execute(select(A.ts, A.action, A.student_id, A.student_code, A.details)
+                                .order_by(A.id.desc()).limit(self.ring_size)).all()
+        loaded = deque((_event(*r[:4], json.loads(r[4]) if r[4] else None) for r in reversed(rows)),
+                       maxlen=self.ring_size)
+        with self._lock:
+            ring = self._rings.setdefault(tenant, loaded)
+            while len(self._rings) > MAX_RING_TENANTS:
+                self._rings.popitem(last=False)
+            return ring
+
+    def record(self, tenant, action: str, student_id=None, student_code=None, details=None):
+        event = _event(time.time(), action, student_id, student_code, details)
+        ring = self._ring(tenant)
+        with self._lock:
+            ring.append(event)
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((tenant, event))
+        except queue.Full:
+            self.dropped += 1
+
+    def latest(self, tenant, limit: int) -> list:
+        ring = self._ring(tenant)
+        with self._lock:
+            items = list(ring)[-limit:]
+        return items[::-1]
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="activity-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def flush(self):
+        """Ghi ngay các sự kiện còn trong hàng đợi (dùng khi tắt server/đo benchmark)"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch):
+        by_tenant = {}
+        for tenant, event in batch:
+            row = dict(event, details=json.dumps(event["details"], ensure_ascii=False,
+                                                 separators=(",", ":")) if event["details"] else None)
+            by_tenant.setdefault(tenant, []).append(row)
+        A = models.Activity
+        for tenant, rows in by_tenant.items():
+            try:
+                with engine_for(tenant).begin() as conn:
+                    conn.execute(insert(A), rows)
+                    n = self._since_prune.get(tenant, 0) + len(rows)
+                    if n >= PRUNE_EVERY:
+                        max_id = conn.execute(select(func.max(A.id))).scalar()
+                        conn.execute(delete(A).where(A.id <= max_id - self.max_rows))
+                        n = 0
+                    self._since_prune[tenant] = n
+                self.written += len(rows)
+            except Exception:
+                log.exception("Failed to write %d activities for tenant %r", len(rows), tenant)
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "written": self.written, "dropped": self.dropped,
+                "tenants_in_memory": len(self._rings)}
+
+
+def _event(ts, action, student_id, student_code, details) -> dict:
+    return {"ts": ts, "action": action, "student_id": student_id,
+            "student_code": student_code, "details": details}
+
+
+activities = ActivityLog(ACTIVITY_RING_SIZE, ACTIVITY_QUEUE_SIZE, ACTIVITY_BATCH_SIZE,
+                         ACTIVITY_FLUSH_SECONDS, ACTIVITY_MAX_ROWS)
+atexit.register(activities.flush)
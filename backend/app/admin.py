@@ -0,0 +1,23 @@
+"""
+Quyền admin cho các endpoint vận hành (/admin/...) và các chế độ debug bật theo header.
+
+Admin khi header `X-Admin-Token` khớp biến môi trường ADMIN_TOKEN.
+Không đặt ADMIN_TOKEN thì mọi chức năng admin bị tắt (403).
+"""
+
+import hmac
+import os
+
+from fastapi import Header, HTTPException
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+ADMIN_HEADER = "X-Admin-Token"
+
+
+def is_admin(token) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def require_admin(x_admin_token: str | None = Header(None)):
+    if not is_admin(x_admin_token):
+        raise HTTPException(403, "Admin token required")
@@ -0,0 +1,200 @@
+"""
+Analytics backend tùy chọn dùng DuckDB cho các truy vấn tổng hợp (thống kê, xếp hạng quê quán).
+
+Bật bằng biến môi trường:
+    ANALYTICS_BACKEND=duckdb
+    ANALYTICS_DUCKDB_MODE=attach|copy   (mặc định attach, tự rơi về copy nếu thiếu sqlite_scanner)
+    ANALYTICS_REFRESH_SECONDS=30        (chu kỳ làm mới bản sao cột ở chế độ copy)
+
+Khi không bật (hoặc chưa cài duckdb) các hàm dưới đây chạy cùng câu SQL trên SQLite.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .db import engine
+
+log = logging.getLogger(__name__)
+
+ANALYTICS_BACKEND = os.getenv("ANALYTICS_BACKEND", "sqlite").lower()
+DUCKDB_MODE = os.getenv("ANALYTICS_DUCKDB_MODE", "attach").lower()
+REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", "30"))
+
+# Điểm hợp lệ (0-10), dùng chung cho SQLite và DuckDB
+_VALID = "CASE WHEN {c} BETWEEN 0 AND 10 THEN {c} END"
+_M, _L, _E = (_VALID.format(c=c) for c in ("math_score", "literature_score", "english_score"))
+_N_VALID = " + ".join(f"(CASE WHEN {c} IS NULL THEN 0 ELSE 1 END)" for c in (_M, _L, _E))
+_OVERALL = (f"(COALESCE({_M}, 0) + COALESCE({_L}, 0) + COALESCE({_E}, 0)) * 1.0"
+            f" / NULLIF({_N_VALID}, 0)")
+
+STATISTICS_SQL = f"""
+SELECT COUNT(*), AVG({_M}), AVG({_L}), AVG({_E}), AVG({_OVERALL})
+FROM {{table}}
+"""
+
+HOMETOWN_SQL = f"""
+SELECT home_town, COUNT(*) AS total, AVG({_M}) AS avg_math, AVG({_L}) AS avg_literature,
+       AVG({_E}) AS avg_english, AVG({_OVERALL}) AS avg_overall
+FROM {{table}}
+WHERE home_town IS NOT NULL
+GROUP BY home_town
+"""
+
+HOMETOWN_ORDER = {
+    "math": "avg_math", "literature": "avg_literature",
+    "english": "avg_english", "overall": "avg_overall", "total": "total",
+}
+
+
+class DuckDBEngine:
+    """Kết nối DuckDB đọc students.db (attach read-only hoặc bản sao cột làm mới định kỳ)"""
+
+    def __init__(self, sqlite_path: str, mode: str = "attach", refresh_seconds: float = 30):
+        import duckdb
+
+        self.sqlite_path = sqlite_path
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._con = duckdb.connect()
+        self._loaded_at = 0.0
+        self._loaded_sig = None
+        self._refreshing = False
+        self.mode = mode
+        if mode == "attach":
+            try:
+                self._con.execute(f"ATTACH '{sqlite_path}' AS src (TYPE sqlite, READ_ONLY)")
+                self.table = "src.students"
+                return
+            except Exception as e:  # extension sqlite_scanner không tải được
+                log.warning("DuckDB sqlite_scanner unavailable (%s), falling back to columnar copy", e)
+                self.mode = "copy"
+        self.table = "students"
+        self._refresh()
+
+    def _signature(self):
+        sig = []
+        for suffix in ("", "-wal"):
+            try:
+                st = os.stat(self.sqlite_path + suffix)
+                sig.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                sig.append(None)
+        return tuple(sig)
+
+    def _refresh(self):
+        """Chế độ copy: nạp bảng cột mới vào students_staging rồi đổi chỗ với students trong một giao dịch"""
+        now, sig = time.monotonic(), self._signature()
+        import pandas as pd
+
+        src = sqlite3.connect(f"file:{self.sqlite_path}?mode=ro", uri=True)
+        try:
+            df = pd.read_sql_query(
+                "SELECT id, home_town, dob, math_score, literature_score, english_score FROM students", src)
+        finally:
+            src.close()
+        cur = self._con.cursor()
+        try:
+            cur.register("students_src", df)
+            cur.execute("CREATE OR REPLACE TABLE students_staging AS SELECT * FROM students_src")
+            cur.unregister("students_src")
+            # query đang chạy vẫn đọc snapshot cũ (MVCC); query mới thấy bảng mới sau COMMIT
+            cur.execute("BEGIN TRANSACTION")
+            cur.execute("DROP TABLE IF EXISTS students")
+            cur.execute("ALTER TABLE students_staging RENAME TO students")
+            cur.execute("COMMIT")
+        finally:
+            cur.close()
+        with self._lock:
+            self._loaded_at, self._loaded_sig = now, sig
+
+    def _refresh_async(self):
+        try:
+            self._refresh()
+        except Exception:
+            log.exception("DuckDB background refresh failed; keeping previous snapshot")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _maybe_refresh(self):
+        """Gọi khi giữ _lock: quá hạn và file đổi thì làm mới ở luồng nền, trong lúc đó phục vụ snapshot cũ"""
+        now = time.monotonic()
+        if self._refreshing or now - self._loaded_at < self.refresh_seconds:
+            return
+        if self._signature() == self._loaded_sig:
+            self._loaded_at = now
+            return
+        self._refreshing = True
+        threading.Thread(target=self._refresh_async, name="duckdb-refresh", daemon=True).start()
+
+    def query(self, sql: str):
+        with self._lock:
+            if self.mode == "copy":
+                self._maybe_refresh()
+            cur = self._con.cursor()
+        try:
+            return cur.execute(sql.format(table=self.table)).fetchall()
+        finally:
+            cur.close()
+
+
+_duck: Optional[DuckDBEngine] = None
+_duck_lock = threading.Lock()
+
+
+def duckdb_engine() -> Optional[DuckDBEngine]:
+    """Trả về DuckDBEngine dùng chung nếu đã bật và cài duckdb, ngược lại None"""
+    global _duck
+    if ANALYTICS_BACKEND != "duckdb":
+        return None
+    if _duck is None:
+        with _duck_lock:
+            if _duck is None:
+                try:
+                    _duck = DuckDBEngine(engine.url.database, DUCKDB_MODE, REFRESH_SECONDS)
+                except ImportError:
+                    log.warning("ANALYTICS_BACKEND=duckdb but duckdb is not installed; using SQLite")
+                    return None
+    return _duck
+
+
+def _run(db: Session, sql: str):
+    duck = duckdb_engine()
+    # DuckDB chỉ đọc students.db mặc định; tenant khác chạy trên SQLite của tenant
+    if duck is not None and db.get_bind() is engine:
+        return duck.query(sql)
+    return db.execute(text(sql.format(table="students"))).fetchall()
+
+
+def students_statistics(db: Session) -> dict:
+    total, avg_m, avg_l, avg_e, avg_all = _run(db, STATISTICS_SQL)[0]
+    return {
+        "total_students": int(total or 0),
+        "avg_math_score": round(avg_m or 0.0, 2),
+        "avg_literature_score": round(avg_l or 0.0, 2),
+        "avg_english_score": round(avg_e or 0.0, 2),
+        "avg_overall_score": round(avg_all or 0.0, 2),
+    }
+
+
+def hometown_statistics(db: Session, order_by: str = "overall", descending: bool = True) -> list:
+    col = HOMETOWN_ORDER.get(order_by, "avg_overall")
+    sql = HOMETOWN_SQL + f" ORDER BY {col} {'DESC' if descending else 'ASC'} NULLS LAST, home_town"
+    return [
+        {
+            "home_town": r[0],
+            "total_students": int(r[1]),
+            "avg_math_score": round(r[2] or 0.0, 2),
+            "avg_literature_score": round(r[3] or 0.0, 2),
+            "avg_english_score": round(r[4] or 0.0, 2),
+            "avg_overall_score": round(r[5] or 0.0, 2),
+        }
+        for r in _run(db, sql)
+    ]
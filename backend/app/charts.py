@@ -0,0 +1,162 @@
+"""
+Vẽ biểu đồ theo yêu cầu (GET /charts/{name}.png) từ dữ liệu hiện tại thay cho data/*.png tĩnh.
+
+- Mỗi nhóm biểu đồ (hometown, age, top_bottom) được vẽ một lần cho mỗi data_version trong
+  process pool riêng (Agg), bằng chính các hàm trong scripts/ (xem jobs.render_analysis).
+- Kích thước khác (width/height) được thu nhỏ từ ảnh gốc bằng Pillow, giữ tỉ lệ.
+- Cache hai tầng: bộ nhớ (TTLCache) và đĩa CHART_CACHE_DIR/{boot}/{tenant}/v{version}/;
+  khi có version mới thì xóa thư mục version cũ của tenant đó.
+- ETag là hash nội dung PNG nên vẫn đúng khi restart hoặc chạy nhiều worker.
+"""
+
+import hashlib
+import io
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .cache import TTLCache
+from .jobs import init_worker, render_analysis
+
+CHART_CACHE_DIR = os.getenv("CHART_CACHE_DIR", "./chart_cache")
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+CHART_MEMORY_ENTRIES = int(os.getenv("CHART_MEMORY_ENTRIES", "128"))
+CHART_RENDER_TIMEOUT = float(os.getenv("CHART_RENDER_TIMEOUT", "60"))
+STALE_BOOT_SECONDS = 24 * 3600
+
+# Tên biểu đồ -> nhóm phân tích sinh ra nó
+CHARTS = {
+    "avg_math_eng_lit_by_hometown": "hometown",
+    "rank_home_town_by_english_avg": "hometown",
+    "rank_home_town_by_literature_avg": "hometown",
+    "rank_home_town_by_math_avg": "hometown",
+    "scores_by_age_groups": "age",
+    "score_trend_by_age": "age",
+    "score_distribution_by_age": "age",
+    "top_bottom_students_comparison": "top_bottom",
+    "top_bottom_radar_chart": "top_bottom",
+}
+
+
+def render_group(db_path: str, group: str, tmp_dir: str, group_dir: str):
+    """Chạy trong process con: vẽ vào tmp_dir rồi đổi tên thành group_dir (nguyên tử)"""
+    render_analysis(db_path, group, tmp_dir)
+    try:
+        os.rename(tmp_dir, group_dir)
+    except OSError:
+        if not os.path.isdir(group_dir):  # process khác đã vẽ xong trước thì dùng bản đó
+            raise
+
+
+class ChartRenderer:
+    """Cache biểu đồ theo (tenant, chart, kích thước, data_version), vẽ lại trong process pool"""
+
+    def __init__(self, cache_dir: str, workers: int, memory_entries: int):
+        self.root = cache_dir
+        self.dir = os.path.join(cache_dir, f"{int(time.time())}-{uuid.uuid4().hex[:8]}")
+        self.workers = workers
+        self.memory = TTLCache(memory_entries, ttl=3600)  # key -> (etag, png)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._rendering = {}  # (tenant, group, version) -> Future (single-flight)
+        self.renders = 0
+
+    def _executor(self):
+        if self._pool is None:
+            self._cleanup_stale_boots()
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=init_worker)
+        return self._pool
+
+    def _submit(self, fn, *args):
+        try:
+            return self._executor().submit(fn, *args)
+        except BrokenProcessPool:
+            # Worker chết đột ngột (OOM, bị kill) làm hỏng cả pool: bỏ pool cũ, tạo lại và thử một lần nữa
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            return self._executor().submit(fn, *args)
+
+    def _cleanup_stale_boots(self):
+        """Xóa cache của các lần chạy trước (data_version bắt đầu lại từ 0 sau restart)"""
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if path != self.dir and time.time() - os.path.getmtime(path) > STALE_BOOT_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _render_group(self, db_path: str, tenant, group: str, version: int) -> str:
+        """Đảm bảo thư mục chứa ảnh gốc của nhóm biểu đồ tồn tại cho version này"""
+        tenant_dir = os.path.join(self.dir, tenant or "_default")
+        group_dir = os.path.join(tenant_dir, f"v{version}", group)
+        if os.path.isdir(group_dir):
+            return group_dir
+        key = (tenant, group, version)
+        with self._lock:
+            if os.path.isdir(group_dir):
+                return group_dir
+            future = self._rendering.get(key)
+            owner = future is None
+            if owner:
+                tmp_dir = f"{group_dir}.tmp-{uuid.uuid4().hex[:8]}"
+                os.makedirs(tmp_dir)
+                future = self._submit(render_group, db_path, group, tmp_dir, group_dir)
+                self._rendering[key] = future
+        try:
+            future.result(timeout=CHART_RENDER_TIMEOUT)
+            if owner:
+                self.renders += 1
+                for name in os.listdir(tenant_dir):
+                    if name != f"v{version}":
+                        shutil.rmtree(os.path.join(tenant_dir, name), ignore_errors=True)
+        finally:
+            if owner:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                with self._lock:
+                    self._rendering.pop(key, None)
+        return group_dir
+
+    def get(self, db_path: str, tenant, name: str, width, height, version: int):
+        """Trả về (etag, png bytes)"""
+        key = (tenant, name, width, height, version)
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry
+        group_dir = self._render_group(db_path, tenant, CHARTS[name], version)
+        full_path = os.path.join(group_dir, f"{name}.png")
+        if width or height:
+            path = os.path.join(group_dir, f"{name}_{width or 0}x{height or 0}.png")
+            if not os.path.exists(path):
+                _resize(full_path, path, width, height)
+        else:
+            path = full_path
+        with open(path, "rb") as f:
+            png = f.read()
+        entry = (f'"{hashlib.sha1(png).hexdigest()}"', png)
+        self.memory.set(key, entry)
+        return entry
+
+
+def _resize(src: str, dst: str, width, height):
+    """Thu nhỏ/phóng to giữ tỉ lệ để vừa khung width x height (thiếu một chiều thì theo chiều còn lại)"""
+    from PIL import Image
+
+    with Image.open(src) as im:
+        w, h = im.size
+        ratio = min(r for r in (width and width / w, height and height / h) if r)
+        size = (max(1, round(w * ratio)), max(1, round(h * ratio)))
+        buf = io.BytesIO()
+        im.resize(size, Image.Resampling.LANCZOS).save(buf, "PNG", optimize=True)
+    tmp = f"{dst}.{uuid.uuid4().hex[:8]}"
+    with open(tmp, "wb") as f:
+        f.write(buf.getvalue())
+    os.replace(tmp, dst)
+
+
+renderer = ChartRenderer(CHART_CACHE_DIR, CHART_WORKERS, CHART_MEMORY_ENTRIES)
@@ -1,47 +1,404 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from . import models, schemas
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import or_, case, func, update
+from sqlalchemy.exc import IntegrityError
+from . import models, schemas, search as search_index
+from .activity import activities
+from .writer import writes
 
-def list_students(db: Session, skip=0, limit=100, search: str | None = None):
-    q = db.query(models.Student)
+# Các cột được phép chọn qua tham số fields=
+STUDENT_FIELDS = tuple(c.key for c in models.Student.__table__.columns)
+
+def parse_fields(fields: str | None):
+    """'student_code,math_score' -> ['student_code', 'math_score']; None nếu không chọn cột"""
+    if not fields:
+        return None
+    names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in names if f not in STUDENT_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return names or None
+
+def _select(db: Session, fields: list[str] | None):
+    """Query toàn bộ entity, hoặc chỉ các cột được chọn (SELECT hẹp, trả về Row)"""
+    if fields:
+        return db.query(*(getattr(models.Student, f) for f in fields))
+    return db.query(models.Student)
+
+def parse_sort(sort: str | None):
+    """'home_town,-math_score' -> [(cột, desc?)]; dấu '-' là giảm dần"""
+    if not sort:
+        return []
+    keys = []
+    for part in sort.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        desc = part.startswith("-")
+        name = part.lstrip("+-")
+        if name not in STUDENT_FIELDS:
+            raise ValueError(f"unknown sort field: {name}")
+        keys.append((name, desc))
+    return keys
+
+# tham số lọc -> (cột, toán tử)
+_FILTER_OPS = {
+    "home_town": ("home_town", "eq"),
+    "min_math": ("math_score", "ge"), "max_math": ("math_score", "le"),
+    "min_literature": ("literature_score", "ge"), "max_literature": ("literature_score", "le"),
+    "min_english": ("english_score", "ge"), "max_english": ("english_score", "le"),
+    "born_after": ("dob", "ge"), "born_before": ("dob", "le"),
+    "class_id": ("class_id", "eq"),
+}
+
+def _apply_search(q, search: str):
+    """-> (query, cột điểm xếp hạng); index trigram (search.py). Không dùng được index thì ILIKE theo đúng các token
+    của index (điểm None): mã/email chứa khóa (từ tên: bắt đầu bằng khóa), hoặc họ/tên chứa nguyên văn token"""
+    ranked = search_index.ranked(q.session, search)
+    if ranked is not None:
+        return q.join(ranked, ranked.c.student_id == models.Student.id), ranked.c.score
+    S = models.Student
+    for raw, key, word in search_index.tokens(search) or [(search, search, None)]:
+        key = f"{'%' if word is None else ''}{search_index.like_escape(key)}%"
+        raw = f"%{search_index.like_escape(raw)}%"
+        q = q.filter(or_(S.student_code.ilike(key, escape="\\"), S.email.ilike(key, escape="\\"),
+                         S.first_name.ilike(raw, escape="\\"), S.last_name.ilike(raw, escape="\\")))
+    return q, None
+
+def apply_filters(q, search: str | None = None, filters: schemas.StudentFilter | None = None):
+    """Áp dụng search và bộ lọc cột vào query"""
+    if search:
+        q, _ = _apply_search(q, search)
+    if filters:
+        for name, value in filters.dict(exclude_none=True).items():
+            column, op = _FILTER_OPS[name]
+            col = getattr(models.Student, column)
+            q = q.filter(col == value if op == "eq" else col >= value if op == "ge" else col <= value)
+    return q
+
+def list_students(db: Session, skip=0, limit=100, search: str | None = None, fields: list[str] | None = None,
+                  filters: schemas.StudentFilter | None = None, sort: list[tuple[str, bool]] | None = None):
+    q, score = _apply_search(_select(db, fields), search) if search else (_select(db, fields), None)
+    q = apply_filters(q, None, filters)
+    if sort:
+        q = q.order_by(*(getattr(models.Student, name).desc() if desc else getattr(models.Student, name)
+                         for name, desc in sort))
+        # Giữ thứ tự ổn định giữa các trang
+        q = q.order_by(models.Student.id)
+    elif score is not None:
+        q = q.order_by(score.desc(), models.Student.id)  # giống nhất trước
+    return q.offset(skip).limit(limit).all()
+
+SUGGEST_FIELDS = ("id", "student_code", "first_name", "last_name", "email")
+
+def suggest_students(db: Session, q: str, limit: int = 10) -> list[dict]:
+    """Gợi ý theo tiền tố: mã học sinh, họ tên (bỏ dấu, từng từ), email; mỗi nguồn một range scan có LIMIT"""
+    q = q.strip()
+    if not q:
+        return []
+    S = models.Student
+    cols = [getattr(S, f) for f in SUGGEST_FIELDS]
+    found = {}
+
+    def add(rows, match):
+        for r in rows:
+            if len(found) < limit:
+                found.setdefault(r.id, dict(r._asdict(), match=match))
+
+    def by_prefix(col):
+        key = col.collate("NOCASE")  # index ix_students_*_nocase
+        return db.query(*cols).filter(key >= q, key < q + "\uffff").order_by(key).limit(limit).all()
+
+    def by_name():
+        """Họ (từ đầu của q; cả q khớp tiền tố họ tên) hoặc tên bắt đầu bằng q, không bỏ dấu"""
+        last, first = S.last_name.collate("NOCASE"), S.first_name.collate("NOCASE")
+        word = q.split()[0]
+        rows = db.query(*cols).filter(last >= word, last < word + "\uffff")
+        if not single:
+            full = (S.last_name + " " + S.first_name).collate("NOCASE")
+            rows = rows.filter(full >= q, full < q + "\uffff")
+        return rows.order_by(last).limit(limit).all() + \
+            db.query(*cols).filter(first >= q, first < q + "\uffff").order_by(first).limit(limit).all()
+
+    single = " " not in q
+    if single:
+        add(by_prefix(S.student_code), "student_code")
+    if len(found) < limit and not any(c.isdigit() or c == "@" for c in q):
+        ids = search_index.prefix_matches(db, q, limit)
+        dirty = search_index.pending(db)
+        if dirty:  # nạp hàng loạt/ghi ngoài API chưa đồng bộ: bỏ postings cũ, bổ sung bằng range scan họ/tên
+            stale = search_index.stale(db, ids)
+            ids = [i for i in ids if i not in stale]
+        rows = {r.id: r for r in db.query(*cols).filter(S.id.in_(ids))} if ids else {}
+        add((rows[i] for i in ids if i in rows), "name")
+        if dirty and len(found) < limit:
+            add(by_name(), "name")
+    if len(found) < limit and single:
+        add(by_prefix(S.email), "email")
+    return list(found.values())
+
+def _class_search(q, search: str | None):
+    """Tìm lớp theo mã, tên hoặc GVCN (ILIKE)"""
     if search:
         like = f"%{search}%"
-        q = q.filter(or_(
-            models.Student.student_code.ilike(like),
-            models.Student.first_name.ilike(like),
-            models.Student.last_name.ilike(like),
-            models.Student.email.ilike(like),
-        ))
-    return q.offset(skip).all()
-
-def get_student(db: Session, id: int):
+        C = models.Class
+        q = q.filter(or_(C.code.ilike(like), C.name.ilike(like), C.homeroom_teacher.ilike(like)))
+    return q
+
+def _class_stats(db: Session):
+    """Lớp + số học sinh + điểm TB từng môn: một LEFT JOIN ... GROUP BY"""
+    C, S = models.Class, models.Student
+    return (db.query(C, func.count(S.id), func.avg(S.math_score), func.avg(S.literature_score),
+                     func.avg(S.english_score))
+            .outerjoin(S, S.class_id == C.id).group_by(C.id))
+
+def _class_row(c, n, math, literature, english, roster: bool):
+    row = {k: getattr(c, k) for k in ("id", "code", "name", "homeroom_teacher", "room", "schedule")}
+    row.update(student_count=n, avg_math=_round(math), avg_literature=_round(literature),
+               avg_english=_round(english))
+    if roster:
+        row["students"] = c.students
+    return row
+
+def _round(v):
+    return round(v, 2) if v is not None else None
+
+def list_classes(db: Session, search: str | None = None, skip: int = 0, limit: int = 100, roster: bool = False):
+    """Danh sách lớp kèm tổng hợp; roster=True nạp học sinh cả trang bằng một SELECT ... IN (selectinload)"""
+    q = _class_search(_class_stats(db), search).order_by(models.Class.code).offset(skip).limit(limit)
+    if roster:
+        q = q.options(selectinload(models.Class.students))
+    return [_class_row(*r, roster) for r in q]
+
+def get_class(db: Session, id: int, roster: bool = True):
+    q = _class_stats(db).filter(models.Class.id == id)
+    if roster:
+        q = q.options(selectinload(models.Class.students))
+    r = q.first()
+    return _class_row(*r, roster) if r else None
+
+def create_class(db: Session, data: schemas.ClassIn):
+    obj = _write(db, lambda w: _add(w, models.Class(**data.dict())))
+    return get_class(db, obj.id, roster=False)
+
+def update_class(db: Session, id: int, data: schemas.ClassIn):
+    n = _write(db, lambda w: w.query(models.Class).filter(models.Class.id == id)
+               .update(data.dict(), synchronize_session=False))
+    return get_class(db, id, roster=False) if n else None
+
+def delete_class(db: Session, id: int):
+    """Xóa lớp; học sinh của lớp thành chưa xếp lớp (ON DELETE SET NULL)"""
+    n = _write(db, lambda w: w.query(models.Class).filter(models.Class.id == id).delete(synchronize_session=False))
+    return n > 0
+
+# Học lực theo GPA (giống GradesManagementView._evaluate_academic_performance)
+NO_SCORE_BAND = "Chưa có điểm"
+PERFORMANCE_BANDS = ((9.0, "Giỏi"), (7.0, "Khá"), (6.0, "Trung bình"))
+LOW_BAND = "Yếu"
+UNKNOWN_AGE = "Không rõ"
+
+def _years_ago(today: date, years: int) -> date:
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:  # 29/02
+        return today.replace(year=today.year - years, day=28)
+
+def student_facets(db: Session, search: str | None = None, filters: schemas.StudentFilter | None = None,
+                   today: date | None = None):
+    """Đếm theo quê quán, học lực và nhóm tuổi trong một lần GROUP BY trên tập đã lọc"""
+    S = models.Student
+    today = today or date.today()
+    gpa = (func.coalesce(S.math_score, 0) + func.coalesce(S.literature_score, 0)
+           + func.coalesce(S.english_score, 0)) / 3.0
+    band = case((gpa <= 0, NO_SCORE_BAND), *((gpa >= t, name) for t, name in PERFORMANCE_BANDS),
+                else_=LOW_BAND)
+    # Nhóm tuổi như scripts/analyze_by_age.py: 16-17, 18-19, 20+; dưới 16 tuổi tách riêng
+    age_group = case((S.dob.is_(None), UNKNOWN_AGE),
+                     (S.dob > _years_ago(today, 16), "<16"),
+                     (S.dob > _years_ago(today, 18), "16-17"),
+                     (S.dob > _years_ago(today, 20), "18-19"),
+                     else_="20+")
+    q = db.query(S.home_town, band.label("band"), age_group.label("age_group"), func.count())
+    q = apply_filters(q, search, filters).group_by(S.home_town, "band", "age_group")
+
+    total = 0
+    counts = {"home_town": {}, "performance": {}, "age_group": {}}
+    for home_town, band_name, age_name, n in q:
+        total += n
+        for facet, value in (("home_town", home_town), ("performance", band_name), ("age_group", age_name)):
+            counts[facet][value] = counts[facet].get(value, 0) + n
+    result = {"total": total}
+    for facet, values in counts.items():
+        result[facet] = [{"value": v, "count": c}
+                         for v, c in sorted(values.items(), key=lambda kv: (-kv[1], str(kv[0])))]
+    return result
+
+# Lịch sử điểm (bảng grade_events, ghi bằng trigger - xem models.GradeEvent)
+EPOCH = date(1970, 1, 1)
+
+def _ts(d: date) -> int:
+    return int(datetime(d.year, d.month, d.day, tzinfo=timezone.utc).timestamp())
+
+def _event_range(q, since: date | None, until: date | None):
+    E = models.GradeEvent
+    if since: q = q.filter(E.ts >= _ts(since))
+    if until: q = q.filter(E.ts < _ts(until + timedelta(days=1)))
+    return q
+
+def grade_history(db: Session, student_id: int, subject: str | None = None,
+                  since: date | None = None, until: date | None = None, limit: int = 1000):
+    """Timeline điểm của một học sinh (cũ -> mới), dùng index (student_id, ts)"""
+    E = models.GradeEvent
+    q = db.query(E.subject, E.score, E.ts).filter(E.student_id == student_id)
+    if subject: q = q.filter(E.subject == subject)
+    return _event_range(q, since, until).order_by(E.ts, E.id).limit(limit).all()
+
+# Kỳ -> (biểu thức nhóm trên grade_daily.day, hàm đổi giá trị nhóm thành nhãn)
+GRADE_PERIODS = {
+    "day": (lambda day: day, lambda b: (EPOCH + timedelta(days=b)).isoformat()),
+    # Tuần bắt đầu từ thứ Hai (1970-01-01 là thứ Năm)
+    "week": (lambda day: (day + 3) // 7, lambda b: (EPOCH + timedelta(days=b * 7 - 3)).isoformat()),
+    "month": (lambda day: func.strftime("%Y-%m", day * 86400, "unixepoch"), lambda b: b),
+}
+
+def grade_period_averages(db: Session, period: str = "month", subject: str | None = None,
+                          since: date | None = None, until: date | None = None, home_town: str | None = None):
+    """Điểm trung bình các lần chấm theo kỳ và môn, tính từ bảng tổng hợp grade_daily"""
+    D = models.GradeDaily
+    bucket_of, label_of = GRADE_PERIODS[period]
+    bucket = bucket_of(D.day).label("bucket")
+    n = func.sum(D.n)
+    q = db.query(bucket, D.subject, func.sum(D.total) / func.nullif(n, 0), n)
+    if subject: q = q.filter(D.subject == subject)
+    if home_town is not None: q = q.filter(D.home_town == home_town)
+    if since: q = q.filter(D.day >= (since - EPOCH).days)
+    if until: q = q.filter(D.day <= (until - EPOCH).days)
+    rows = q.group_by(bucket, D.subject).order_by(bucket, D.subject).all()
+    return [{"period": label_of(b), "subject": subj, "avg_score": round(avg, 2) if avg is not None else None,
+             "events": int(cnt or 0)} for b, subj, avg, cnt in rows]
+
+def get_student(db: Session, id: int, fields: list[str] | None = None):
+    if fields:
+        return _select(db, fields).filter(models.Student.id == id).first()
     return db.query(models.Student).get(id)
 
+# SQLite cũ giới hạn 999 tham số mỗi câu lệnh
+SQLITE_MAX_VARS = 900
+
+def get_students_by_ids(db: Session, ids: list[int]):
+    """Lấy nhiều học sinh bằng WHERE id IN (...), chia lô theo giới hạn tham số, giữ thứ tự yêu cầu"""
+    return _get_many(db, models.Student.id, ids)
+
+def get_students_by_codes(db: Session, codes: list[str]):
+    return _get_many(db, models.Student.student_code, codes)
+
+def _get_many(db: Session, column, keys: list):
+    keys = list(dict.fromkeys(keys))
+    found = {}
+    for i in range(0, len(keys), SQLITE_MAX_VARS):
+        chunk = keys[i:i + SQLITE_MAX_VARS]
+        for obj in db.query(models.Student).filter(column.in_(chunk)):
+            found[getattr(obj, column.key)] = obj
+    return [found[k] for k in keys if k in found]
+
+class VersionConflict(Exception):
+    """Bản ghi đã bị người khác sửa (version trên DB khác version client gửi lên)"""
+    def __init__(self, current_version: int):
+        super().__init__("version conflict")
+        self.current_version = current_version
+
+def _integrity_error(e: IntegrityError) -> ValueError:
+    """Map lỗi UNIQUE/FOREIGN KEY của SQLite về thông điệp mà desktop đang nhận diện ("... exists")"""
+    msg = str(e.orig)
+    for column in ("students.student_code", "students.email", "classes.code"):
+        if column in msg:
+            return ValueError(f"{column.split('.')[1]} exists")
+    if "FOREIGN KEY" in msg:
+        return ValueError("class not found")
+    return ValueError(msg)
+
+def _write(db: Session, fn):
+    """fn(session) chạy trong transaction ghi (group commit qua writer.py), lỗi ràng buộc -> ValueError"""
+    try:
+        return writes.run(db, lambda w: _synced(w, fn))
+    except IntegrityError as e:
+        raise _integrity_error(e)
+
+def _synced(db: Session, fn):
+    """Index tìm kiếm cập nhật cùng transaction với thao tác ghi"""
+    result = fn(db)
+    db.flush()
+    search_index.sync_on_write(db)
+    return result
+
+def _add(db: Session, obj):
+    db.add(obj)
+    return obj
+
 def create_student(db: Session, data: schemas.StudentIn):
-    if db.query(models.Student).filter_by(student_code=data.student_code).first():
-        raise ValueError("student_code exists")
-    if data.email and db.query(models.Student).filter_by(email=data.email).first():
-        raise ValueError("email exists")
-    obj = models.Student(**data.dict())
-    db.add(obj); db.commit(); db.refresh(obj)
+    obj = _write(db, lambda w: _add(w, models.Student(**data.dict())))
+    _log(db, "create", obj, {"name": _full_name(obj)})
+    return obj
+
+def _log(db: Session, action: str, obj, details=None):
+    """Ghi nhật ký hoạt động (không chặn, xem activity.py)"""
+    activities.record(db.info.get("tenant"), action, obj.id, obj.student_code, details)
+
+def _full_name(obj):
+    return " ".join(p for p in (obj.last_name, obj.first_name) if p) or None
+
+def _conditional_update(db: Session, where, values: dict, expected_version: int | None):
+    """Một câu UPDATE ... WHERE ... [AND version=?] RETURNING *, tăng version"""
+    S = models.Student
+    stmt = update(S).where(where)
+    if expected_version is not None:
+        stmt = stmt.where(S.version == expected_version)
+    stmt = stmt.values(**values, version=S.version + 1).returning(S)
+
+    def write(w: Session):
+        obj = w.scalars(stmt, execution_options={"synchronize_session": False}).one_or_none()
+        if obj is None and expected_version is not None:
+            # Chỉ đọc thêm khi thất bại: phân biệt 404 với xung đột version
+            current = w.query(S.version).filter(where).scalar()
+            if current is not None:
+                raise VersionConflict(current)
+        return obj
+    return _write(db, write)
+
+def update_student(db: Session, id: int, data: schemas.StudentIn, expected_version: int | None = None):
+    # class_id chỉ đổi khi client gửi lên (form học sinh cũ không có trường này)
+    values = data.dict(exclude={"version"} | ({"class_id"} - data.__fields_set__))
+    if expected_version is None:
+        expected_version = getattr(data, "version", None)
+    obj = _conditional_update(db, models.Student.id == id, values, expected_version)
+    if obj is not None:
+        _log(db, "update", obj, {"name": _full_name(obj), "version": obj.version})
+    return obj
+
+def update_grades(db: Session, student_code: str, grades: schemas.StudentGradesUpdate,
+                  expected_version: int | None = None):
+    """Cập nhật các điểm được gửi (khác None) theo mã học sinh"""
+    values = grades.dict(exclude={"version"}, exclude_none=True)
+    if expected_version is None:
+        expected_version = grades.version
+    if not values:
+        # Không có điểm nào để đổi: chỉ kiểm tra version, không ghi, không tăng version
+        obj = db.query(models.Student).filter(models.Student.student_code == student_code).first()
+        if obj is not None and expected_version is not None and obj.version != expected_version:
+            raise VersionConflict(obj.version)
+        return obj
+    obj = _conditional_update(db, models.Student.student_code == student_code, values, expected_version)
+    if obj is not None:
+        _log(db, "grades", obj, dict(values, name=_full_name(obj)))
     return obj
 
-def update_student(db: Session, id: int, data: schemas.StudentIn):
-    obj = get_student(db, id)
-    if not obj: return None
-    if data.student_code != obj.student_code and \
-       db.query(models.Student).filter_by(student_code=data.student_code).first():
-        raise ValueError("student_code exists")
-    if data.email and data.email != obj.email and \
-       db.query(models.Student).filter_by(email=data.email).first():
-        raise ValueError("email exists")
-    for k, v in data.dict().items():
-        setattr(obj, k, v)
-    db.commit(); db.refresh(obj)
+def _delete(db: Session, obj):
+    if obj is not None:
+        db.delete(obj)
     return obj
 
 def delete_student(db: Session, id: int):
-    obj = get_student(db, id)
+    obj = _write(db, lambda w: _delete(w, get_student(w, id)))
     if not obj: return False
-    db.delete(obj); db.commit()
+    _log(db, "delete", obj, {"name": _full_name(obj)})
     return True
\ No newline at end of file
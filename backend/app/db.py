@@ -1,7 +1,222 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from . import deadlines
+from .slow_queries import slow_queries
+from .writer import writes
 
-DATABASE_URL = "sqlite:///./students.db"
+# Cho phép trỏ sang DB khác (load test, benchmark) qua biến môi trường
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./students.db")
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
-Base = declarative_base()
\ No newline at end of file
+# expire_on_commit=False: object trả về từ UPDATE ... RETURNING không phải SELECT lại sau commit
+SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
+Base = declarative_base()
+
+
+# Chế độ journal tùy chọn cho mọi file SQLite, vd SQLITE_JOURNAL_MODE=wal (checkpoint do maintenance.py lo)
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "").lower()
+
+
+@event.listens_for(Engine, "connect")
+def _sqlite_pragmas(dbapi_conn, connection_record):
+    """SQLite tắt kiểm tra khóa ngoại mặc định; bật cho mọi connection (students.class_id)"""
+    if isinstance(dbapi_conn, sqlite3.Connection):
+        dbapi_conn.execute("PRAGMA foreign_keys=ON")
+        if SQLITE_JOURNAL_MODE:
+            dbapi_conn.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        # Ngắt câu đang chạy khi request hết giờ / client ngắt kết nối, xem deadlines.py
+        dbapi_conn.set_progress_handler(deadlines.progress_handler, deadlines.PROGRESS_STEPS)
+
+
+# Số dòng đã ghi theo file DB từ lần ANALYZE gần nhất (kể cả dòng do trigger ghi), maintenance.py đọc
+_changes = {}
+_changes_lock = threading.Lock()
+
+def pop_changes(database) -> int:
+    with _changes_lock:
+        return _changes.pop(database, 0)
+
+def pending_changes(database) -> int:
+    return _changes.get(database, 0)
+
+
+# Slow-query log và đếm số dòng ghi cho mọi engine (mặc định và tenant), xem slow_queries.py
+@event.listens_for(Engine, "before_cursor_execute")
+def _query_start(conn, cursor, statement, parameters, context, executemany):
+    deadlines.check()
+    conn.info.setdefault("query_start", []).append((time.perf_counter(), cursor.connection.total_changes))
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _query_end(conn, cursor, statement, parameters, context, executemany):
+    started, changes_before = conn.info["query_start"].pop()
+    elapsed = time.perf_counter() - started
+    changed = cursor.connection.total_changes - changes_before
+    if changed > 0:
+        database = conn.engine.url.database
+        with _changes_lock:
+            _changes[database] = _changes.get(database, 0) + changed
+    if elapsed >= slow_queries.threshold:
+        slow_queries.record(cursor, statement, parameters, executemany, elapsed, conn.engine.url.database)
+
+@event.listens_for(Engine, "handle_error")
+def _query_failed(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+    error = deadlines.translate(exception_context.original_exception)
+    if error is not None:
+        raise error from exception_context.original_exception
+
+
+# Phiên bản dữ liệu: tăng sau mỗi commit có ghi (dùng làm khóa cache)
+_data_version = 0
+_version_lock = threading.Lock()
+
+def data_version() -> int:
+    return _data_version
+
+def bump_data_version():
+    global _data_version
+    with _version_lock:
+        _data_version += 1
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush_write(session, flush_context):
+    session.info["has_writes"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_bulk_write(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["has_writes"] = True
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session):
+    if session.info.pop("has_writes", False):
+        bump_data_version()
+
+@event.listens_for(Session, "after_rollback")
+def _clear_on_rollback(session):
+    session.info.pop("has_writes", None)
+
+def init_db(bind):
+    """create_all + thêm cột/index/trigger mới khai báo trong models cho bảng đã tồn tại"""
+    from .models import GRADE_TRIGGER_DDL  # import trong hàm (models import db); đăng ký mọi bảng vào Base
+    with bind.begin() as conn:
+        if not inspect(conn).get_table_names():
+            # DB mới: bật incremental vacuum (chỉ đặt được trước khi tạo bảng), xem maintenance.py
+            conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        Base.metadata.create_all(bind=conn)
+    insp = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in existing:
+                    ddl = str(CreateColumn(col).compile(dialect=bind.dialect))
+                    for fk in col.foreign_keys:  # khóa ngoại khai báo ở mức bảng, thêm vào cột
+                        ddl += f" REFERENCES {fk.column.table.name} ({fk.column.name})"
+                        if fk.ondelete:
+                            ddl += f" ON DELETE {fk.ondelete}"
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+    for table in Base.metadata.sorted_tables:
+        for idx in table.indexes:
+            idx.create(bind=bind, checkfirst=True)
+    with bind.begin() as conn:
+        for ddl in GRADE_TRIGGER_DDL:
+            conn.exec_driver_sql(ddl)
+
+
+# Multi-tenant: mỗi trường một file SQLite riêng trong TENANT_DATA_DIR
+TENANT_DATA_DIR = os.getenv("TENANT_DATA_DIR", "./tenants")
+MAX_OPEN_TENANTS = int(os.getenv("MAX_OPEN_TENANTS", "64"))
+TENANT_POOL_SIZE = int(os.getenv("TENANT_POOL_SIZE", "2"))
+TENANT_ID_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+
+class TenantRegistry:
+    """LRU các engine/sessionmaker theo tenant, giới hạn số file SQLite mở cùng lúc"""
+
+    def __init__(self, data_dir: str, max_open: int, pool_size: int):
+        self.data_dir = data_dir
+        self.max_open = max_open
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._open = OrderedDict()  # tenant -> (engine, sessionmaker)
+        self._initialized = set()  # file tenant đã chạy init_db trong tiến trình này
+        self.evictions = 0
+
+    def _create(self, tenant: str):
+        os.makedirs(self.data_dir, exist_ok=True)
+        path = os.path.join(self.data_dir, tenant + ".db")
+        eng = create_engine(
+            f"sqlite:///{path}", connect_args={"check_same_thread": False},
+            pool_size=self.pool_size, max_overflow=0,
+        )
+        if path not in self._initialized:  # mở lại tenant đã bị LRU đẩy ra thì bỏ qua phần schema
+            with deadlines.suspended():  # dựng schema không tính vào deadline của request đầu tiên
+                init_db(eng)
+            with self._lock:
+                self._initialized.add(path)
+        return eng, sessionmaker(bind=eng, autocommit=False, autoflush=False, expire_on_commit=False)
+
+    def _get(self, tenant: str):
+        if not TENANT_ID_RE.match(tenant):
+            raise ValueError("invalid tenant id")
+        with self._lock:
+            entry = self._open.get(tenant)
+            if entry is not None:
+                self._open.move_to_end(tenant)
+                return entry
+        # Tạo ngoài lock để create_all của tenant mới không chặn tenant khác
+        eng, maker = self._create(tenant)
+        with self._lock:
+            entry = self._open.get(tenant)
+            if entry is not None:
+                eng.dispose()
+                self._open.move_to_end(tenant)
+                return entry
+            self._open[tenant] = (eng, maker)
+            while len(self._open) > self.max_open:
+                _, (old_engine, _) = self._open.popitem(last=False)
+                old_engine.dispose()  # connection đang dùng sẽ đóng khi trả về pool
+                writes.close(old_engine.url)  # writer (engine, thread) của tenant cũng đóng theo
+                self.evictions += 1
+            return eng, maker
+
+    def sessionmaker_for(self, tenant: str):
+        return self._get(tenant)[1]
+
+    def engine_for(self, tenant: str):
+        return self._get(tenant)[0]
+
+    def engines(self) -> list:
+        """[(tenant, engine)] các tenant đang mở"""
+        with self._lock:
+            return [(tenant, eng) for tenant, (eng, _) in self._open.items()]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"open": len(self._open), "max_open": self.max_open,
+                    "evictions": self.evictions, "tenants": list(self._open)}
+
+
+tenants = TenantRegistry(TENANT_DATA_DIR, MAX_OPEN_TENANTS, TENANT_POOL_SIZE)
+
+
+def session_for(tenant=None):
+    """Session cho tenant; None là DB mặc định (students.db). Tenant lưu ở session.info["tenant"]"""
+    db = tenants.sessionmaker_for(tenant)() if tenant else SessionLocal()
+    db.info["tenant"] = tenant or None
+    return db
+
+
+def engine_for(tenant=None):
+    """Engine cho tenant (ghi ngoài Session, không làm tăng data_version)"""
+    return tenants.engine_for(tenant) if tenant else engine
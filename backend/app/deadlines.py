@@ -0,0 +1,199 @@
+"""
+Hạn chót cho truy vấn SQL theo request: search/export rộng trên bảng lớn không giữ worker mãi
+(desktop bỏ cuộc sau API_TIMEOUT giây trong khi server vẫn chạy tiếp).
+
+- Mỗi request có một Deadline: QUERY_TIMEOUT giây (mặc định 10), riêng theo tiền tố route ở QUERY_TIMEOUTS
+  (vd "/admin=300,/students/statistics=30"); client gửi `X-Request-Timeout: <giây>` thì lấy giá trị nhỏ hơn.
+- Đồng hồ chạy từ câu SQL đầu tiên của request: thời gian chờ threadpool không tính, tạo tenant/schema
+  (TenantRegistry, chạy trong suspended()) nằm ngoài mọi deadline.
+- Deadline nằm trong ContextVar (threadpool của endpoint sync chép context), progress handler của SQLite
+  (đăng ký cho mọi connection trong db.py, gọi mỗi PROGRESS_STEPS lệnh VM) đọc nó và ngắt câu đang chạy.
+- Hết giờ -> 504; client ngắt kết nối giữa chừng -> câu đang chạy bị hủy, trả 503 (không ai nhận).
+- Code chạy ngoài request (job phân tích, bảo trì nền) không có Deadline nên không bị giới hạn.
+- Thao tác ghi đã commit (writer.py gọi release()) thì phần còn lại của request (đọc lại, ghi nhật ký) không bị
+  ngắt nữa: 503/504 sau commit khiến Idempotency-Key không lưu response và retry chạy lại POST.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from fastapi.responses import JSONResponse
+
+QUERY_TIMEOUT = float(os.getenv("QUERY_TIMEOUT", "10"))
+QUERY_TIMEOUTS = os.getenv("QUERY_TIMEOUTS", "/admin=300")
+PROGRESS_STEPS = int(os.getenv("QUERY_PROGRESS_STEPS", "1000"))
+TIMEOUT_HEADER = b"x-request-timeout"
+
+
+def _parse_routes(spec: str) -> list:
+    """"/a=30,/b=5" -> [(tiền tố, giây)], tiền tố dài trước"""
+    routes = []
+    for item in spec.split(","):
+        prefix, _, seconds = item.strip().partition("=")
+        if prefix and seconds:
+            routes.append((prefix, float(seconds)))
+    return sorted(routes, key=lambda r: len(r[0]), reverse=True)
+
+
+ROUTE_TIMEOUTS = _parse_routes(QUERY_TIMEOUTS)
+
+
+class QueryTimeout(Exception):
+    """Câu SQL bị ngắt vì request hết thời gian"""
+
+
+class QueryCancelled(Exception):
+    """Câu SQL bị ngắt vì client đã ngắt kết nối"""
+
+
+class Deadline:
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = None  # đặt bởi start() ở câu SQL đầu tiên
+        self.cancelled = threading.Event()
+        self.released = False
+
+    def start(self):
+        if self.expires_at is None:
+            self.expires_at = time.monotonic() + self.timeout
+
+    def expired(self) -> bool:
+        if self.released:
+            return False
+        return self.cancelled.is_set() or (self.expires_at is not None and time.monotonic() >= self.expires_at)
+
+    def error(self) -> Exception:
+        if self.cancelled.is_set():
+            return QueryCancelled("Client disconnected")
+        return QueryTimeout(f"Query exceeded the {self.timeout:g}s request timeout")
+
+
+_current = contextvars.ContextVar("query_deadline", default=None)
+
+
+def progress_handler() -> int:
+    """Khác 0 -> SQLite dừng câu đang chạy (sqlite3.OperationalError: interrupted)"""
+    deadline = _current.get()
+    return 1 if deadline is not None and deadline.expired() else 0
+
+
+def check():
+    """Gọi trước mỗi câu SQL: bắt đầu đếm giờ ở câu đầu tiên, hết giờ rồi thì không chạy nữa"""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.start()
+        if deadline.expired():
+            raise deadline.error()
+
+
+def remaining():
+    """Số giây còn lại của deadline request hiện tại; None nếu không giới hạn"""
+    deadline = _current.get()
+    if deadline is None or deadline.released:
+        return None
+    deadline.start()
+    return max(deadline.expires_at - time.monotonic(), 0.0)
+
+
+@contextlib.contextmanager
+def suspended():
+    """Chạy khối lệnh ngoài deadline của request (tạo tenant, dựng schema)"""
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def release():
+    """Gọi sau khi thao tác ghi của request đã commit: bỏ giới hạn cho phần còn lại của request"""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.released = True
+
+
+def translate(original):
+    """OperationalError 'interrupted' do progress handler -> QueryTimeout/QueryCancelled, còn lại trả None"""
+    deadline = _current.get()
+    if deadline is not None and isinstance(original, sqlite3.OperationalError) \
+            and "interrupted" in str(original) and deadline.expired():
+        return deadline.error()
+    return None
+
+
+def route_timeout(path: str) -> float:
+    return next((seconds for prefix, seconds in ROUTE_TIMEOUTS if path.startswith(prefix)), QUERY_TIMEOUT)
+
+
+def deadline_error_handler(request, exc):
+    """Exception handler của app: QueryTimeout -> 504, QueryCancelled -> 503"""
+    return JSONResponse({"detail": str(exc)}, status_code=504 if isinstance(exc, QueryTimeout) else 503)
+
+
+async def _json_error(send, status: int, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class DeadlineMiddleware:
+    """ASGI middleware gắn Deadline cho request và hủy nó khi client ngắt kết nối; đặt trong TenantMiddleware"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timeout = route_timeout(scope["path"])
+        header = next((v for n, v in scope.get("headers", []) if n == TIMEOUT_HEADER), None)
+        if header is not None:
+            try:
+                requested = float(header)
+            except ValueError:
+                requested = 0
+            if not requested > 0:
+                return await _json_error(send, 400, "Invalid X-Request-Timeout")
+            timeout = min(timeout, requested)
+
+        # Đọc trước body để có thể chờ http.disconnect song song với endpoint
+        messages = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            messages.append(message)
+            if not message.get("more_body"):
+                break
+
+        deadline = Deadline(timeout)
+        disconnected = asyncio.Event()
+
+        async def watch():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            deadline.cancelled.set()
+            disconnected.set()
+
+        async def replay_receive():
+            if messages:
+                return messages.pop(0)
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        watcher = asyncio.create_task(watch())
+        token = _current.set(deadline)
+        try:
+            await self.app(scope, replay_receive, send)
+        finally:
+            _current.reset(token)
+            watcher.cancel()
@@ -0,0 +1,117 @@
+"""
+Idempotency-Key cho POST/PUT/PATCH: client gửi lại cùng key thì nhận lại đúng response cũ,
+request không bị thực thi lần hai (retry an toàn khi timeout sau commit).
+
+- Response (trừ 5xx) được lưu trong LRU có TTL, khóa theo (tenant, method, path, key).
+- Cùng key nhưng body khác -> 422. Request trùng key đang chạy -> chờ request đầu xong rồi phát lại.
+- Response phát lại có header `Idempotent-Replayed: true`.
+
+Cấu hình: IDEMPOTENCY_TTL_SECONDS (mặc định 86400), IDEMPOTENCY_MAX_KEYS (mặc định 10000).
+Lưu trong bộ nhớ tiến trình: chạy nhiều worker uvicorn thì mỗi worker có bảng riêng.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+
+from .cache import TTLCache
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+IDEMPOTENT_METHODS = {"POST", "PUT", "PATCH"}
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+MAX_KEY_LENGTH = 255
+MAX_STORED_BODY = 256 * 1024  # response lớn hơn thì không lưu (chỉ bỏ qua idempotency)
+
+
+async def _json_error(send, status: int, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware lưu và phát lại response theo header Idempotency-Key"""
+
+    def __init__(self, app, max_keys: int = IDEMPOTENCY_MAX_KEYS, ttl: float = IDEMPOTENCY_TTL_SECONDS):
+        self.app = app
+        self.store = TTLCache(max_keys, ttl)  # key -> (fingerprint, status, headers, body)
+        self._inflight = {}  # key -> asyncio.Future của request đang chạy
+        self.replays = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in IDEMPOTENT_METHODS:
+            return await self.app(scope, receive, send)
+        key = next((v.decode("latin-1").strip() for n, v in scope.get("headers", [])
+                    if n == IDEMPOTENCY_HEADER), None)
+        if not key:
+            return await self.app(scope, receive, send)
+        if len(key) > MAX_KEY_LENGTH:
+            return await _json_error(send, 400, "Idempotency-Key too long")
+
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        fingerprint = hashlib.sha256(body).digest()[:16]
+        tenant = scope.get("state", {}).get("tenant")
+        store_key = (tenant, scope["method"], scope["path"], key)
+
+        while True:
+            entry = self.store.get(store_key)
+            if entry is not None:
+                if entry[0] != fingerprint:
+                    return await _json_error(send, 422, "Idempotency-Key reused with a different request body")
+                self.replays += 1
+                _, status, headers, stored = entry
+                await send({"type": "http.response.start", "status": status,
+                            "headers": headers + [(b"idempotent-replayed", b"true")]})
+                await send({"type": "http.response.body", "body": stored})
+                return
+            pending = self._inflight.get(store_key)
+            if pending is None:
+                break
+            await asyncio.shield(pending)  # request đầu xong thì đọc lại store
+
+        done = asyncio.get_running_loop().create_future()
+        self._inflight[store_key] = done
+        replayed_body = False
+
+        async def replay_receive():
+            nonlocal replayed_body
+            if not replayed_body:
+                replayed_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        start, chunks, size = None, [], 0
+
+        async def capture_send(message):
+            nonlocal start, size
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body" and size <= MAX_STORED_BODY:
+                chunk = message.get("body", b"")
+                chunks.append(chunk)
+                size += len(chunk)
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+            if start is not None and start["status"] < 500 and size <= MAX_STORED_BODY:
+                self.store.set(store_key, (fingerprint, start["status"],
+                                           list(start.get("headers", [])), b"".join(chunks)))
+        finally:
+            del self._inflight[store_key]
+            done.set_result(None)
+
+    def stats(self) -> dict:
+        return {"keys": len(self.store), "replays": self.replays,
+                "inflight": len(self._inflight), "ttl_seconds": self.store.ttl}
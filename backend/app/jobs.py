@@ -0,0 +1,241 @@
+"""
+Chạy các phân tích trong scripts/ (analyze_students, analyze_by_age, analyze_top_bottom_students)
+dưới dạng job nền trong process pool.
+
+- Mỗi job chụp snapshot SQLite (backup API) rồi chạy pipeline trên snapshot, không khóa DB đang phục vụ.
+- Kết quả (PNG, log.txt, result.json) nằm trong ANALYSIS_OUTPUT_DIR/{job_id}/.
+- Job được cache theo (tenant, danh sách phân tích, data_version): gửi lại cùng yêu cầu khi dữ liệu
+  chưa đổi thì trả về job cũ (đang chạy hoặc đã xong), không chạy lại.
+- Giới hạn: ANALYSIS_WORKERS process (nice +10) và ANALYSIS_MAX_QUEUED job chờ/chạy, để phân tích
+  không tranh CPU với CRUD API.
+"""
+
+import contextlib
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+ANALYSIS_OUTPUT_DIR = os.getenv("ANALYSIS_OUTPUT_DIR", "./analysis_jobs")
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "1"))
+ANALYSIS_MAX_QUEUED = int(os.getenv("ANALYSIS_MAX_QUEUED", "8"))
+ANALYSIS_KEEP_JOBS = int(os.getenv("ANALYSIS_KEEP_JOBS", "20"))
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "scripts")
+SNAPSHOT_NAME = "snapshot.db"
+PROGRESS_NAME = "progress.json"
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+# ---------- Chạy trong process con ----------
+
+def init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+    with contextlib.suppress(OSError, AttributeError):
+        os.nice(10)
+
+
+def _hometown(df, out_dir):
+    import analyze_students as a
+    group, _ = a.plot_avg_scores(df, out_dir)
+    a.plot_sorted_bars(group, out_dir)
+    return json.loads(group.round(2).to_json(orient="records", force_ascii=False))
+
+
+def _age(df, out_dir):
+    import analyze_by_age as a
+    a.DATA_DIR = out_dir
+    df = a.create_age_groups(df)
+    _, avg_by_age = a.analyze_by_age_groups(df)
+    a.create_age_comparison_charts(df, avg_by_age)
+    return json.loads(avg_by_age.to_json(orient="index", force_ascii=False))
+
+
+def _top_bottom(df, out_dir):
+    import analyze_top_bottom_students as a
+    a.DATA_DIR = out_dir
+    df = a.prepare_data(df)
+    top, bottom, top_threshold, bottom_threshold = a.identify_top_bottom_students(df)
+    a.create_comparison_charts(top, bottom, *a.analyze_characteristics(top, bottom))
+    return {"top_threshold": round(float(top_threshold), 2), "bottom_threshold": round(float(bottom_threshold), 2),
+            "top_count": len(top), "bottom_count": len(bottom)}
+
+
+PIPELINES = {"hometown": _hometown, "age": _age, "top_bottom": _top_bottom}
+
+
+def _write_progress(job_dir: str, done: int, total: int, step: str):
+    tmp = os.path.join(job_dir, PROGRESS_NAME + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump({"done": done, "total": total, "step": step}, f)
+    os.replace(tmp, os.path.join(job_dir, PROGRESS_NAME))
+
+
+def run_job(job_dir: str, db_path: str, analyses: list) -> dict:
+    """Snapshot DB rồi chạy lần lượt các pipeline; trả về tóm tắt và danh sách file kết quả"""
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    import analyze_students
+
+    total = len(analyses) + 1
+    _write_progress(job_dir, 0, total, "snapshot")
+    snapshot = os.path.join(job_dir, SNAPSHOT_NAME)
+    src, dst = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True), sqlite3.connect(snapshot)
+    try:
+        src.backup(dst)
+        df = pd.read_sql_query("SELECT * FROM students", dst)
+    finally:
+        src.close()
+        dst.close()
+        os.remove(snapshot)
+
+    summary = {}
+    with open(os.path.join(job_dir, "log.txt"), "w", encoding="utf-8") as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        df = analyze_students.clean_students(df)
+        for i, name in enumerate(analyses, 1):
+            _write_progress(job_dir, i, total, name)
+            summary[name] = PIPELINES[name](df.copy(), job_dir)
+            plt.close("all")
+    result = {"rows": len(df), "summary": summary}
+    with open(os.path.join(job_dir, "result.json"), "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False)
+    _write_progress(job_dir, total, total, "done")
+    return result
+
+
+def render_analysis(db_path: str, name: str, out_dir: str) -> list:
+    """Vẽ lại biểu đồ của một phân tích từ DB hiện tại vào out_dir (dùng cho /charts)"""
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    import analyze_students
+
+    con = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        df = pd.read_sql_query("SELECT * FROM students", con)
+    finally:
+        con.close()
+    with open(os.devnull, "w") as null, contextlib.redirect_stdout(null), contextlib.redirect_stderr(null):
+        PIPELINES[name](analyze_students.clean_students(df), out_dir)
+        plt.close("all")
+    return sorted(os.listdir(out_dir))
+
+
+# ---------- Quản lý job trong process API ----------
+
+class AnalysisJobs:
+    """Hàng đợi job phân tích: process pool giới hạn, cache theo data_version, giữ ANALYSIS_KEEP_JOBS job"""
+
+    def __init__(self, out_dir: str, workers: int, max_queued: int, keep: int):
+        self.out_dir = out_dir
+        self.workers = workers
+        self.max_queued = max_queued
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._pool = None
+        self._jobs = OrderedDict()  # job_id -> dict trạng thái
+        self._by_key = {}  # (tenant, analyses, data_version) -> job_id
+        self.cache_hits = 0
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=init_worker)
+        return self._pool
+
+    def _submit(self, fn, *args):
+        try:
+            return self._executor().submit(fn, *args)
+        except BrokenProcessPool:
+            # Worker chết đột ngột (OOM, bị kill) làm hỏng cả pool: bỏ pool cũ, tạo lại và thử một lần nữa
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            return self._executor().submit(fn, *args)
+
+    def submit(self, db_path: str, tenant, analyses: list, version: int):
+        """Trả về (job, created); created=False nghĩa là dùng lại job cùng dữ liệu"""
+        key = (tenant, tuple(analyses), version)
+        with self._lock:
+            job = self._jobs.get(self._by_key.get(key))
+            if job is not None and job["status"] != "failed":
+                self.cache_hits += 1
+                return job, False
+            active = sum(j["status"] in ("queued", "running") for j in self._jobs.values())
+            if active >= self.max_queued:
+                raise JobQueueFull()
+            job_id = uuid.uuid4().hex[:12]
+            job_dir = os.path.join(self.out_dir, job_id)
+            os.makedirs(job_dir)
+            job = {"id": job_id, "tenant": tenant, "analyses": list(analyses), "data_version": version,
+                   "status": "queued", "progress": None, "created_at": time.time(),
+                   "finished_at": None, "error": None, "result": None, "files": [], "_key": key, "_dir": job_dir}
+            self._jobs[job_id] = job
+            self._by_key[key] = job_id
+            future = self._submit(run_job, job_dir, db_path, list(analyses))
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        return job, True
+
+    def _finish(self, job_id: str, future):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            exc = future.exception()
+            if exc is None:
+                job.update(status="done", result=future.result())
+                # get() không đọc progress.json nữa khi job đã xong: ghi luôn giá trị cuối
+                total = len(job["analyses"]) + 1
+                job["progress"] = {"done": total, "total": total, "step": "done"}
+                job["files"] = sorted(n for n in os.listdir(job["_dir"]) if n != PROGRESS_NAME)
+            else:
+                job.update(status="failed", error=f"{type(exc).__name__}: {exc}")
+            job["finished_at"] = time.time()
+            self._evict()
+
+    def _evict(self):
+        finished = [j for j in self._jobs.values() if j["status"] in ("done", "failed")]
+        for job in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[job["id"]]
+            if self._by_key.get(job["_key"]) == job["id"]:
+                del self._by_key[job["_key"]]
+            shutil.rmtree(job["_dir"], ignore_errors=True)
+
+    def get(self, job_id: str, tenant=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["tenant"] != tenant:
+                return None
+            if job["status"] in ("queued", "running"):
+                with contextlib.suppress(OSError, ValueError):
+                    with open(os.path.join(job["_dir"], PROGRESS_NAME)) as f:
+                        job["progress"] = json.load(f)
+                        job["status"] = "running"
+            return dict(job)
+
+    def list(self, tenant=None) -> list:
+        with self._lock:
+            ids = [j["id"] for j in reversed(self._jobs.values()) if j["tenant"] == tenant]
+        return [self.get(i, tenant) for i in ids]
+
+    def file_path(self, job_id: str, name: str, tenant=None):
+        job = self.get(job_id, tenant)
+        if job is None or name not in job["files"]:
+            return None
+        return os.path.join(job["_dir"], name)
+
+
+jobs = AnalysisJobs(ANALYSIS_OUTPUT_DIR, ANALYSIS_WORKERS, ANALYSIS_MAX_QUEUED, ANALYSIS_KEEP_JOBS)
@@ -1,8 +1,33 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import students
+from .routers import activities, admin, analysis, charts, classes, students
+from .deadlines import DeadlineMiddleware, QueryCancelled, QueryTimeout, deadline_error_handler
+from .idempotency import IdempotencyMiddleware
+from .maintenance import MAINT_ENABLED, maintenance
+from .profiling import ProfilingMiddleware
+from .tenancy import TenantMiddleware
 
-app = FastAPI(title="Student Management API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bảo trì DB nền (ANALYZE, incremental vacuum, checkpoint WAL); MAINT_ENABLED=0 để tắt
+    if MAINT_ENABLED:
+        maintenance.start()
+    yield
+    maintenance.stop()
+
+
+app = FastAPI(title="Student Management API", lifespan=lifespan)
+
+# Profile theo yêu cầu (X-Profile + X-Admin-Token hoặc PROFILE_SAMPLE_RATE); thêm đầu tiên để nằm trong cùng,
+# đọc được route sau khi định tuyến
+app.add_middleware(ProfilingMiddleware)
+
+# Hạn chót cho truy vấn SQL (QUERY_TIMEOUT/QUERY_TIMEOUTS, header X-Request-Timeout), hủy khi client ngắt kết nối
+app.add_middleware(DeadlineMiddleware)
+app.add_exception_handler(QueryTimeout, deadline_error_handler)
+app.add_exception_handler(QueryCancelled, deadline_error_handler)
 
 # CORS không bắt buộc với Desktop App, nhưng để mở cho tiện khi test
 app.add_middleware(
@@ -11,4 +36,15 @@ app.add_middleware(
     allow_methods=["*"], allow_headers=["*"],
 )
 
-app.include_router(students.router)
\ No newline at end of file
+# Idempotency-Key cho POST/PUT/PATCH (thêm trước TenantMiddleware để chạy sau nó, khóa theo tenant)
+app.add_middleware(IdempotencyMiddleware)
+
+# Mỗi trường (tenant) một file SQLite: header X-Tenant-ID hoặc /t/{tenant}/...
+app.add_middleware(TenantMiddleware)
+
+app.include_router(students.router)
+app.include_router(classes.router)
+app.include_router(analysis.router)
+app.include_router(charts.router)
+app.include_router(activities.router)
+app.include_router(admin.router)
\ No newline at end of file
@@ -0,0 +1,208 @@
+"""
+Bảo trì SQLite định kỳ cho DB mặc định và các tenant đang mở (thread nền, khởi động trong lifespan của app).
+
+- ANALYZE khi số dòng ghi từ lần trước vượt MAINT_ANALYZE_MIN_CHANGES hoặc MAINT_ANALYZE_CHANGE_RATIO
+  số dòng của students (planner có sqlite_stat1); DB chưa có sqlite_stat1 thì ANALYZE ngay lần đầu.
+- Incremental vacuum: DB mới tạo bằng init_db đã có auto_vacuum=INCREMENTAL; mỗi lượt trả lại tối đa
+  MAINT_VACUUM_STEP_PAGES trang trống khi có từ MAINT_VACUUM_MIN_FREE_PAGES trang. DB cũ (auto_vacuum=NONE)
+  không bao giờ tự chuyển (cần VACUUM toàn bộ, khóa DB): admin chạy POST /admin/maintenance/run?task=convert.
+- Checkpoint WAL (khi journal_mode=wal, xem SQLITE_JOURNAL_MODE): PASSIVE mỗi MAINT_CHECKPOINT_SECONDS,
+  TRUNCATE khi file -wal lớn hơn MAINT_WAL_TRUNCATE_BYTES.
+- Index tìm kiếm tên (search.py): xử lý học sinh còn trong search_dirty (nạp hàng loạt ngoài API) theo lô,
+  tạo lại trigger nếu students bị tạo lại bằng script.
+- Số liệu ở GET /admin/maintenance, chạy ngay bằng POST /admin/maintenance/run.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from . import search as search_index
+from .db import engine, pending_changes, pop_changes, tenants
+
+log = logging.getLogger(__name__)
+
+MAINT_ENABLED = os.getenv("MAINT_ENABLED", "1") == "1"
+MAINT_INTERVAL_SECONDS = float(os.getenv("MAINT_INTERVAL_SECONDS", "30"))
+MAINT_ANALYZE_MIN_CHANGES = int(os.getenv("MAINT_ANALYZE_MIN_CHANGES", "1000"))
+MAINT_ANALYZE_CHANGE_RATIO = float(os.getenv("MAINT_ANALYZE_CHANGE_RATIO", "0.1"))
+MAINT_VACUUM_MIN_FREE_PAGES = int(os.getenv("MAINT_VACUUM_MIN_FREE_PAGES", "256"))
+MAINT_VACUUM_STEP_PAGES = int(os.getenv("MAINT_VACUUM_STEP_PAGES", "2048"))
+MAINT_CHECKPOINT_SECONDS = float(os.getenv("MAINT_CHECKPOINT_SECONDS", "60"))
+MAINT_WAL_TRUNCATE_BYTES = int(os.getenv("MAINT_WAL_TRUNCATE_BYTES", str(64 * 1024 * 1024)))
+TASKS = ("search", "analyze", "vacuum", "checkpoint")
+CONVERT_TASK = "convert"  # chỉ chạy khi admin yêu cầu, không nằm trong TASKS của lượt định kỳ
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+
+def _pragma(conn, name: str):
+    return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+class Maintenance:
+    """Lịch bảo trì + số liệu theo DB ('default' hoặc tên tenant)"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.metrics = {}  # tên DB -> số liệu
+        self._lock = threading.Lock()  # một lượt bảo trì tại một thời điểm
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _databases(self, only=None):
+        items = [("default", engine)] + tenants.engines()
+        return [(name, eng) for name, eng in items if only is None or name == only]
+
+    def _m(self, name: str) -> dict:
+        m = self.metrics.get(name)
+        if m is None:
+            m = self.metrics[name] = {
+                "analyze_runs": 0, "last_analyze": None, "last_analyze_ms": None, "changes_at_last_analyze": 0,
+                "vacuum_runs": 0, "pages_freed": 0, "converted_to_incremental": False, "search_synced": 0,
+                "checkpoints": 0, "truncate_checkpoints": 0, "last_checkpoint": None, "last_checkpoint_result": None,
+                "errors": 0, "last_error": None,
+            }
+        return m
+
+    # ---------- Các tác vụ ----------
+
+    def analyze(self, conn, name: str, database, force: bool) -> bool:
+        changes = pending_changes(database)
+        has_stats = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").first() is not None
+        if not force and has_stats:
+            rows = conn.exec_driver_sql("SELECT count(*) FROM students").scalar() or 0
+            if changes < max(MAINT_ANALYZE_MIN_CHANGES, rows * MAINT_ANALYZE_CHANGE_RATIO):
+                return False
+        t0 = time.perf_counter()
+        conn.exec_driver_sql("ANALYZE")
+        m = self._m(name)
+        m.update(last_analyze=time.time(), last_analyze_ms=round((time.perf_counter() - t0) * 1000, 1),
+                 changes_at_last_analyze=pop_changes(database))
+        m["analyze_runs"] += 1
+        return True
+
+    def vacuum(self, conn, name: str, force: bool) -> int:
+        m = self._m(name)
+        free = _pragma(conn, "freelist_count")
+        mode = _pragma(conn, "auto_vacuum")
+        if mode != 2 or free < (1 if force else MAINT_VACUUM_MIN_FREE_PAGES):
+            return 0
+        # pysqlite chỉ step câu PRAGMA không trả cột một lần (= 1 trang); executescript chạy tới hết
+        conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({MAINT_VACUUM_STEP_PAGES})")
+        freed = free - _pragma(conn, "freelist_count")
+        m["vacuum_runs"] += 1
+        m["pages_freed"] += freed
+        return freed
+
+    def convert(self, conn, name: str) -> bool:
+        """auto_vacuum NONE -> INCREMENTAL: đổi được với DB đã có bảng chỉ bằng một lần VACUUM toàn bộ"""
+        if _pragma(conn, "auto_vacuum") != 0:
+            return False
+        m = self._m(name)
+        free = _pragma(conn, "freelist_count")
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+        m["converted_to_incremental"] = True
+        m["vacuum_runs"] += 1
+        m["pages_freed"] += free
+        return True
+
+    def sync_search(self, eng, name: str) -> int:
+        n = search_index.catch_up(eng)  # transaction riêng cho từng lô, không dùng connection AUTOCOMMIT
+        self._m(name)["search_synced"] += n
+        return n
+
+    def checkpoint(self, conn, name: str, database, force: bool):
+        if _pragma(conn, "journal_mode") != "wal":
+            return None
+        m = self._m(name)
+        wal_bytes = _wal_size(database)
+        if not force and m["last_checkpoint"] and time.time() - m["last_checkpoint"] < MAINT_CHECKPOINT_SECONDS \
+                and wal_bytes < MAINT_WAL_TRUNCATE_BYTES:
+            return None
+        mode = "TRUNCATE" if force or wal_bytes >= MAINT_WAL_TRUNCATE_BYTES else "PASSIVE"
+        busy, log_frames, checkpointed = conn.exec_driver_sql(f"PRAGMA wal_checkpoint({mode})").first()
+        m.update(last_checkpoint=time.time(),
+                 last_checkpoint_result={"mode": mode, "busy": busy, "log_frames": log_frames,
+                                         "checkpointed": checkpointed, "wal_bytes_before": wal_bytes})
+        m["checkpoints"] += 1
+        m["truncate_checkpoints"] += mode == "TRUNCATE"
+        return m["last_checkpoint_result"]
+
+    # ---------- Lượt chạy ----------
+
+    def run(self, tasks=TASKS, only=None, force: bool = False) -> dict:
+        """Chạy các tác vụ cho mọi DB (hoặc chỉ DB `only`); force bỏ qua ngưỡng"""
+        results = {}
+        with self._lock:
+            for name, eng in self._databases(only):
+                database = eng.url.database
+                if not database or database == ":memory:":
+                    continue
+                result = results[name] = {}
+                try:
+                    if "search" in tasks:
+                        result["search_synced"] = self.sync_search(eng, name)
+                    with eng.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                        if "analyze" in tasks:
+                            result["analyzed"] = self.analyze(conn, name, database, force)
+                        if CONVERT_TASK in tasks:
+                            result["converted_to_incremental"] = self.convert(conn, name)
+                        if "vacuum" in tasks:
+                            result["pages_freed"] = self.vacuum(conn, name, force)
+                        if "checkpoint" in tasks:
+                            result["checkpoint"] = self.checkpoint(conn, name, database, force)
+                except Exception as e:
+                    m = self._m(name)
+                    m["errors"] += 1
+                    m["last_error"] = f"{type(e).__name__}: {e}"
+                    result["error"] = m["last_error"]
+                    log.exception("Maintenance failed for %s", name)
+        return results
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.run()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="db-maintenance", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> dict:
+        databases = {}
+        for name, eng in self._databases():
+            database = eng.url.database
+            if not database or database == ":memory:":
+                continue
+            info = {"pending_changes": pending_changes(database)}
+            try:
+                with eng.connect() as conn:
+                    info.update(page_count=_pragma(conn, "page_count"), page_size=_pragma(conn, "page_size"),
+                                freelist_count=_pragma(conn, "freelist_count"),
+                                auto_vacuum=AUTO_VACUUM_MODES.get(_pragma(conn, "auto_vacuum")),
+                                journal_mode=_pragma(conn, "journal_mode"), wal_bytes=_wal_size(database))
+            except Exception as e:
+                info["error"] = str(e)
+            databases[name] = dict(info, **self._m(name))
+        return {"enabled": MAINT_ENABLED, "running": self._thread is not None,
+                "interval_seconds": self.interval, "databases": databases}
+
+
+def _wal_size(database) -> int:
+    try:
+        return os.path.getsize(f"{database}-wal")
+    except OSError:
+        return 0
+
+
+maintenance = Maintenance(MAINT_INTERVAL_SECONDS)
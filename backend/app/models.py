@@ -1,6 +1,18 @@
-from sqlalchemy import Column, Integer, String, Float, Date
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Index, event
+from sqlalchemy.orm import relationship
 from .db import Base
 
+class Class(Base):
+    """Lớp học; danh sách học sinh nạp bằng selectinload (lazy="raise" để không lỡ N+1)"""
+    __tablename__ = "classes"
+    id = Column(Integer, primary_key=True)
+    code = Column(String, unique=True, nullable=False, index=True)  # vd 10A1
+    name = Column(String, nullable=True)
+    homeroom_teacher = Column(String, nullable=True)
+    room = Column(String, nullable=True)
+    schedule = Column(String, nullable=True)  # Sáng | Chiều
+    students = relationship("Student", lazy="raise", order_by="Student.student_code")
+
 class Student(Base):
     __tablename__ = "students"
     id = Column(Integer, primary_key=True, index=True)
@@ -12,4 +24,148 @@ class Student(Base):
     home_town = Column(String, nullable=True)
     math_score = Column(Float, nullable=True)
     literature_score = Column(Float, nullable=True)
-    english_score = Column(Float, nullable=True)
\ No newline at end of file
+    english_score = Column(Float, nullable=True)
+    # Xóa lớp thì học sinh thành chưa xếp lớp (cần PRAGMA foreign_keys=ON, xem db.py)
+    class_id = Column(Integer, ForeignKey("classes.id", ondelete="SET NULL"), nullable=True)
+    # Optimistic locking: tăng 1 sau mỗi lần cập nhật
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # Index ghép cho lọc theo quê quán + khoảng điểm/ngày sinh (và sắp xếp theo các cột này)
+    __table_args__ = (
+        Index("ix_students_home_town_math", "home_town", "math_score"),
+        Index("ix_students_home_town_literature", "home_town", "literature_score"),
+        Index("ix_students_home_town_english", "home_town", "english_score"),
+        Index("ix_students_dob", "dob"),
+        # Lọc theo lớp + danh sách lớp sắp theo mã học sinh (selectinload của Class.students) không cần sort
+        Index("ix_students_class_code", "class_id", "student_code"),
+        # Gợi ý theo tiền tố không phân biệt hoa thường (GET /students/suggest): range scan trên index NOCASE
+        Index("ix_students_code_nocase", student_code.collate("NOCASE")),
+        Index("ix_students_email_nocase", email.collate("NOCASE")),
+        # ... và theo họ/tên khi index tìm kiếm còn học sinh chưa đồng bộ (search_dirty)
+        Index("ix_students_last_name_nocase", last_name.collate("NOCASE")),
+        Index("ix_students_first_name_nocase", first_name.collate("NOCASE")),
+    )
+
+class Activity(Base):
+    """Nhật ký hoạt động (chỉ ghi thêm, cắt bớt theo ACTIVITY_MAX_ROWS)"""
+    __tablename__ = "activities"
+    id = Column(Integer, primary_key=True)
+    ts = Column(Float, nullable=False)  # unix time
+    action = Column(String, nullable=False)  # create | update | grades | delete
+    student_id = Column(Integer, nullable=True)
+    student_code = Column(String, nullable=True)
+    details = Column(String, nullable=True)  # JSON gọn: các trường/điểm được gửi
+
+class GradeEvent(Base):
+    """Lịch sử điểm: một dòng cho mỗi lần điểm một môn thay đổi (ghi bằng trigger, cùng transaction)"""
+    __tablename__ = "grade_events"
+    id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, nullable=False)
+    subject = Column(String, nullable=False)  # math | literature | english
+    score = Column(Float, nullable=True)  # NULL: điểm bị xóa
+    ts = Column(Integer, nullable=False)  # unix time (giây)
+
+    __table_args__ = (
+        Index("ix_grade_events_student_ts", "student_id", "ts"),  # timeline của một học sinh
+    )
+
+class GradeDaily(Base):
+    """Tổng hợp grade_events theo ngày (UTC), môn và quê quán lúc chấm; nguồn cho trung bình theo kỳ"""
+    __tablename__ = "grade_daily"
+    day = Column(Integer, primary_key=True)  # ts // 86400
+    subject = Column(String, primary_key=True)
+    home_town = Column(String, primary_key=True, default="")  # '' khi không có quê quán
+    n = Column(Integer, nullable=False, default=0)  # số điểm khác NULL
+    total = Column(Float, nullable=False, default=0.0)
+
+GRADE_SUBJECTS = {"math": "math_score", "literature": "literature_score", "english": "english_score"}
+
+# Trigger ghi grade_events (và cộng dồn grade_daily) trong cùng transaction với INSERT/UPDATE/DELETE
+# students, bắt được mọi đường ghi (crud, PATCH điểm, script nạp dữ liệu) mà không thêm round-trip.
+# Xóa học sinh chỉ xóa timeline của học sinh đó; số liệu theo kỳ đã ghi nhận được giữ nguyên.
+_NOW = "CAST(strftime('%s','now') AS INTEGER)"
+_GRADE_DDL = [f"""
+    CREATE TRIGGER IF NOT EXISTS trg_grade_daily AFTER INSERT ON grade_events
+    BEGIN INSERT INTO grade_daily (day, subject, home_town, n, total)
+          VALUES (new.ts / 86400, new.subject,
+                  COALESCE((SELECT home_town FROM students WHERE id = new.student_id), ''),
+                  new.score IS NOT NULL, COALESCE(new.score, 0))
+          ON CONFLICT (day, subject, home_town) DO UPDATE SET n = n + excluded.n, total = total + excluded.total;
+    END""", """
+    CREATE TRIGGER IF NOT EXISTS trg_grade_events_delete AFTER DELETE ON students
+    BEGIN DELETE FROM grade_events WHERE student_id = old.id; END"""]
+for _subject, _col in GRADE_SUBJECTS.items():
+    _GRADE_DDL += [f"""
+    CREATE TRIGGER IF NOT EXISTS trg_grade_events_insert_{_subject} AFTER INSERT ON students
+    WHEN new.{_col} IS NOT NULL
+    BEGIN INSERT INTO grade_events (student_id, subject, score, ts)
+          VALUES (new.id, '{_subject}', new.{_col}, {_NOW}); END""", f"""
+    CREATE TRIGGER IF NOT EXISTS trg_grade_events_update_{_subject} AFTER UPDATE OF {_col} ON students
+    WHEN old.{_col} IS NOT new.{_col}
+    BEGIN INSERT INTO grade_events (student_id, subject, score, ts)
+          VALUES (new.id, '{_subject}', new.{_col}, {_NOW}); END""", f"""
+    INSERT INTO grade_events (student_id, subject, score, ts)
+    SELECT id, '{_subject}', {_col}, {_NOW} FROM students WHERE {_col} IS NOT NULL"""]
+# Chỉ các CREATE TRIGGER IF NOT EXISTS: init_db chạy lại mỗi lần khởi động (students bị tạo lại thì mất trigger)
+GRADE_TRIGGER_DDL = [ddl for ddl in _GRADE_DDL if ddl.lstrip().startswith("CREATE TRIGGER")]
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_grade_triggers(target, connection, tables=(), **kw):
+    """Chạy khi create_all vừa tạo grade_events: tạo trigger rồi chép điểm hiện có làm mốc ban đầu"""
+    if GradeEvent.__table__ in tables:
+        for ddl in _GRADE_DDL:
+            connection.exec_driver_sql(ddl)
+
+# Index tìm kiếm tên gần đúng (trigram trên họ tên đã bỏ dấu), xem search.py
+class SearchTerm(Base):
+    """Từ điển các từ (đã bỏ dấu, chữ thường) xuất hiện trong họ tên học sinh"""
+    __tablename__ = "search_terms"
+    id = Column(Integer, primary_key=True)
+    term = Column(String, unique=True, nullable=False)
+    df = Column(Integer, nullable=False, default=0)  # số học sinh có từ này
+
+class SearchTermTrigram(Base):
+    """trigram -> term: khớp gần đúng chỉ chạm từ điển, không chạm students"""
+    __tablename__ = "search_term_trigrams"
+    trigram = Column(String, primary_key=True)
+    term_id = Column(Integer, primary_key=True)
+    __table_args__ = {"sqlite_with_rowid": False}
+
+class SearchPosting(Base):
+    """term -> học sinh"""
+    __tablename__ = "search_postings"
+    term_id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, primary_key=True)
+    __table_args__ = {"sqlite_with_rowid": False}
+
+class SearchDoc(Base):
+    """Các từ của học sinh đang có trong index (để gỡ postings cũ khi đổi tên/xóa)"""
+    __tablename__ = "search_docs"
+    student_id = Column(Integer, primary_key=True, autoincrement=False)
+    terms = Column(String, nullable=False)  # các từ cách nhau bằng dấu cách
+
+class SearchDirty(Base):
+    """Học sinh có họ tên đổi nhưng index chưa cập nhật (ghi bằng trigger)"""
+    __tablename__ = "search_dirty"
+    student_id = Column(Integer, primary_key=True, autoincrement=False)
+
+# Trigger đánh dấu mọi đường ghi (crud, script nạp dữ liệu); fold() cần Python nên phần cập nhật index
+# do search.sync() làm: crud gọi trong chính transaction ghi, phần tồn đọng do maintenance.py.
+_SEARCH_MARK = "INSERT OR IGNORE INTO search_dirty (student_id) VALUES"
+SEARCH_TRIGGERS = ("trg_search_insert", "trg_search_update", "trg_search_delete")
+SEARCH_DDL = [f"""
+    CREATE TRIGGER IF NOT EXISTS trg_search_insert AFTER INSERT ON students
+    BEGIN {_SEARCH_MARK} (new.id); END""", f"""
+    CREATE TRIGGER IF NOT EXISTS trg_search_update AFTER UPDATE OF first_name, last_name ON students
+    WHEN old.first_name IS NOT new.first_name OR old.last_name IS NOT new.last_name
+    BEGIN {_SEARCH_MARK} (new.id); END""", f"""
+    CREATE TRIGGER IF NOT EXISTS trg_search_delete AFTER DELETE ON students
+    BEGIN {_SEARCH_MARK} (old.id); END""",
+    "INSERT OR IGNORE INTO search_dirty (student_id) SELECT id FROM students"]
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_search_triggers(target, connection, tables=(), **kw):
+    """Chạy khi create_all vừa tạo search_dirty: tạo trigger và đánh dấu toàn bộ học sinh hiện có"""
+    if SearchDirty.__table__ in tables:
+        for ddl in SEARCH_DDL:
+            connection.exec_driver_sql(ddl)
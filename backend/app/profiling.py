@@ -0,0 +1,232 @@
+"""
+Profile theo yêu cầu: xem thời gian của một request chậm (vd /students?search=..., /students/statistics)
+được tiêu vào đâu, ngay trên server đang chạy.
+
+- Bật cho một request: gửi header `X-Profile: 1` kèm `X-Admin-Token` hợp lệ (xem admin.py).
+- Lấy mẫu tự động: PROFILE_SAMPLE_RATE (0..1, mặc định 0) phần request, giới hạn theo tiền tố
+  đường dẫn PROFILE_PATHS (vd "/students,/classes"; trống là mọi route).
+- Profiler lấy mẫu (stdlib, không cần thư viện ngoài): một thread đọc stack của các thread mỗi
+  PROFILE_INTERVAL_MS ms; chỉ giữ các stack đi qua endpoint/dependency của route được gọi
+  (request khác cùng route chạy song song vẫn có thể lẫn vào).
+- Kết quả là speedscope JSON (mở ở https://www.speedscope.app) trong PROFILE_DIR, giữ PROFILE_MAX_FILES
+  file mới nhất; response có header `X-Profile-Id`. Danh sách/tải về ở /admin/profiles
+  (?format=collapsed cho flamegraph.pl).
+"""
+
+import inspect
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+from starlette.concurrency import run_in_threadpool
+
+from .admin import is_admin
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_PATHS = tuple(p.strip() for p in os.getenv("PROFILE_PATHS", "").split(",") if p.strip())
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_HEADER = b"x-profile"
+ADMIN_TOKEN_HEADER = b"x-admin-token"
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+PROFILE_SUFFIX = ".speedscope.json"
+META_SUFFIX = ".meta.json"
+PROFILE_ID_RE = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$")
+
+
+class StackSampler:
+    """Thread lấy mẫu sys._current_frames() cho tới khi stop(); đếm số lần gặp mỗi stack"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.counts = {}  # (tid, stack gốc -> lá) -> số mẫu
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                key = (tid, tuple(reversed(stack)))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+
+def _route_codes(route) -> set:
+    """Code object của endpoint và mọi dependency của route (kể cả hàm được decorator bọc)"""
+    codes = set()
+    pending = [getattr(route, "dependant", None)]
+    while pending:
+        dependant = pending.pop()
+        if dependant is None:
+            continue
+        call = dependant.call
+        for fn in (call, inspect.unwrap(call) if callable(call) else None, getattr(call, "__call__", None)):
+            code = getattr(fn, "__code__", None)
+            if code is not None:
+                codes.add(code)
+        pending.extend(dependant.dependencies)
+    return codes
+
+
+def _qualname(code) -> str:
+    return getattr(code, "co_qualname", code.co_name)  # co_qualname từ Python 3.11
+
+
+def to_speedscope(counts: dict, codes: set, name: str, interval_ms: float) -> dict:
+    """Giữ các stack đi qua route (cắt bỏ phần trên endpoint/dependency ngoài cùng) -> speedscope 'sampled'"""
+    frames, index, samples, weights = [], {}, [], []
+    for (_, stack), n in counts.items():
+        start = next((i for i, code in enumerate(stack) if code in codes), None)
+        if start is None:
+            continue
+        sample = []
+        for code in stack[start:]:
+            i = index.get(code)
+            if i is None:
+                i = index[code] = len(frames)
+                frames.append({"name": _qualname(code), "file": code.co_filename, "line": code.co_firstlineno})
+            sample.append(i)
+        samples.append(sample)
+        weights.append(n * interval_ms)
+    return {
+        "$schema": SPEEDSCOPE_SCHEMA,
+        "name": name,
+        "exporter": "student-management-api",
+        "shared": {"frames": frames},
+        "profiles": [{"type": "sampled", "name": name, "unit": "milliseconds", "startValue": 0,
+                      "endValue": sum(weights), "samples": samples, "weights": weights}],
+    }
+
+
+def to_collapsed(profile: dict) -> str:
+    """speedscope -> collapsed stacks ('a;b;c 12'), đầu vào của flamegraph.pl/inferno"""
+    frames = profile["shared"]["frames"]
+    lines = {}
+    p = profile["profiles"][0]
+    for sample, weight in zip(p["samples"], p["weights"]):
+        key = ";".join(f"{frames[i]['name']} ({os.path.basename(frames[i]['file'])}:{frames[i]['line']})"
+                       for i in sample)
+        lines[key] = lines.get(key, 0) + weight
+    return "".join(f"{k} {round(v)}\n" for k, v in lines.items())
+
+
+class ProfileStore:
+    """Thư mục profile giới hạn PROFILE_MAX_FILES profile (xóa cái cũ nhất); mỗi profile kèm file .meta.json nhỏ"""
+
+    def __init__(self, directory: str, max_files: int):
+        self.dir = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def save(self, profile_id: str, profile: dict, meta: dict):
+        os.makedirs(self.dir, exist_ok=True)
+        meta = dict(meta, id=profile_id, created_at=time.time())
+        for suffix, data in ((PROFILE_SUFFIX, profile), (META_SUFFIX, meta)):
+            tmp = os.path.join(self.dir, f"{profile_id}{suffix}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, os.path.join(self.dir, profile_id + suffix))
+        with self._lock:
+            for old in self.list()[self.max_files:]:
+                for suffix in (PROFILE_SUFFIX, META_SUFFIX):
+                    try:
+                        os.remove(os.path.join(self.dir, old["id"] + suffix))
+                    except OSError:
+                        pass
+
+    def list(self) -> list:
+        """Metadata các profile, mới nhất trước"""
+        if not os.path.isdir(self.dir):
+            return []
+        items = []
+        for name in os.listdir(self.dir):
+            if name.endswith(META_SUFFIX):
+                try:
+                    with open(os.path.join(self.dir, name), encoding="utf-8") as f:
+                        items.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(items, key=lambda i: i["created_at"], reverse=True)
+
+    def load(self, profile_id: str):
+        if not PROFILE_ID_RE.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.dir, profile_id + PROFILE_SUFFIX), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+profiles = ProfileStore(PROFILE_DIR, PROFILE_MAX_FILES)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware; đặt trong cùng (gần router nhất) để đọc scope["route"] sau khi định tuyến"""
+
+    def __init__(self, app, sample_rate: float = PROFILE_SAMPLE_RATE, paths: tuple = PROFILE_PATHS):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.paths = paths
+        self.profiled = 0
+
+    def _wanted(self, scope) -> bool:
+        headers = dict(scope.get("headers", []))
+        if headers.get(PROFILE_HEADER, b"").strip() in (b"1", b"true") and \
+                is_admin(headers.get(ADMIN_TOKEN_HEADER, b"").decode("latin-1")):
+            return True
+        return (self.sample_rate > 0 and random.random() < self.sample_rate
+                and (not self.paths or scope["path"].startswith(self.paths)))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            return await self.app(scope, receive, send)
+
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        status = None
+
+        async def tagged_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = dict(message, headers=list(message.get("headers", [])) +
+                               [(b"x-profile-id", profile_id.encode())])
+            await send(message)
+
+        sampler = StackSampler(PROFILE_INTERVAL_MS / 1000)
+        sampler.start()
+        try:
+            await self.app(scope, receive, tagged_send)
+        finally:
+            sampler.stop()
+            route = scope.get("route")
+            label = f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+            profile = to_speedscope(sampler.counts, _route_codes(route), label, PROFILE_INTERVAL_MS)
+            meta = {"samples": sum(sampler.counts.values()), "method": scope["method"], "path": scope["path"],
+                    "query": scope.get("query_string", b"").decode("latin-1"),
+                    "route": getattr(route, "path", None), "tenant": scope.get("state", {}).get("tenant"),
+                    "status": status, "duration_ms": round(sampler.duration * 1000, 2),
+                    "interval_ms": PROFILE_INTERVAL_MS}
+            await run_in_threadpool(profiles.save, profile_id, profile, meta)
+            self.profiled += 1
@@ -0,0 +1,183 @@
+"""
+Cache response cho các GET tốn kém (thống kê, facets, trung bình theo kỳ...).
+
+- @cached_response() bọc endpoint: kết quả được serialize thành JSON bytes một lần và lưu trong LRU
+  giới hạn theo tổng dung lượng, khóa (tenant, route, tham số đã chuẩn hóa, data_version).
+- Tham số được chuẩn hóa sau khi FastAPI parse (thứ tự query, giá trị mặc định, bộ lọc rỗng không làm lệch khóa).
+- Single-flight: nhiều request cùng khóa bị miss đồng thời chỉ tính một lần, các request còn lại chờ kết quả
+  trong giới hạn deadline của chính chúng; request tính bị hết giờ/hủy (503/504) thì request chờ tự tính lại.
+- Header X-Cache: HIT | MISS | WAIT; số liệu hit-rate theo route ở GET /admin/cache.
+- Endpoint phải là hàm sync trả về dữ liệu JSON được (dict/list/pydantic); response_model không áp lại khi HIT.
+
+Cấu hình: RESPONSE_CACHE_MAX_BYTES (mặc định 32MB), RESPONSE_CACHE_MAX_ENTRY_BYTES (1MB),
+RESPONSE_CACHE_TTL (60 giây: giới hạn độ cũ khi chạy nhiều worker, mỗi worker có data_version riêng).
+"""
+
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from . import deadlines
+from .db import data_version
+from .deadlines import QueryCancelled, QueryTimeout
+
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+_REQUEST_PARAM = "_cache_request"
+WAIT_POLL_SECONDS = 0.05  # chu kỳ kiểm tra deadline/client ngắt kết nối khi chờ request đang tính
+
+
+class ResponseCache:
+    """LRU theo tổng số byte của body, kèm single-flight và bộ đếm theo route"""
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, body)
+        self._inflight = {}  # key -> Future của request đang tính
+        self._lock = threading.Lock()
+        self.size = 0
+        self.evictions = 0
+        self.routes = {}  # route -> bộ đếm
+
+    def _counters(self, route: str) -> dict:
+        c = self.routes.get(route)
+        if c is None:
+            c = self.routes[route] = {"hits": 0, "waits": 0, "misses": 0, "errors": 0,
+                                      "uncacheable": 0, "compute_seconds": 0.0}
+        return c
+
+    def get_or_compute(self, key, route: str, compute):
+        """Trả về (body, trạng thái HIT|WAIT|MISS); compute() -> bytes chỉ chạy ở request đầu tiên"""
+        while True:
+            with self._lock:
+                counters = self._counters(route)
+                entry = self._data.get(key)
+                if entry is not None and entry[0] >= time.monotonic():
+                    self._data.move_to_end(key)
+                    counters["hits"] += 1
+                    return entry[1], "HIT"
+                if entry is not None:
+                    self._drop(key)
+                future = self._inflight.get(key)
+                if future is None:
+                    future = self._inflight[key] = Future()
+                    counters["misses"] += 1
+                    break
+                counters["waits"] += 1
+            error = _wait(future)
+            if error is None:
+                return future.result(), "WAIT"
+            # Hết giờ/hủy là của request tính, không phải của request này: thử lại (có thể thành request tính)
+            if not isinstance(error, (QueryTimeout, QueryCancelled)):
+                raise error
+
+        t0 = time.perf_counter()
+        try:
+            body = compute()
+        except BaseException as e:
+            with self._lock:
+                counters["errors"] += 1
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            counters["compute_seconds"] += time.perf_counter() - t0
+            del self._inflight[key]
+            if len(body) <= self.max_entry_bytes:
+                self._data[key] = (time.monotonic() + self.ttl, body)
+                self.size += len(body)
+                while self.size > self.max_bytes:
+                    self._drop(next(iter(self._data)))
+                    self.evictions += 1
+            else:
+                counters["uncacheable"] += 1
+        future.set_result(body)
+        return body, "MISS"
+
+    def _drop(self, key):
+        _, body = self._data.pop(key)
+        self.size -= len(body)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            routes = {}
+            for route, c in self.routes.items():
+                total = c["hits"] + c["waits"] + c["misses"]
+                routes[route] = dict(c, compute_seconds=round(c["compute_seconds"], 3),
+                                     hit_rate=round((c["hits"] + c["waits"]) / total, 4) if total else None)
+            return {"entries": len(self._data), "bytes": self.size, "max_bytes": self.max_bytes,
+                    "evictions": self.evictions, "inflight": len(self._inflight), "ttl_seconds": self.ttl,
+                    "routes": routes}
+
+
+def _wait(future: Future):
+    """Chờ request đang tính xong, trả về lỗi của nó (None nếu thành công); hết deadline riêng thì ném lỗi"""
+    while True:
+        deadlines.check()
+        left = deadlines.remaining()
+        try:
+            return future.exception(timeout=WAIT_POLL_SECONDS if left is None else min(left, WAIT_POLL_SECONDS))
+        except FutureTimeout:
+            continue
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_MAX_ENTRY_BYTES, RESPONSE_CACHE_TTL)
+
+
+def _normalize(value):
+    """Tham số endpoint -> giá trị hashable ổn định cho khóa cache"""
+    if isinstance(value, BaseModel):
+        return tuple(sorted(value.dict(exclude_none=True).items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize(v)) for k, v in value.items()))
+    return value
+
+
+def cached_response(cache: ResponseCache = response_cache):
+    """Decorator cho endpoint GET sync; đặt dưới @router.get(...)"""
+
+    def decorator(fn):
+        sig = inspect.signature(fn)
+        request_param = next((p.name for p in sig.parameters.values() if p.annotation is Request), None)
+        params = list(sig.parameters.values())
+        if request_param is None:
+            request_param = _REQUEST_PARAM
+            params.append(inspect.Parameter(_REQUEST_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=Request))
+
+        @functools.wraps(fn)
+        def wrapper(**kwargs):
+            request = kwargs.get(request_param) if request_param != _REQUEST_PARAM \
+                else kwargs.pop(_REQUEST_PARAM, None)
+            if request is None:  # gọi trực tiếp ngoài FastAPI (script, benchmark): không cache
+                return fn(**kwargs)
+            route = getattr(request.scope.get("route"), "path", fn.__qualname__)
+            args = tuple(sorted((k, _normalize(v)) for k, v in kwargs.items()
+                                if not isinstance(v, (Request, Session))))
+            key = (getattr(request.state, "tenant", None), route, args, data_version())
+            body, status = cache.get_or_compute(key, route, lambda: JSONResponse(jsonable_encoder(fn(**kwargs))).body)
+            return Response(body, media_type="application/json", headers={"X-Cache": status})
+
+        wrapper.__signature__ = sig.replace(parameters=params)
+        return wrapper
+
+    return decorator
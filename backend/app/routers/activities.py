@@ -0,0 +1,9 @@
+from fastapi import APIRouter, Query, Request
+from ..activity import ACTIVITY_RING_SIZE, activities
+
+router = APIRouter(prefix="/activities", tags=["activities"])
+
+@router.get("")
+def list_activities(request: Request, limit: int = Query(20, ge=1, le=ACTIVITY_RING_SIZE)):
+    """N hoạt động mới nhất (mới nhất trước), đọc từ ring buffer trong bộ nhớ"""
+    return activities.latest(request.state.tenant, limit)
@@ -0,0 +1,62 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from ..admin import require_admin
+from ..maintenance import TASKS, maintenance
+from ..profiling import profiles, to_collapsed
+from ..response_cache import response_cache
+from ..slow_queries import slow_queries
+from ..writer import writes
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+@router.get("/cache")
+def get_cache_stats():
+    """Hit-rate và dung lượng của cache response theo route"""
+    return response_cache.stats()
+
+@router.delete("/cache", status_code=204)
+def clear_cache():
+    response_cache.clear()
+
+@router.get("/profiles")
+def list_profiles():
+    """Các profile đã ghi (mới nhất trước): route, status, thời gian, số mẫu"""
+    return profiles.list()
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, format: str = Query("speedscope", pattern="^(speedscope|collapsed)$")):
+    """speedscope JSON (mở bằng speedscope.app) hoặc collapsed stacks (flamegraph.pl)"""
+    profile = profiles.load(profile_id)
+    if profile is None:
+        raise HTTPException(404, "Profile not found")
+    return PlainTextResponse(to_collapsed(profile)) if format == "collapsed" else profile
+
+@router.get("/slow-queries")
+def get_slow_queries(order_by: str = Query("total_ms", pattern="^(total_ms|count|max_ms|avg_ms)$"),
+                     limit: int = Query(20, ge=1, le=500)):
+    """Câu SQL chậm gom theo câu đã chuẩn hóa (kèm EXPLAIN QUERY PLAN) và các lần chậm gần nhất"""
+    return slow_queries.stats(order_by, limit)
+
+@router.delete("/slow-queries", status_code=204)
+def reset_slow_queries():
+    slow_queries.reset()
+
+@router.get("/maintenance")
+def get_maintenance():
+    """Trạng thái bảo trì từng DB: lần ANALYZE/vacuum/checkpoint gần nhất, trang trống, kích thước WAL"""
+    return maintenance.stats()
+
+@router.post("/maintenance/run")
+def run_maintenance(task: str = Query("all", pattern="^(all|search|analyze|vacuum|checkpoint|convert)$"),
+                    tenant: Optional[str] = None):
+    """Chạy ngay (bỏ qua ngưỡng) cho mọi DB hoặc một DB; task=convert (VACUUM toàn bộ) chỉ chạy khi gọi riêng"""
+    results = maintenance.run(TASKS if task == "all" else (task,), only=tenant, force=True)
+    if tenant and not results:
+        raise HTTPException(404, "Database not found")
+    return results
+
+@router.get("/writes")
+def get_write_stats():
+    """Group commit: số job, số lô, kích thước/thời gian trung bình của một lô"""
+    return writes.stats()
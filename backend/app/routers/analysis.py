@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from .. import schemas
+from ..db import data_version
+from ..jobs import PIPELINES, JobQueueFull, jobs
+from .students import get_db
+
+router = APIRouter(prefix="/analysis", tags=["analysis"])
+
+@router.post("/jobs", response_model=schemas.AnalysisJobOut, status_code=202)
+def create_job(payload: schemas.AnalysisJobIn, request: Request, response: Response,
+               db: Session = Depends(get_db)):
+    """Chạy phân tích nền; dữ liệu chưa đổi thì trả về job đã có (200)"""
+    unknown = set(payload.analyses) - set(PIPELINES)
+    if unknown or not payload.analyses:
+        raise HTTPException(400, f"analyses must be a non-empty subset of {sorted(PIPELINES)}")
+    db_path = db.get_bind().url.database
+    if not db_path or db_path == ":memory:":
+        raise HTTPException(400, "Analysis requires a file-backed database")
+    analyses = [name for name in PIPELINES if name in payload.analyses]
+    try:
+        job, created = jobs.submit(db_path, request.state.tenant, analyses, data_version())
+    except JobQueueFull:
+        raise HTTPException(429, "Too many analysis jobs running", headers={"Retry-After": "5"})
+    if not created:
+        response.status_code = 200
+    return job
+
+@router.get("/jobs", response_model=list[schemas.AnalysisJobOut])
+def list_jobs(request: Request):
+    return jobs.list(request.state.tenant)
+
+@router.get("/jobs/{job_id}", response_model=schemas.AnalysisJobOut)
+def get_job(job_id: str, request: Request):
+    job = jobs.get(job_id, request.state.tenant)
+    if job is None: raise HTTPException(404, "Job not found")
+    return job
+
+@router.get("/jobs/{job_id}/files/{name}")
+def get_job_file(job_id: str, name: str, request: Request):
+    path = jobs.file_path(job_id, name, request.state.tenant)
+    if path is None: raise HTTPException(404, "File not found")
+    return FileResponse(path)
@@ -0,0 +1,33 @@
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Session
+from ..charts import CHARTS, renderer
+from ..db import data_version
+from .students import get_db
+
+router = APIRouter(prefix="/charts", tags=["charts"])
+
+@router.get("")
+def list_charts():
+    return [{"name": name, "group": group, "url": f"/charts/{name}.png"} for name, group in CHARTS.items()]
+
+@router.get("/{name}.png", responses={200: {"content": {"image/png": {}}}, 304: {}})
+def get_chart(name: str, request: Request,
+              width: Optional[int] = Query(None, ge=16, le=4000),
+              height: Optional[int] = Query(None, ge=16, le=4000),
+              db: Session = Depends(get_db)):
+    """Biểu đồ PNG vẽ từ dữ liệu hiện tại; hỗ trợ If-None-Match (304)"""
+    if name not in CHARTS:
+        raise HTTPException(404, "Chart not found")
+    db_path = db.get_bind().url.database
+    if not db_path or db_path == ":memory:":
+        raise HTTPException(400, "Charts require a file-backed database")
+    try:
+        etag, png = renderer.get(db_path, request.state.tenant, name, width, height, data_version())
+    except FutureTimeout:
+        raise HTTPException(503, "Chart rendering timed out", headers={"Retry-After": "5"})
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(png, media_type="image/png", headers=headers)
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from .. import schemas, crud
+from .students import get_db
+
+router = APIRouter(prefix="/classes", tags=["classes"])
+
+@router.get("", response_model=list[schemas.ClassDetail])
+def list_classes(search: str | None = Query(None, description="Tìm theo mã lớp, tên lớp hoặc GVCN"),
+                 skip: int = 0, limit: int = Query(100, ge=1, le=1000),
+                 roster: bool = Query(False, description="Kèm danh sách học sinh của từng lớp"),
+                 db: Session = Depends(get_db)):
+    """Danh sách lớp kèm số học sinh và điểm trung bình từng môn"""
+    return crud.list_classes(db, search, skip, limit, roster)
+
+@router.get("/{id}", response_model=schemas.ClassDetail)
+def get_class(id: int, db: Session = Depends(get_db)):
+    """Một lớp kèm danh sách học sinh"""
+    obj = crud.get_class(db, id)
+    if not obj: raise HTTPException(404, "Not found")
+    return obj
+
+@router.post("", response_model=schemas.ClassOut, status_code=201)
+def create_class(payload: schemas.ClassIn, db: Session = Depends(get_db)):
+    try:
+        return crud.create_class(db, payload)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+@router.put("/{id}", response_model=schemas.ClassOut)
+def update_class(id: int, payload: schemas.ClassIn, db: Session = Depends(get_db)):
+    try:
+        obj = crud.update_class(db, id, payload)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if not obj: raise HTTPException(404, "Not found")
+    return obj
+
+@router.delete("/{id}", status_code=204)
+def delete_class(id: int, db: Session = Depends(get_db)):
+    if not crud.delete_class(db, id): raise HTTPException(404, "Not found")
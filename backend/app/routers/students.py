@@ -1,86 +1,136 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
-from ..db import SessionLocal, Base, engine
-from .. import schemas, crud
+from datetime import date
+from ..db import engine, init_db, session_for
+from ..deadlines import QueryCancelled, QueryTimeout
+from ..response_cache import cached_response
+from .. import schemas, crud, analytics
 
-Base.metadata.create_all(bind=engine)
+init_db(engine)
 router = APIRouter(prefix="/students", tags=["students"])
 
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    db = session_for(getattr(request.state, "tenant", None))
     try: yield db
     finally: db.close()
 
+def get_fields(fields: str | None = Query(None, description="Chỉ trả về các cột này, vd student_code,math_score")):
+    try:
+        return crud.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+def _projected(rows):
+    """Row của SELECT hẹp -> JSON trực tiếp, bỏ qua validate StudentOut"""
+    if isinstance(rows, list):
+        return JSONResponse(jsonable_encoder([r._asdict() for r in rows]))
+    return JSONResponse(jsonable_encoder(rows._asdict()))
+
+def get_filters(home_town: str | None = None,
+                min_math: float | None = None, max_math: float | None = None,
+                min_literature: float | None = None, max_literature: float | None = None,
+                min_english: float | None = None, max_english: float | None = None,
+                born_after: date | None = None, born_before: date | None = None,
+                class_id: int | None = None):
+    return schemas.StudentFilter(
+        home_town=home_town, min_math=min_math, max_math=max_math,
+        min_literature=min_literature, max_literature=max_literature,
+        min_english=min_english, max_english=max_english,
+        born_after=born_after, born_before=born_before, class_id=class_id,
+    )
+
+def get_sort(sort: str | None = Query(None, description="Các cột sắp xếp, '-' là giảm dần, vd home_town,-math_score")):
+    try:
+        return crud.parse_sort(sort)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
 @router.get("", response_model=list[schemas.StudentOut])
-def list_students(skip: int = 0, limit: int = 100, search: str | None = Query(None), db: Session = Depends(get_db)):
-    return crud.list_students(db, skip, limit, search)
+def list_students(skip: int = 0, limit: int = Query(100, ge=1, le=1000), search: str | None = Query(None),
+                  fields: list[str] | None = Depends(get_fields),
+                  filters: schemas.StudentFilter = Depends(get_filters),
+                  sort: list = Depends(get_sort), db: Session = Depends(get_db)):
+    rows = crud.list_students(db, skip, limit, search, fields, filters, sort)
+    return _projected(rows) if fields else rows
 
 @router.get("/statistics", response_model=dict)
+@cached_response()
 def get_students_statistics(db: Session = Depends(get_db)):
-    """Lấy thống kê tổng quan về học sinh"""
-    # Lấy tất cả học sinh
-    all_students = db.query(crud.models.Student).all()
-    
-    if not all_students:
-        return {
-            "total_students": 0,
-            "avg_math_score": 0.0,
-            "avg_literature_score": 0.0,
-            "avg_english_score": 0.0,
-            "avg_overall_score": 0.0
-        }
-    
-    # Tính tổng số học sinh
-    total_students = len(all_students)
-    
-    # Tính điểm trung bình các môn
-    math_scores = []
-    literature_scores = []
-    english_scores = []
-    overall_scores = []
-    
-    for student in all_students:
-        # Lọc điểm hợp lệ (0-10)
-        if student.math_score is not None and 0 <= student.math_score <= 10:
-            math_scores.append(student.math_score)
-        if student.literature_score is not None and 0 <= student.literature_score <= 10:
-            literature_scores.append(student.literature_score)
-        if student.english_score is not None and 0 <= student.english_score <= 10:
-            english_scores.append(student.english_score)
-        
-        # Tính điểm trung bình của từng học sinh (chỉ với điểm hợp lệ)
-        student_scores = []
-        if student.math_score is not None and 0 <= student.math_score <= 10:
-            student_scores.append(student.math_score)
-        if student.literature_score is not None and 0 <= student.literature_score <= 10:
-            student_scores.append(student.literature_score)
-        if student.english_score is not None and 0 <= student.english_score <= 10:
-            student_scores.append(student.english_score)
-        
-        if student_scores:
-            avg_student = sum(student_scores) / len(student_scores)
-            overall_scores.append(avg_student)
-    
-    # Tính điểm trung bình
-    avg_math = sum(math_scores) / len(math_scores) if math_scores else 0.0
-    avg_literature = sum(literature_scores) / len(literature_scores) if literature_scores else 0.0
-    avg_english = sum(english_scores) / len(english_scores) if english_scores else 0.0
-    avg_overall = sum(overall_scores) / len(overall_scores) if overall_scores else 0.0
-    
-    return {
-        "total_students": total_students,
-        "avg_math_score": round(avg_math, 2),
-        "avg_literature_score": round(avg_literature, 2),
-        "avg_english_score": round(avg_english, 2),
-        "avg_overall_score": round(avg_overall, 2)
-    }
+    """Lấy thống kê tổng quan về học sinh (một truy vấn tổng hợp, DuckDB nếu bật)"""
+    return analytics.students_statistics(db)
+
+@router.get("/statistics/hometowns", response_model=list[dict])
+@cached_response()
+def get_hometown_statistics(order_by: str = Query("overall", pattern="^(math|literature|english|overall|total)$"),
+                            desc: bool = True, db: Session = Depends(get_db)):
+    """Điểm trung bình theo quê quán, xếp hạng theo môn"""
+    return analytics.hometown_statistics(db, order_by, desc)
+
+@router.get("/facets", response_model=dict)
+@cached_response()
+def get_student_facets(search: str | None = Query(None),
+                       filters: schemas.StudentFilter = Depends(get_filters), db: Session = Depends(get_db)):
+    """Số lượng theo quê quán, học lực, nhóm tuổi cho các dropdown lọc"""
+    return crud.student_facets(db, search, filters)
+
+# Số khóa tối đa cho mỗi lần tra cứu hàng loạt
+MAX_BATCH_KEYS = 5000
+
+@router.get("/batch", response_model=list[schemas.StudentOut])
+def get_students_batch(ids: str = Query(..., description="Danh sách id, phân tách bằng dấu phẩy"),
+                       db: Session = Depends(get_db)):
+    """Lấy nhiều học sinh theo id trong một request (thay cho N lần GET /students/{id})"""
+    try:
+        id_list = [int(x) for x in ids.split(",") if x.strip()]
+    except ValueError:
+        raise HTTPException(400, "ids must be comma-separated integers")
+    if len(id_list) > MAX_BATCH_KEYS:
+        raise HTTPException(400, f"Too many ids (max {MAX_BATCH_KEYS})")
+    return crud.get_students_by_ids(db, id_list)
+
+@router.get("/suggest", response_model=list[schemas.StudentSuggestion])
+@cached_response()
+def suggest_students(q: str = Query("", description="Tiền tố mã học sinh, họ tên (có/không dấu) hoặc email"),
+                     limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db)):
+    """Gợi ý cho ô tìm kiếm khi đang gõ (range scan trên index, không quét bảng)"""
+    return crud.suggest_students(db, q, limit)
+
+@router.post("/lookup", response_model=list[schemas.StudentOut])
+def lookup_students(payload: schemas.StudentLookup, db: Session = Depends(get_db)):
+    """Tra cứu hàng loạt theo ids và/hoặc student_codes"""
+    if len(payload.ids) + len(payload.student_codes) > MAX_BATCH_KEYS:
+        raise HTTPException(400, f"Too many keys (max {MAX_BATCH_KEYS})")
+    result = crud.get_students_by_ids(db, payload.ids)
+    seen = {s.id for s in result}
+    result += [s for s in crud.get_students_by_codes(db, payload.student_codes) if s.id not in seen]
+    return result
+
+SUBJECT_PATTERN = "^(math|literature|english)$"
+
+@router.get("/grades/periods", response_model=list[schemas.GradePeriodAverage])
+@cached_response()
+def get_grade_period_averages(period: str = Query("month", pattern="^(day|week|month)$"),
+                              subject: str | None = Query(None, pattern=SUBJECT_PATTERN),
+                              since: date | None = None, until: date | None = None,
+                              home_town: str | None = None, db: Session = Depends(get_db)):
+    """Điểm trung bình theo kỳ (ngày/tuần/tháng) từ lịch sử điểm"""
+    return crud.grade_period_averages(db, period, subject, since, until, home_town)
+
+@router.get("/{id}/grades/history", response_model=list[schemas.GradeEventOut])
+def get_grade_history(id: int, subject: str | None = Query(None, pattern=SUBJECT_PATTERN),
+                      since: date | None = None, until: date | None = None,
+                      limit: int = Query(1000, ge=1, le=10000), db: Session = Depends(get_db)):
+    """Lịch sử thay đổi điểm của một học sinh (cũ -> mới)"""
+    return crud.grade_history(db, id, subject, since, until, limit)
 
 @router.get("/{id}", response_model=schemas.StudentOut)
-def get_student(id: int, db: Session = Depends(get_db)):
-    obj = crud.get_student(db, id)
+def get_student(id: int, fields: list[str] | None = Depends(get_fields), db: Session = Depends(get_db)):
+    obj = crud.get_student(db, id, fields)
     if not obj: raise HTTPException(404, "Not found")
-    return obj
+    return _projected(obj) if fields else obj
 
 @router.post("", response_model=schemas.StudentOut, status_code=201)
 def create_student(payload: schemas.StudentIn, db: Session = Depends(get_db)):
@@ -89,9 +139,26 @@ def create_student(payload: schemas.StudentIn, db: Session = Depends(get_db)):
     except ValueError as e:
         raise HTTPException(400, str(e))
 
+def _if_match(if_match: str | None = Header(None, description="Version mong đợi (optimistic locking)")):
+    if if_match is None:
+        return None
+    try:
+        return int(if_match.strip().strip('"').removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(400, "If-Match must be a version number")
+
+def _version_conflict(e: crud.VersionConflict):
+    return HTTPException(409, {"message": "version conflict", "current_version": e.current_version})
+
 @router.put("/{id}", response_model=schemas.StudentOut)
-def update_student(id: int, payload: schemas.StudentIn, db: Session = Depends(get_db)):
-    obj = crud.update_student(db, id, payload)
+def update_student(id: int, payload: schemas.StudentUpdate, expected_version: int | None = Depends(_if_match),
+                   db: Session = Depends(get_db)):
+    try:
+        obj = crud.update_student(db, id, payload, expected_version)
+    except crud.VersionConflict as e:
+        raise _version_conflict(e)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     if not obj: raise HTTPException(404, "Not found")
     return obj
 
@@ -108,22 +175,15 @@ def get_student_by_code(student_code: str, db: Session = Depends(get_db)):
     return obj
 
 @router.patch("/by-code/{student_code}/grades", response_model=schemas.StudentOut)
-def update_student_grades(student_code: str, grades: schemas.StudentGradesUpdate, db: Session = Depends(get_db)):
+def update_student_grades(student_code: str, grades: schemas.StudentGradesUpdate,
+                          expected_version: int | None = Depends(_if_match), db: Session = Depends(get_db)):
     """Cập nhật điểm số của học sinh theo mã học sinh"""
-    student = db.query(crud.models.Student).filter(crud.models.Student.student_code == student_code).first()
+    try:
+        student = crud.update_grades(db, student_code, grades, expected_version)
+    except crud.VersionConflict as e:
+        raise _version_conflict(e)
     if not student:
         raise HTTPException(404, "Student not found")
-    
-    # Cập nhật điểm số
-    if grades.math_score is not None:
-        student.math_score = grades.math_score
-    if grades.literature_score is not None:
-        student.literature_score = grades.literature_score
-    if grades.english_score is not None:
-        student.english_score = grades.english_score
-    
-    db.commit()
-    db.refresh(student)
     return student
 
 @router.post("/login", response_model=schemas.LoginResponse)
@@ -154,6 +214,8 @@ def login(login_data: schemas.LoginRequest, db: Session = Depends(get_db)):
                 message="Tên đăng nhập hoặc email không tồn tại"
             )
             
+    except (QueryTimeout, QueryCancelled):
+        raise  # 504/503 qua exception handler, không thành "đăng nhập thất bại"
     except Exception as e:
         return schemas.LoginResponse(
             success=False,
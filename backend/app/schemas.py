@@ -12,9 +12,15 @@ class StudentIn(BaseModel):
     math_score: Optional[float] = Field(None, ge=0, le=10)
     literature_score: Optional[float] = Field(None, ge=0, le=10)
     english_score: Optional[float] = Field(None, ge=0, le=10)
+    class_id: Optional[int] = None
+
+class StudentUpdate(StudentIn):
+    """PUT: version (nếu có) là phiên bản client đã đọc, dùng cho optimistic locking"""
+    version: Optional[int] = None
 
 class StudentOut(StudentIn):
     id: int
+    version: int = 1
     class Config:
         orm_mode = True
 
@@ -23,6 +29,95 @@ class StudentGradesUpdate(BaseModel):
     math_score: Optional[float] = Field(None, ge=0, le=10)
     literature_score: Optional[float] = Field(None, ge=0, le=10)
     english_score: Optional[float] = Field(None, ge=0, le=10)
+    version: Optional[int] = None
+
+class StudentFilter(BaseModel):
+    """Bộ lọc danh sách học sinh (dịch sang WHERE ở crud.list_students)"""
+    home_town: Optional[str] = None
+    min_math: Optional[float] = None
+    max_math: Optional[float] = None
+    min_literature: Optional[float] = None
+    max_literature: Optional[float] = None
+    min_english: Optional[float] = None
+    max_english: Optional[float] = None
+    born_after: Optional[date] = None
+    born_before: Optional[date] = None
+    class_id: Optional[int] = None
+
+class StudentLookup(BaseModel):
+    """Schema cho tra cứu nhiều học sinh một lần (theo id và/hoặc mã học sinh)"""
+    ids: list[int] = []
+    student_codes: list[str] = []
+
+class StudentSuggestion(BaseModel):
+    """Một gợi ý cho ô tìm kiếm; match là trường khớp tiền tố (student_code | name | email)"""
+    id: int
+    student_code: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[str] = None
+    match: str
+
+class ClassIn(BaseModel):
+    code: str  # vd 10A1
+    name: Optional[str] = None
+    homeroom_teacher: Optional[str] = None
+    room: Optional[str] = None
+    schedule: Optional[str] = None
+
+class ClassOut(ClassIn):
+    """Lớp kèm số liệu tổng hợp (một GROUP BY cho cả trang)"""
+    id: int
+    student_count: int = 0
+    avg_math: Optional[float] = None
+    avg_literature: Optional[float] = None
+    avg_english: Optional[float] = None
+
+class ClassStudent(BaseModel):
+    id: int
+    student_code: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    math_score: Optional[float] = None
+    literature_score: Optional[float] = None
+    english_score: Optional[float] = None
+    class Config:
+        orm_mode = True
+
+class ClassDetail(ClassOut):
+    """Lớp kèm danh sách học sinh (selectinload)"""
+    students: list[ClassStudent] = []
+
+class AnalysisJobIn(BaseModel):
+    """Các phân tích cần chạy: hometown, age, top_bottom (mặc định tất cả)"""
+    analyses: list[str] = ["hometown", "age", "top_bottom"]
+
+class AnalysisJobOut(BaseModel):
+    """Trạng thái job phân tích; files tải qua /analysis/jobs/{id}/files/{name}"""
+    id: str
+    analyses: list[str]
+    data_version: int
+    status: str  # queued | running | done | failed
+    progress: Optional[dict] = None
+    created_at: float
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    result: Optional[dict] = None
+    files: list[str] = []
+
+class GradeEventOut(BaseModel):
+    """Một lần điểm thay đổi (ts: unix time, giây)"""
+    subject: str
+    score: Optional[float] = None
+    ts: int
+    class Config:
+        orm_mode = True
+
+class GradePeriodAverage(BaseModel):
+    period: str  # ngày/thứ Hai đầu tuần (yyyy-mm-dd) hoặc tháng (yyyy-mm)
+    subject: str
+    avg_score: Optional[float] = None
+    events: int
 
 class LoginRequest(BaseModel):
     """Schema cho request đăng nhập"""
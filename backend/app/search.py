@@ -0,0 +1,351 @@
+"""
+Tìm học sinh theo họ tên gần đúng: bỏ dấu tiếng Việt, chịu lỗi gõ, xếp hạng theo độ giống.
+
+- fold(): bỏ dấu (Đ -> d) + chữ thường, "Nguyễn" và "nguyen" là cùng một từ. Mỗi từ của họ tên đã fold là một
+  term (search_terms); search_term_trigrams chứa trigram của term kiểu pg_trgm ("  w "), search_postings nối
+  term -> học sinh. Từ điển tên nhỏ hơn số học sinh rất nhiều: khớp gần đúng chỉ chạm từ điển, sau đó đọc
+  postings của các term khớp bằng PRIMARY KEY (không quét students).
+- Index tính lúc ghi: trigger (models.SEARCH_DDL) đánh dấu học sinh đổi tên vào search_dirty, crud gọi sync()
+  trong chính transaction ghi; tồn đọng lớn (script nạp hàng loạt) do maintenance.py xử lý theo lô
+  SEARCH_SYNC_BATCH. Học sinh còn trong search_dirty (tối đa SEARCH_DIRTY_SCAN) được tính lại từ họ tên hiện tại
+  lúc tìm, kết quả như index đã đồng bộ; tồn đọng lớn hơn thì crud dùng ILIKE theo cùng các token.
+- Gợi ý (GET /students/suggest): từ cuối của chuỗi gõ là tiền tố -> range scan trên search_terms.term,
+  các từ trước phải khớp nguyên từ; postings của từng term đọc theo PRIMARY KEY, tối đa SUGGEST_SCAN_ROWS dòng
+  (gợi ý là best-effort, chuỗi gõ không khớp ai không được quét hết postings).
+- Xếp hạng: học sinh phải khớp mọi token của chuỗi tìm. Điểm của token là độ giống (Jaccard trigram,
+  >= SEARCH_MIN_SIMILARITY) của term khớp tốt nhất, hoặc 1.0 khi student_code/email bắt đầu bằng token và
+  SEARCH_MIN_SIMILARITY khi chỉ chứa token (như ILIKE cũ, với mọi token: "gmail" vẫn tìm theo email); điểm là
+  trung bình các token. Token có chữ số hoặc '@' chỉ so với student_code/email.
+"""
+
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+
+from sqlalchemy import Float, Integer, bindparam, text
+
+from .db import bump_data_version
+from .models import SEARCH_DDL, SEARCH_TRIGGERS
+
+SEARCH_INDEX = os.getenv("SEARCH_INDEX", "1") == "1"
+SEARCH_MIN_SIMILARITY = float(os.getenv("SEARCH_MIN_SIMILARITY", "0.4"))
+SEARCH_SYNC_MAX = int(os.getenv("SEARCH_SYNC_MAX", "500"))  # tối đa học sinh đồng bộ trong một lần ghi API
+SEARCH_SYNC_BATCH = int(os.getenv("SEARCH_SYNC_BATCH", "5000"))  # mỗi transaction của maintenance
+SEARCH_DIRTY_SCAN = int(os.getenv("SEARCH_DIRTY_SCAN", "5000"))  # tồn đọng tối đa còn tính trực tiếp khi tìm
+SUGGEST_SCAN_ROWS = int(os.getenv("SUGGEST_SCAN_ROWS", "5000"))  # postings tối đa đọc cho mỗi term khi gợi ý
+_CHUNK = 5000  # số tham số cho một câu IN
+
+
+def fold(s: str) -> str:
+    """'Nguyễn Đức' -> 'nguyen duc'"""
+    s = s.replace("Đ", "D").replace("đ", "d")
+    return "".join(c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c)).lower()
+
+
+def words(*parts) -> set:
+    """Các từ (chỉ chữ cái) của họ tên đã fold"""
+    return set(re.findall(r"[a-z]+", fold(" ".join(p for p in parts if p))))
+
+
+def trigrams(word: str) -> set:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def _in(sql: str, *names):
+    """text() với tham số danh sách cho IN :name"""
+    return text(sql).bindparams(*(bindparam(n, expanding=True) for n in names))
+
+
+def _chunks(items: list):
+    for i in range(0, len(items), _CHUNK):
+        yield items[i:i + _CHUNK]
+
+
+# ---------- Cập nhật index ----------
+
+def _term_ids(db, terms: set) -> dict:
+    """term -> id, tạo term (và trigram của nó) nếu chưa có"""
+    ids = {}
+    for chunk in _chunks(sorted(terms)):
+        ids.update(db.execute(_in("SELECT term, id FROM search_terms WHERE term IN :terms", "terms"),
+                              {"terms": chunk}).all())
+    new = sorted(terms - ids.keys())
+    if new:
+        db.execute(text("INSERT INTO search_terms (term, df) VALUES (:term, 0)"), [{"term": t} for t in new])
+        for chunk in _chunks(new):
+            created = dict(db.execute(_in("SELECT term, id FROM search_terms WHERE term IN :terms", "terms"),
+                                      {"terms": chunk}).all())
+            db.execute(text("INSERT INTO search_term_trigrams (trigram, term_id) VALUES (:g, :t)"),
+                       [{"g": g, "t": i} for term, i in created.items() for g in trigrams(term)])
+            ids.update(created)
+    return ids
+
+
+def sync(db, limit: int | None = None) -> int:
+    """Cập nhật index cho học sinh trong search_dirty (tối đa limit), không commit; trả về số học sinh đã xử lý"""
+    sql = "SELECT student_id FROM search_dirty" + (" LIMIT :n" if limit else "")
+    ids = db.execute(text(sql), {"n": limit}).scalars().all()
+    if not ids:
+        return 0
+    names, old = {}, {}
+    for chunk in _chunks(ids):
+        names.update((sid, words(last, first)) for sid, last, first in db.execute(
+            _in("SELECT id, last_name, first_name FROM students WHERE id IN :ids", "ids"), {"ids": chunk}))
+        old.update((sid, set(terms.split())) for sid, terms in db.execute(
+            _in("SELECT student_id, terms FROM search_docs WHERE student_id IN :ids", "ids"), {"ids": chunk}))
+
+    added, removed, docs, gone = [], [], [], []
+    for sid in ids:
+        new, prev = names.get(sid, set()), old.get(sid, set())
+        added += [(t, sid) for t in new - prev]
+        removed += [(t, sid) for t in prev - new]
+        if sid in names:
+            docs.append({"s": sid, "terms": " ".join(sorted(new))})
+        elif sid in old:
+            gone.append({"s": sid})
+    term_ids = _term_ids(db, {t for t, _ in added} | {t for t, _ in removed})
+    if removed:
+        db.execute(text("DELETE FROM search_postings WHERE term_id = :t AND student_id = :s"),
+                   [{"t": term_ids[t], "s": sid} for t, sid in removed])
+    if added:
+        db.execute(text("INSERT OR IGNORE INTO search_postings (term_id, student_id) VALUES (:t, :s)"),
+                   [{"t": term_ids[t], "s": sid} for t, sid in added])
+    df = Counter(term_ids[t] for t, _ in added)
+    df.subtract(term_ids[t] for t, _ in removed)
+    if df:
+        db.execute(text("UPDATE search_terms SET df = df + :d WHERE id = :t"),
+                   [{"t": t, "d": d} for t, d in df.items() if d])
+    if docs:
+        db.execute(text("INSERT INTO search_docs (student_id, terms) VALUES (:s, :terms) "
+                        "ON CONFLICT (student_id) DO UPDATE SET terms = excluded.terms"), docs)
+    if gone:
+        db.execute(text("DELETE FROM search_docs WHERE student_id = :s"), gone)
+    for chunk in _chunks(ids):
+        db.execute(_in("DELETE FROM search_dirty WHERE student_id IN :ids", "ids"), {"ids": chunk})
+    return len(ids)
+
+
+def sync_on_write(db):
+    """Gọi trong transaction ghi của crud: đồng bộ phần vừa đánh dấu, để tồn đọng lớn cho maintenance"""
+    if not SEARCH_INDEX:
+        return
+    pending = db.execute(text("SELECT count(*) FROM (SELECT 1 FROM search_dirty LIMIT :n)"),
+                         {"n": SEARCH_SYNC_MAX + 1}).scalar()
+    if pending and pending <= SEARCH_SYNC_MAX:
+        sync(db)
+
+
+def catch_up(eng) -> int:
+    """Cho maintenance.py: tạo lại trigger nếu mất (vd students bị tạo lại bằng script), xử lý hết search_dirty.
+    Ghi qua engine nên tự tăng data_version: kết quả tìm/gợi ý đã cache lúc index chưa đồng bộ bị bỏ"""
+    total = 0
+    with eng.begin() as conn:
+        names = set(conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'").scalars())
+        if not names.issuperset(SEARCH_TRIGGERS):
+            for ddl in SEARCH_DDL:  # kèm đánh dấu lại toàn bộ học sinh
+                conn.exec_driver_sql(ddl)
+    while True:
+        with eng.begin() as conn:  # mỗi lô một transaction, không giữ lock ghi quá lâu
+            n = sync(conn, SEARCH_SYNC_BATCH)
+        total += n
+        if n < SEARCH_SYNC_BATCH:
+            if total:
+                bump_data_version()
+            return total
+
+
+# ---------- Truy vấn ----------
+
+def pending(db) -> bool:
+    """Còn học sinh chưa đồng bộ index (search_dirty)"""
+    return db.execute(text("SELECT 1 FROM search_dirty LIMIT 1")).first() is not None
+
+
+def stale(db, ids: list) -> set:
+    """Các id trong ids còn trong search_dirty (postings là họ tên cũ)"""
+    return set(db.execute(_in("SELECT student_id FROM search_dirty WHERE student_id IN :ids", "ids"),
+                          {"ids": ids}).scalars()) if ids else set()
+
+
+def tokens(search: str) -> list:
+    """-> [(chuỗi gốc, khóa, từ tên)], học sinh phải khớp mọi token. Token có chữ số hoặc '@' (từ tên None): khóa chữ
+    thường khớp chuỗi con của student_code/email; còn lại từ tên (bỏ dấu) khớp gần đúng họ tên và tiền tố mã/email"""
+    result, seen = [], set()
+    for piece in search.split():
+        if re.search(r"[0-9@]", piece):
+            items = [(piece, piece.lower(), None)]
+        else:
+            items = [(run, w, w) for run in re.findall(r"[^\W\d_]+", piece)
+                     if (w := "".join(re.findall(r"[a-z]+", fold(run))))]
+        for raw, key, word in items:
+            if (key, word) not in seen:
+                seen.add((key, word))
+                result.append((raw, key, word))
+    return result
+
+
+def like_escape(s: str) -> str:
+    """Thoát %, _ và \\ để dùng trong LIKE ... ESCAPE '\\'"""
+    return re.sub(r"([\\%_])", r"\\\1", s)
+
+
+def _matches(db, word: str) -> list:
+    """[(term_id, độ giống, df)] các term đủ giống word"""
+    grams = trigrams(word)
+    rows = db.execute(_in("SELECT id, term, df FROM search_terms WHERE df > 0 AND id IN "
+                          "(SELECT term_id FROM search_term_trigrams WHERE trigram IN :grams)", "grams"),
+                      {"grams": sorted(grams)})
+    return [(i, round(s, 4), df) for i, term, df in rows
+            if (s := similarity(grams, trigrams(term))) >= SEARCH_MIN_SIMILARITY]
+
+
+# Đọc postings theo thứ tự khóa (co-routine, dừng khi đủ LIMIT ngoài), tối đa :scan dòng
+_SCAN = "SELECT student_id FROM search_postings WHERE term_id = :t ORDER BY student_id LIMIT :scan"
+
+
+def prefix_matches(db, search: str, limit: int) -> list:
+    """id học sinh có các từ trong họ tên khớp search (từ cuối là tiền tố, bỏ dấu), tối đa limit, cho gợi ý"""
+    *complete, prefix = re.findall(r"[a-z]+", fold(search)) or [""]
+    if not prefix:
+        return []
+    exact = []
+    for w in complete:
+        row = db.execute(text("SELECT id, df FROM search_terms WHERE term = :w AND df > 0"), {"w": w}).first()
+        if row is None:
+            return []
+        exact.append(tuple(row))
+    # Term trùng khít trước, rồi term phổ biến hơn
+    terms = db.execute(text("SELECT id, df FROM search_terms WHERE term >= :p AND term < :end AND df > 0 "
+                            "ORDER BY term != :p, df DESC"), {"p": prefix, "end": prefix + "\uffff"}).all()
+    if not terms:
+        return []
+
+    def exists(i):
+        return f" AND EXISTS (SELECT 1 FROM search_postings x{i} WHERE x{i}.term_id = :x{i} " \
+               f"AND x{i}.student_id = p.student_id)"
+
+    exact.sort(key=lambda t: t[1])
+    if exact and exact[0][1] < sum(df for _, df in terms):
+        # Từ đầy đủ hiếm nhất dẫn (đọc theo thứ tự khóa, dừng ở LIMIT), tiền tố chỉ kiểm tra bằng khóa
+        (driver, _), *rest = exact
+        params = dict({f"x{i}": t for i, (t, _) in enumerate(rest)},
+                      t=driver, n=limit, scan=SUGGEST_SCAN_ROWS, prefix=[t for t, _ in terms])
+        sql = (f"SELECT p.student_id FROM ({_SCAN}) p WHERE 1{''.join(map(exists, range(len(rest))))} "
+               "AND EXISTS (SELECT 1 FROM search_postings y WHERE y.term_id IN :prefix "
+               "AND y.student_id = p.student_id) LIMIT :n")
+        return db.execute(_in(sql, "prefix"), params).scalars().all()
+
+    params = dict({f"x{i}": t for i, (t, _) in enumerate(exact)}, n=limit, scan=SUGGEST_SCAN_ROWS)
+    where = "".join(map(exists, range(len(exact))))
+    ids = []
+    for term_id, _ in terms[:limit]:
+        rows = db.execute(text(f"SELECT p.student_id FROM ({_SCAN}) p WHERE 1{where} LIMIT :n"),
+                          dict(params, t=term_id)).scalars()
+        ids += [sid for sid in rows if sid not in ids]
+        if len(ids) >= limit:
+            break
+    return ids[:limit]
+
+
+def _values(name: str, terms: list, params: dict) -> str:
+    rows = []
+    for j, (term_id, sim, _) in enumerate(terms):
+        params[f"{name}_t{j}"], params[f"{name}_s{j}"] = term_id, sim
+        rows.append(f"(:{name}_t{j}, :{name}_s{j})")
+    return f"{name}(term_id, sim) AS (VALUES {', '.join(rows)})"
+
+
+def _dirty_names(db, ids: list, names: list) -> list:
+    """Học sinh chưa đồng bộ index: với mỗi từ tên, {student_id: độ giống} tính từ họ tên hiện tại như index"""
+    found = [{} for _ in names]
+    grams = [trigrams(w) if w else None for w in names]
+    for chunk in _chunks(ids):
+        for sid, last, first in db.execute(
+                _in("SELECT id, last_name, first_name FROM students WHERE id IN :ids", "ids"), {"ids": chunk}):
+            terms = [trigrams(t) for t in words(last, first)]
+            for i, g in enumerate(grams):
+                sim = max((similarity(g, t) for t in terms), default=0.0) if g else 0.0
+                if sim >= SEARCH_MIN_SIMILARITY:
+                    found[i][sid] = round(sim, 4)
+    return found
+
+
+def _key_score(col: str, i: int, default: str = "NULL", substring: bool = True) -> str:
+    """1.0 khi col bắt đầu bằng khóa của token i, SEARCH_MIN_SIMILARITY khi chỉ chứa khóa (substring)"""
+    contains = f"WHEN {col} LIKE :s{i} ESCAPE '\\' THEN :min " if substring else ""
+    return f"CASE WHEN {col} LIKE :p{i} ESCAPE '\\' THEN 1.0 {contains}ELSE {default} END"
+
+
+def ranked(db, search: str):
+    """Subquery (student_id, score) các học sinh khớp search; None khi tắt index, search không có token nào
+    hoặc tồn đọng quá SEARCH_DIRTY_SCAN học sinh chưa đồng bộ (crud dùng ILIKE theo từng token)"""
+    toks = tokens(search)
+    if not SEARCH_INDEX or not toks:
+        return None
+    dirty = db.execute(text("SELECT student_id FROM search_dirty LIMIT :n"),
+                       {"n": SEARCH_DIRTY_SCAN + 1}).scalars().all()
+    if len(dirty) > SEARCH_DIRTY_SCAN:
+        return None
+    names = [word for _, _, word in toks]
+    matches = [_matches(db, w) if w else [] for w in names]
+    # Postings của học sinh chưa đồng bộ đã cũ: bỏ đi, tính lại từ họ tên hiện tại
+    extra = _dirty_names(db, dirty, names) if dirty else [{} for _ in toks]
+    clean = " AND {} NOT IN (SELECT student_id FROM search_dirty)" if dirty else ""
+    # Token có ít postings nhất dẫn truy vấn: học sinh khớp tên + học sinh có mã/email khớp khóa; các token còn lại
+    # chỉ kiểm tra trên các học sinh đó. Chuỗi con (quét index student_code/email) chỉ với token có chữ số/'@',
+    # từ tên chỉ khớp tiền tố mã/email (token dẫn: range scan trên index NOCASE)
+    d, *others = sorted(range(len(toks)), key=lambda i: sum(df for _, _, df in matches[i]) + len(extra[i]))
+    params, ctes = {}, []
+    for i, (_, key, word) in enumerate(toks):
+        if word is not None and i == d:
+            params[f"lo{i}"], params[f"hi{i}"] = key, key + "\uffff"
+        else:
+            params[f"p{i}"] = like_escape(key) + "%"
+        if word is None:
+            params[f"s{i}"], params["min"] = "%" + like_escape(key) + "%", SEARCH_MIN_SIMILARITY
+        if matches[i]:
+            ctes.append(_values(f"w{i}", matches[i], params))
+        if extra[i]:
+            params[f"x{i}"] = json.dumps(list(extra[i].items()))
+            ctes.append(f"x{i}(student_id, sim) AS "
+                        f"(SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(:x{i}))")
+
+    if names[d] is None:
+        source = [f"SELECT id AS student_id, {_key_score(col, d)} AS score FROM students "
+                  f"WHERE {col} LIKE :s{d} ESCAPE '\\'" for col in ("student_code", "email")]
+    else:
+        source = [f"SELECT id AS student_id, 1.0 AS score FROM students "
+                  f"WHERE {col} COLLATE NOCASE >= :lo{d} AND {col} COLLATE NOCASE < :hi{d}"
+                  for col in ("student_code", "email")]
+    if matches[d]:
+        source.append(f"SELECT p.student_id, w{d}.sim FROM w{d} JOIN search_postings p "
+                      f"ON p.term_id = w{d}.term_id{clean.format('p.student_id')}")
+    if extra[d]:
+        source.append(f"SELECT student_id, sim FROM x{d}")
+    head = f"SELECT student_id, max(score) AS sc{d} FROM ({' UNION ALL '.join(source)}) GROUP BY student_id"
+    if not others:
+        sql = f"SELECT student_id, sc{d} AS score FROM ({head})"
+    else:
+        cols = []
+        for i in others:
+            parts = [_key_score(f"s.{col}", i, "0", names[i] is None) for col in ("student_code", "email")]
+            if matches[i]:
+                parts.append(f"coalesce((SELECT max(w{i}.sim) FROM w{i} JOIN search_postings q "
+                             f"ON q.term_id = w{i}.term_id AND q.student_id = d.student_id"
+                             f"{clean.format('q.student_id')}), 0)")
+            if extra[i]:
+                parts.append(f"coalesce((SELECT sim FROM x{i} WHERE student_id = d.student_id), 0)")
+            cols.append(f"max({', '.join(parts)}) AS sc{i}")
+        score = " + ".join(f"sc{i}" for i in range(len(toks)))
+        sql = (f"SELECT student_id, ({score}) / {len(toks)}.0 AS score FROM (SELECT d.student_id, d.sc{d}, "
+               f"{', '.join(cols)} FROM ({head}) d JOIN students s ON s.id = d.student_id) "
+               f"WHERE {' AND '.join(f'sc{i} > 0' for i in others)}")
+    sql = f"{'WITH ' + ', '.join(ctes) + ' ' if ctes else ''}{sql}"
+    return text(sql).bindparams(**params).columns(student_id=Integer, score=Float).subquery("ranked")
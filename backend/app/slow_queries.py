@@ -0,0 +1,143 @@
+"""
+Nhật ký câu SQL chậm (hook ở mức engine, đăng ký trong db.py).
+
+- Câu lệnh chạy lâu hơn SLOW_QUERY_MS (mặc định 50ms; 0 = ghi mọi câu) được ghi lại kèm "hình dạng"
+  tham số (kiểu + số lượng, không ghi giá trị) và EXPLAIN QUERY PLAN (tính một lần cho mỗi câu đã chuẩn hóa).
+- Gom theo câu lệnh đã chuẩn hóa (literal -> ?, IN (?, ?, ...) -> IN (?...)): count, tổng/max thời gian,
+  có SCAN toàn bảng hay không -> GET /admin/slow-queries xếp theo tổng thời gian.
+- Từng lần chậm được ghi JSON lines vào SLOW_QUERY_LOG_FILE (RotatingFileHandler; chuỗi rỗng để tắt).
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import re
+import threading
+import time
+from collections import deque
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "50"))
+SLOW_QUERY_LOG_FILE = os.getenv("SLOW_QUERY_LOG_FILE", "./logs/slow_queries.log")
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "3"))
+MAX_STATEMENTS = 500  # số câu chuẩn hóa tối đa giữ trong bảng tổng hợp
+RECENT_SIZE = 100
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    s = _STRING.sub("?", statement)
+    s = _NUMBER.sub("?", s)
+    s = _IN_LIST.sub("(?...)", s)
+    return _SPACES.sub(" ", s).strip()
+
+
+def params_shape(parameters, executemany: bool) -> str:
+    """(1, 'a', 'b', None) -> 'int, str×2, NoneType' (không lộ giá trị)"""
+    if executemany:
+        return f"executemany×{len(parameters)}"
+    if isinstance(parameters, dict):
+        parameters = list(parameters.values())
+    parts = []
+    for p in parameters or ():
+        name = type(p).__name__
+        if parts and parts[-1][0] == name:
+            parts[-1][1] += 1
+        else:
+            parts.append([name, 1])
+    return ", ".join(n if c == 1 else f"{n}×{c}" for n, c in parts)
+
+
+def is_full_scan(plan: list) -> bool:
+    """SCAN bảng không qua index (SCAN ... USING INDEX vẫn là quét nhưng theo thứ tự index)"""
+    return any(line.startswith("SCAN ") and " USING " not in line for line in plan)
+
+
+class SlowQueryLog:
+    """Bảng tổng hợp theo câu chuẩn hóa + ring các lần chậm gần nhất + file log xoay vòng"""
+
+    def __init__(self, threshold_ms: float, log_file: str):
+        self.threshold = threshold_ms / 1000
+        self.log_file = log_file
+        self._lock = threading.Lock()
+        self._stats = {}  # câu chuẩn hóa -> tổng hợp
+        self._plans = {}  # câu chuẩn hóa -> EXPLAIN QUERY PLAN
+        self.recent = deque(maxlen=RECENT_SIZE)
+        self._logger = None
+
+    def _file_logger(self):
+        if self._logger is not None or not self.log_file:
+            return self._logger
+        with self._lock:
+            if self._logger is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.log_file)), exist_ok=True)
+                logger = logging.getLogger("backend.slow_queries")
+                logger.propagate = False
+                logger.setLevel(logging.INFO)
+                logger.addHandler(logging.handlers.RotatingFileHandler(
+                    self.log_file, maxBytes=SLOW_QUERY_LOG_MAX_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS,
+                    encoding="utf-8"))
+                self._logger = logger
+        return self._logger
+
+    def _plan(self, cursor, statement: str, key: str, parameters, executemany: bool) -> list:
+        plan = self._plans.get(key)
+        if plan is None:
+            if executemany:
+                parameters = parameters[0] if parameters else ()
+            try:
+                # Cursor DBAPI thô: không đi qua event của SQLAlchemy, không đệ quy vào hook này
+                rows = cursor.connection.execute("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+                plan = [r[-1] for r in rows]
+            except Exception as e:
+                plan = [f"(explain failed: {e})"]
+            if len(self._plans) >= 2 * MAX_STATEMENTS:
+                self._plans.clear()
+            self._plans[key] = plan
+        return plan
+
+    def record(self, cursor, statement: str, parameters, executemany: bool, elapsed: float, database):
+        key = normalize(statement)
+        plan = self._plan(cursor, statement, key, parameters, executemany)
+        ms = round(elapsed * 1000, 2)
+        entry = {"ts": time.time(), "ms": ms, "statement": key, "params": params_shape(parameters, executemany),
+                 "plan": plan, "full_scan": is_full_scan(plan), "database": database}
+        with self._lock:
+            s = self._stats.get(key)
+            if s is None:
+                if len(self._stats) >= MAX_STATEMENTS:
+                    del self._stats[min(self._stats, key=lambda k: self._stats[k]["total_ms"])]
+                s = self._stats[key] = {"statement": key, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                        "plan": plan, "full_scan": entry["full_scan"], "params": entry["params"]}
+            s["count"] += 1
+            s["total_ms"] += ms
+            s["max_ms"] = max(s["max_ms"], ms)
+            s["last_ms"], s["last_seen"] = ms, entry["ts"]
+            self.recent.append(entry)
+        logger = self._file_logger()
+        if logger is not None:
+            logger.info(json.dumps(entry, ensure_ascii=False))
+
+    def top(self, order_by: str = "total_ms", limit: int = 20) -> list:
+        with self._lock:
+            items = [dict(s, total_ms=round(s["total_ms"], 2), avg_ms=round(s["total_ms"] / s["count"], 2))
+                     for s in self._stats.values()]
+        return sorted(items, key=lambda s: s[order_by], reverse=True)[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._plans.clear()
+            self.recent.clear()
+
+    def stats(self, order_by: str = "total_ms", limit: int = 20) -> dict:
+        return {"threshold_ms": self.threshold * 1000, "log_file": self.log_file or None,
+                "statements": self.top(order_by, limit), "recent": list(self.recent)[::-1][:limit]}
+
+
+slow_queries = SlowQueryLog(SLOW_QUERY_MS, SLOW_QUERY_LOG_FILE)
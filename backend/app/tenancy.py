@@ -0,0 +1,46 @@
+"""
+Định tuyến tenant (mỗi trường một SQLite riêng).
+
+Tenant lấy từ header `X-Tenant-ID` hoặc tiền tố đường dẫn `/t/{tenant}/...`
+(tiền tố được bỏ đi trước khi tới router). Không có tenant -> students.db mặc định.
+"""
+
+import json
+
+from .db import TENANT_ID_RE
+
+TENANT_HEADER = b"x-tenant-id"
+PATH_PREFIX = "/t/"
+
+
+class TenantMiddleware:
+    """ASGI middleware gắn `request.state.tenant`"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        tenant = None
+        for name, value in scope.get("headers", []):
+            if name == TENANT_HEADER:
+                tenant = value.decode("latin-1").strip().lower()
+                break
+        path = scope["path"]
+        if path.startswith(PATH_PREFIX):
+            tenant, _, rest = path[len(PATH_PREFIX):].partition("/")
+            tenant = tenant.lower()
+            scope = dict(scope, path="/" + rest, raw_path=("/" + rest).encode())
+
+        if tenant and not TENANT_ID_RE.match(tenant):
+            body = json.dumps({"detail": "Invalid tenant id"}).encode()
+            await send({"type": "http.response.start", "status": 400,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        scope.setdefault("state", {})["tenant"] = tenant or None
+        await self.app(scope, receive, send)
@@ -0,0 +1,209 @@
+"""
+Group commit: mọi thao tác ghi của crud đi qua một writer duy nhất cho mỗi file SQLite.
+
+- Nhiều desktop cùng lưu điểm thì mỗi request một transaction + một lần fsync, SQLite xếp hàng chúng
+  bằng lock ("database is locked" khi chờ quá busy timeout). Ở đây request chỉ nộp hàm ghi vào hàng đợi;
+  thread writer gom các hàm tới gần nhau (tối đa WRITE_BATCH_MAX; đang có tải đồng thời thì chờ thêm tối đa
+  WRITE_BATCH_DELAY_MS) vào một transaction BEGIN IMMEDIATE, một lần COMMIT, rồi trả kết quả/lỗi riêng
+  cho từng request.
+- Mỗi hàm chạy trong SAVEPOINT riêng: hàm lỗi (trùng mã, xung đột version...) chỉ rollback phần của nó.
+- Hàm chạy trong context của request nộp nó, nên deadline (deadlines.py) vẫn áp dụng cho từng hàm;
+  commit xong thì deadline của request được nhả (deadlines.release()).
+- Writer dùng engine riêng (1 connection; tắt BEGIN ngầm của pysqlite để SAVEPOINT chạy đúng),
+  tự dừng sau WRITE_IDLE_SECONDS không có việc (tenant ít dùng không giữ thread/file), hoặc ngay khi TenantRegistry
+  đóng tenant (LRU, close()) nên số writer không vượt MAX_OPEN_TENANTS + DB mặc định.
+- Writer gắn với file của engine mà Session của request đang dùng (tenant, DB của script/benchmark).
+  SQLite in-memory không mở được connection thứ hai tới cùng DB nên ghi thẳng trên Session.
+- WRITE_GROUP_COMMIT=0: ghi thẳng trên Session của request như trước (để so sánh bằng bench_writes.py).
+"""
+
+import contextvars
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import deadlines
+
+WRITE_GROUP_COMMIT = os.getenv("WRITE_GROUP_COMMIT", "1") == "1"
+WRITE_BATCH_MAX = int(os.getenv("WRITE_BATCH_MAX", "128"))
+WRITE_BATCH_DELAY_MS = float(os.getenv("WRITE_BATCH_DELAY_MS", "1"))
+WRITE_IDLE_SECONDS = float(os.getenv("WRITE_IDLE_SECONDS", "60"))
+
+
+def _writer_engine(url):
+    eng = create_engine(url, connect_args={"check_same_thread": False}, pool_size=1, max_overflow=0)
+
+    @event.listens_for(eng, "connect")
+    def _no_implicit_begin(dbapi_conn, connection_record):
+        dbapi_conn.isolation_level = None  # pysqlite không tự BEGIN/COMMIT quanh SAVEPOINT
+
+    @event.listens_for(eng, "begin")
+    def _begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")  # giữ lock ghi ngay từ đầu lô
+
+    return eng
+
+
+def _file_db(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:") \
+        and url.query.get("mode") != "memory"
+
+
+def _apply(db: Session, fn):
+    result = fn(db)
+    db.flush()  # lỗi ràng buộc thuộc về hàm này, không lộ ra lúc RELEASE SAVEPOINT
+    return result
+
+
+class GroupCommitWriter:
+    """Hàng đợi + thread ghi theo lô cho một file SQLite (tenant)"""
+
+    def __init__(self, registry, key, tenant, url):
+        self.registry = registry
+        self.key = key
+        self.tenant = tenant
+        self.queue = queue.Queue()
+        self.last_batch = 0
+        self.engine = _writer_engine(url)
+        self.maker = sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+        self.thread = threading.Thread(target=self._run, name=f"db-writer-{tenant or 'default'}", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=WRITE_IDLE_SECONDS)]
+            except queue.Empty:
+                if self.registry._retire(self):
+                    self.engine.dispose()
+                    return
+                continue
+            # Chỉ chờ thêm khi đang có tải đồng thời (lô trước > 1 job), ghi lẻ không bị cộng độ trễ
+            delay = WRITE_BATCH_DELAY_MS / 1000 if self.last_batch > 1 else 0.0
+            deadline = time.monotonic() + delay
+            while batch[-1] is not None and len(batch) < WRITE_BATCH_MAX:
+                try:
+                    remaining = deadline - time.monotonic()
+                    batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            closing = batch[-1] is None  # close(): ghi nốt các job đã nhận rồi dừng
+            if closing:
+                batch.pop()
+            if batch:
+                self.last_batch = len(batch)
+                self._commit(batch)
+            if closing:
+                self.engine.dispose()
+                return
+
+    def _commit(self, batch):
+        """Một transaction cho cả lô; mỗi job một SAVEPOINT"""
+        outcomes = []  # (future, kết quả, lỗi)
+        db = self.maker()
+        db.info["tenant"] = self.tenant
+        t0 = time.perf_counter()
+        try:
+            db.connection()  # BEGIN IMMEDIATE ngoài context của job (không bị deadline của job ngắt)
+            for future, ctx, fn in batch:
+                savepoint = db.begin_nested()
+                try:
+                    result = ctx.run(_apply, db, fn)
+                    savepoint.commit()
+                    db.expunge_all()  # object trả về của các job không dùng chung identity map
+                    outcomes.append((future, result, None))
+                except Exception as e:
+                    savepoint.rollback()  # kể cả khi flush lỗi đã vô hiệu savepoint
+                    outcomes.append((future, None, e))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            outcomes = [(future, None, error or e) for future, _, error in outcomes]
+            outcomes += [(future, None, e) for future, _, _ in batch[len(outcomes):]]
+        finally:
+            db.close()
+        self.registry._record(len(batch), sum(error is not None for _, _, error in outcomes),
+                              time.perf_counter() - t0)
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+class WriteRegistry:
+    """Writer theo file SQLite (tạo khi cần, tự bỏ khi rảnh) + số liệu lô cho GET /admin/writes"""
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._writers = {}
+        self._lock = threading.Lock()
+        self.jobs = 0
+        self.batches = 0
+        self.failed = 0
+        self.max_batch = 0
+        self.batch_seconds = 0.0
+
+    def run(self, db: Session, fn):
+        """fn(session) ghi (không commit), trả về kết quả sau khi commit; lỗi của fn được ném lại nguyên vẹn"""
+        url = db.get_bind().url
+        if not self.enabled or not _file_db(url):
+            try:
+                result = fn(db)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            deadlines.release()
+            return result
+        key = url.render_as_string(hide_password=False)
+        future = Future()
+        with self._lock:
+            writer = self._writers.get(key)
+            if writer is None:
+                writer = self._writers[key] = GroupCommitWriter(self, key, db.info.get("tenant"), url)
+            writer.queue.put((future, contextvars.copy_context(), fn))
+        result = future.result()
+        deadlines.release()  # đã commit: đọc lại/ghi nhật ký sau đó không được trả 503/504
+        return result
+
+    def _retire(self, writer) -> bool:
+        with self._lock:
+            if not writer.queue.empty():
+                return False
+            if self._writers.get(writer.key) is writer:
+                del self._writers[writer.key]
+            return True
+
+    def close(self, url):
+        """Dừng writer của file (tenant bị đóng); job đã xếp hàng vẫn được ghi, job mới tạo writer mới"""
+        with self._lock:
+            writer = self._writers.pop(url.render_as_string(hide_password=False), None)
+            if writer is not None:
+                writer.queue.put(None)
+
+    def _record(self, size: int, failed: int, seconds: float):
+        with self._lock:
+            self.jobs += size
+            self.batches += 1
+            self.failed += failed
+            self.max_batch = max(self.max_batch, size)
+            self.batch_seconds += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"enabled": self.enabled, "writers": [w.tenant or "default" for w in self._writers.values()],
+                    "queued": sum(w.queue.qsize() for w in self._writers.values()),
+                    "jobs": self.jobs, "batches": self.batches, "failed_jobs": self.failed,
+                    "avg_batch": round(self.jobs / self.batches, 2) if self.batches else None,
+                    "max_batch": self.max_batch,
+                    "avg_batch_ms": round(self.batch_seconds * 1000 / self.batches, 2) if self.batches else None,
+                    "batch_max": WRITE_BATCH_MAX, "batch_delay_ms": WRITE_BATCH_DELAY_MS}
+
+
+writes = WriteRegistry(WRITE_GROUP_COMMIT)
@@ -5,6 +5,11 @@ Constants và cấu hình cho ứng dụng
 # API Configuration
 API_BASE_URL = "http://127.0.0.1:8000"
 API_TIMEOUT = 15  # seconds, align with desktop usage
+API_RETRIES = 3  # số lần thử lại POST/PUT/PATCH (an toàn nhờ Idempotency-Key)
+API_RETRY_BACKOFF = 0.5  # seconds, nhân đôi sau mỗi lần thử
+SUGGEST_DELAY_MS = 150  # chờ ngừng gõ rồi mới gọi GET /students/suggest
+SUGGEST_LIMIT = 10
+SUGGEST_TIMEOUT = 2  # seconds, gợi ý chạy trên UI thread nên không chờ lâu
 
 # Authentication
 VALID_USERNAME = "usertest"
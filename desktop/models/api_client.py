@@ -3,35 +3,89 @@ Simple API client for communicating with the backend server.
 Centralizes all network calls so views don't import requests directly.
 """
 
-from typing import Any, Dict
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import requests
 
-from config.constants import API_BASE_URL, API_TIMEOUT
-
-
-def get_students(page: int = 1, page_size: int = 12, search: str = "") -> Dict[str, Any]:
-    params: Dict[str, Any] = {"page": page, "page_size": page_size}
+from config.constants import (API_BASE_URL, API_RETRIES, API_RETRY_BACKOFF, API_TIMEOUT, SUGGEST_LIMIT,
+                              SUGGEST_TIMEOUT)
+
+# Server ngắt truy vấn trước khi client bỏ cuộc (504) thay vì chạy tiếp cho không ai nhận
+DEADLINE_HEADERS = {"X-Request-Timeout": str(max(API_TIMEOUT - 1, 1))}
+
+# Số dòng tối đa mỗi lần gọi GET /students (le của tham số limit phía server)
+STUDENTS_PAGE_LIMIT = 1000
+
+
+def _send_idempotent(method: str, url: str, payload: Dict[str, Any]) -> requests.Response:
+    """
+    Gửi POST/PUT/PATCH kèm Idempotency-Key, thử lại khi timeout/mất kết nối/5xx.
+    Mọi lần thử dùng chung một key nên server không thực thi lại request đã commit.
+    """
+    headers = {"Idempotency-Key": uuid.uuid4().hex, **DEADLINE_HEADERS}
+    for attempt in range(API_RETRIES + 1):
+        try:
+            response = requests.request(method, url, json=payload, headers=headers, timeout=API_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == API_RETRIES:
+                raise
+        else:
+            if response.status_code < 500 or attempt == API_RETRIES:
+                return response
+        time.sleep(API_RETRY_BACKOFF * (2 ** attempt))
+    return response
+
+
+def get_students(page: int = 1, page_size: int = 12, search: str = "",
+                 fields: Optional[Sequence[str]] = None, sort: Optional[Sequence[str]] = None,
+                 filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    fields: chỉ lấy các cột cần thiết (server SELECT hẹp, payload nhỏ hơn)
+    sort: vd ["home_town", "-math_score"] ('-' là giảm dần)
+    filters: vd {"home_town": "HaNoi", "min_math": 8, "born_after": "2005-01-01"}
+    """
+    params: Dict[str, Any] = {"limit": STUDENTS_PAGE_LIMIT}
     if search:
         params["search"] = search
-    response = requests.get(f"{API_BASE_URL}/students", params=params, timeout=API_TIMEOUT)
+    if fields:
+        params["fields"] = ",".join(fields)
+    if sort:
+        params["sort"] = ",".join(sort)
+    if filters:
+        params.update({k: v for k, v in filters.items() if v not in (None, "")})
+    # Server giới hạn limit: lấy lần lượt từng trang skip/limit rồi phân trang phía client như trước
+    data: List[Dict[str, Any]] = []
+    while True:
+        params["skip"] = len(data)
+        response = requests.get(f"{API_BASE_URL}/students", params=params,
+                                headers=DEADLINE_HEADERS, timeout=API_TIMEOUT)
+        response.raise_for_status()
+        batch = response.json()
+        if not isinstance(batch, list):
+            return batch
+        data.extend(batch)
+        if len(batch) < STUDENTS_PAGE_LIMIT:
+            break
+    total = len(data)
+    start = (page - 1) * page_size
+    return {
+        "meta": {"total": total, "page": page, "page_size": page_size},
+        "items": data[start : start + page_size],
+    }
+
+
+def suggest_students(q: str, limit: int = SUGGEST_LIMIT) -> List[Dict[str, Any]]:
+    """Gợi ý theo tiền tố mã học sinh / họ tên (có hoặc không dấu) / email, cho ô tìm kiếm khi đang gõ"""
+    response = requests.get(f"{API_BASE_URL}/students/suggest", params={"q": q, "limit": limit},
+                            headers={"X-Request-Timeout": str(SUGGEST_TIMEOUT)}, timeout=SUGGEST_TIMEOUT)
     response.raise_for_status()
-    data = response.json()
-    # Support both paginated dict or raw list responses from backend
-    if isinstance(data, list):
-        total = len(data)
-        start = (page - 1) * page_size
-        return {
-            "meta": {"total": total, "page": page, "page_size": page_size},
-            "items": data[start : start + page_size],
-        }
-    
-    print("Test", data)
-    return data
+    return response.json()
 
 
 def create_student(payload: Dict[str, Any]) -> Dict[str, Any]:
-    response = requests.post(f"{API_BASE_URL}/students", json=payload, timeout=API_TIMEOUT)
+    response = _send_idempotent("POST", f"{API_BASE_URL}/students", payload)
     if response.status_code not in (200, 201):
         # Raise for non-success to allow callers to fallback to local behavior
         response.raise_for_status()
@@ -39,15 +93,14 @@ def create_student(payload: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def update_student(student_id: int, payload: Dict[str, Any]) -> Dict[str, Any]:
-    response = requests.put(
-        f"{API_BASE_URL}/students/{student_id}", json=payload, timeout=API_TIMEOUT
-    )
+    response = _send_idempotent("PUT", f"{API_BASE_URL}/students/{student_id}", payload)
     response.raise_for_status()
     return response.json()
 
 
 def delete_student(student_id: int) -> bool:
-    response = requests.delete(f"{API_BASE_URL}/students/{student_id}", timeout=API_TIMEOUT)
+    response = requests.delete(f"{API_BASE_URL}/students/{student_id}",
+                               headers=DEADLINE_HEADERS, timeout=API_TIMEOUT)
     if response.status_code not in (200, 204):
         response.raise_for_status()
     return True
@@ -55,18 +108,112 @@ def delete_student(student_id: int) -> bool:
 
 def update_student_grades(student_code: str, grades: Dict[str, Any]) -> Dict[str, Any]:
     """Cập nhật điểm số của học sinh theo mã học sinh"""
-    response = requests.patch(
-        f"{API_BASE_URL}/students/by-code/{student_code}/grades", 
-        json=grades, 
-        timeout=API_TIMEOUT
-    )
+    response = _send_idempotent("PATCH", f"{API_BASE_URL}/students/by-code/{student_code}/grades", grades)
+    response.raise_for_status()
+    return response.json()
+
+
+def get_classes(search: str = "", roster: bool = False) -> List[Dict[str, Any]]:
+    """Danh sách lớp (kèm số học sinh, điểm TB); search lọc phía server theo mã/tên/GVCN"""
+    params: Dict[str, Any] = {"limit": 1000}
+    if search:
+        params["search"] = search
+    if roster:
+        params["roster"] = "true"
+    response = requests.get(f"{API_BASE_URL}/classes", params=params,
+                            headers=DEADLINE_HEADERS, timeout=API_TIMEOUT)
     response.raise_for_status()
     return response.json()
 
 
+def get_class(class_id: int) -> Dict[str, Any]:
+    """Một lớp kèm danh sách học sinh"""
+    response = requests.get(f"{API_BASE_URL}/classes/{class_id}",
+                            headers=DEADLINE_HEADERS, timeout=API_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def create_class(payload: Dict[str, Any]) -> Dict[str, Any]:
+    response = _send_idempotent("POST", f"{API_BASE_URL}/classes", payload)
+    response.raise_for_status()
+    return response.json()
+
+
+def update_class(class_id: int, payload: Dict[str, Any]) -> Dict[str, Any]:
+    response = _send_idempotent("PUT", f"{API_BASE_URL}/classes/{class_id}", payload)
+    response.raise_for_status()
+    return response.json()
+
+
+def delete_class(class_id: int) -> bool:
+    response = requests.delete(f"{API_BASE_URL}/classes/{class_id}",
+                               headers=DEADLINE_HEADERS, timeout=API_TIMEOUT)
+    if response.status_code not in (200, 204):
+        response.raise_for_status()
+    return True
+
+
 def get_statistics() -> Dict[str, Any]:
     """Lấy thống kê tổng quan về học sinh"""
-    response = requests.get(f"{API_BASE_URL}/students/statistics", timeout=API_TIMEOUT)
+    response = requests.get(f"{API_BASE_URL}/students/statistics",
+                            headers=DEADLINE_HEADERS, timeout=API_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def start_analysis(analyses: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Gửi job phân tích (hometown, age, top_bottom); dữ liệu chưa đổi thì server trả job cũ"""
+    payload = {"analyses": list(analyses)} if analyses else {}
+    response = requests.post(f"{API_BASE_URL}/analysis/jobs", json=payload,
+                             headers=DEADLINE_HEADERS, timeout=API_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def get_analysis_job(job_id: str) -> Dict[str, Any]:
+    """Trạng thái/tiến độ job phân tích"""
+    response = requests.get(f"{API_BASE_URL}/analysis/jobs/{job_id}",
+                            headers=DEADLINE_HEADERS, timeout=API_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def get_analysis_file(job_id: str, name: str) -> bytes:
+    """Tải một file kết quả (PNG, result.json, log.txt) của job"""
+    response = requests.get(f"{API_BASE_URL}/analysis/jobs/{job_id}/files/{name}",
+                            headers=DEADLINE_HEADERS, timeout=API_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+
+def list_charts() -> List[Dict[str, Any]]:
+    """Danh sách biểu đồ server có thể vẽ"""
+    response = requests.get(f"{API_BASE_URL}/charts", headers=DEADLINE_HEADERS, timeout=API_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def get_chart(name: str, width: Optional[int] = None, height: Optional[int] = None,
+              etag: Optional[str] = None) -> Tuple[Optional[str], Optional[bytes]]:
+    """
+    Tải biểu đồ PNG vẽ từ dữ liệu hiện tại (width/height: khung thu nhỏ, giữ tỉ lệ).
+    Trả về (etag, png); png là None khi ảnh chưa đổi so với etag đã có (304).
+    """
+    params = {k: v for k, v in (("width", width), ("height", height)) if v}
+    headers = dict(DEADLINE_HEADERS, **({"If-None-Match": etag} if etag else {}))
+    response = requests.get(f"{API_BASE_URL}/charts/{name}.png", params=params,
+                            headers=headers, timeout=API_TIMEOUT)
+    if response.status_code == 304:
+        return etag, None
+    response.raise_for_status()
+    return response.headers.get("ETag"), response.content
+
+
+def get_activities(limit: int = 20) -> List[Dict[str, Any]]:
+    """Các hoạt động ghi gần nhất (mới nhất trước)"""
+    response = requests.get(f"{API_BASE_URL}/activities", params={"limit": limit},
+                            headers=DEADLINE_HEADERS, timeout=API_TIMEOUT)
     response.raise_for_status()
     return response.json()
 
@@ -77,7 +224,8 @@ def login(username: str, password: str) -> Dict[str, Any]:
         "username": username,
         "password": password
     }
-    response = requests.post(f"{API_BASE_URL}/students/login", json=payload, timeout=API_TIMEOUT)
+    response = requests.post(f"{API_BASE_URL}/students/login", json=payload,
+                             headers=DEADLINE_HEADERS, timeout=API_TIMEOUT)
     response.raise_for_status()
     return response.json()
 
@@ -3,8 +3,9 @@ Utils package - Chứa các utility functions
 """
 
 from .window_utils import WindowUtils
+from .autocomplete import SuggestionPopup
 
-__all__ = ['WindowUtils']
+__all__ = ['WindowUtils', 'SuggestionPopup']
 
 
 
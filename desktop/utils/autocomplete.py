@@ -0,0 +1,112 @@
+"""
+Gợi ý khi gõ cho ô tìm kiếm học sinh (GET /students/suggest)
+"""
+
+import tkinter as tk
+
+from config.constants import SUGGEST_DELAY_MS, SUGGEST_LIMIT
+from models import api_client
+
+
+def _label(item):
+    name = " ".join(p for p in (item.get("last_name"), item.get("first_name")) if p)
+    return "  ·  ".join(p for p in (item["student_code"], name, item.get("email")) if p)
+
+
+class SuggestionPopup:
+    """Danh sách gợi ý nổi dưới một Entry; chọn (click/Enter) thì điền mã học sinh và gọi on_pick(item)"""
+
+    def __init__(self, entry, var: tk.StringVar, on_pick, placeholder: str = ""):
+        self.entry = entry
+        self.var = var
+        self.on_pick = on_pick
+        self.placeholder = placeholder
+        self.items = []
+        self.top = None
+        self.listbox = None
+        self._after = None
+        self._last_query = None
+        entry.bind("<KeyRelease>", self._on_key, add="+")
+        entry.bind("<Down>", self._focus_list, add="+")
+        entry.bind("<Escape>", lambda _e: self.hide(), add="+")
+        entry.bind("<FocusOut>", lambda _e: entry.after(200, self._hide_if_unfocused), add="+")
+
+    def _on_key(self, event):
+        if event.keysym in ("Down", "Up", "Return", "Escape", "Tab"):
+            return
+        # Chỉ gọi API khi người dùng ngừng gõ SUGGEST_DELAY_MS
+        if self._after is not None:
+            self.entry.after_cancel(self._after)
+        self._after = self.entry.after(SUGGEST_DELAY_MS, self._refresh)
+
+    def _refresh(self):
+        self._after = None
+        query = self.var.get().strip()
+        if not query or query == self.placeholder:
+            self._last_query = None
+            self.hide()
+            return
+        if query == self._last_query:
+            return
+        self._last_query = query
+        try:
+            self.items = api_client.suggest_students(query, SUGGEST_LIMIT)
+        except Exception as e:
+            print(f"Error loading suggestions: {e}")
+            self.items = []
+        if self.items:
+            self._show()
+        else:
+            self.hide()
+
+    def _build(self):
+        self.top = tk.Toplevel(self.entry)
+        self.top.wm_overrideredirect(True)
+        self.listbox = tk.Listbox(self.top, activestyle="dotbox", exportselection=False,
+                                  relief="solid", borderwidth=1)
+        self.listbox.pack(fill="both", expand=True)
+        self.listbox.bind("<ButtonRelease-1>", self._pick)
+        self.listbox.bind("<Return>", self._pick)
+        self.listbox.bind("<Escape>", lambda _e: (self.hide(), self.entry.focus_set()))
+        self.listbox.bind("<FocusOut>", lambda _e: self.entry.after(200, self._hide_if_unfocused))
+
+    def _show(self):
+        if self.top is None:
+            self._build()
+        self.listbox.delete(0, "end")
+        for item in self.items:
+            self.listbox.insert("end", _label(item))
+        self.listbox.configure(height=len(self.items))
+        self.top.geometry(f"{self.entry.winfo_width()}x{self.listbox.winfo_reqheight()}"
+                          f"+{self.entry.winfo_rootx()}+{self.entry.winfo_rooty() + self.entry.winfo_height()}")
+        self.top.deiconify()
+        self.top.lift()
+
+    def hide(self):
+        if self.top is not None:
+            self.top.withdraw()
+
+    def _hide_if_unfocused(self):
+        focus = self.entry.focus_get()
+        if focus is not self.entry and focus is not self.listbox:
+            self.hide()
+
+    def _focus_list(self, _event=None):
+        if self.top is not None and self.items and self.top.winfo_viewable():
+            self.listbox.focus_set()
+            self.listbox.selection_clear(0, "end")
+            self.listbox.selection_set(0)
+            self.listbox.activate(0)
+            return "break"
+
+    def _pick(self, _event=None):
+        selection = self.listbox.curselection()
+        if not selection:
+            return
+        item = self.items[selection[0]]
+        self.hide()
+        self._last_query = item["student_code"]
+        self.var.set(item["student_code"])
+        self.entry.focus_set()
+        self.entry.icursor("end")
+        self.on_pick(item)
@@ -6,6 +6,12 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from .base_view import BaseContentView
 from config.constants import COLORS
+from models import api_client
+
+# Trường của lớp trên form thêm/sửa: (khóa API, nhãn)
+CLASS_FORM_FIELDS = (("code", "Mã lớp"), ("name", "Tên lớp"), ("homeroom_teacher", "GVCN"),
+                     ("room", "Phòng"), ("schedule", "Ca học"))
+SEARCH_DELAY_MS = 300  # chờ gõ xong mới gọi API tìm kiếm
 
 
 class ClassesManagementView(BaseContentView):
@@ -14,7 +20,8 @@ class ClassesManagementView(BaseContentView):
     def __init__(self, parent_frame: ttk.Frame):
         # Khởi tạo dữ liệu trước khi gọi super().__init__()
         self.classes_data = []
-        self._load_sample_data()
+        self._search_job = None
+        self._load_classes()
         
         super().__init__(parent_frame, "📚 Quản lý lớp học")
         self._setup_white_background()
@@ -47,20 +54,13 @@ class ClassesManagementView(BaseContentView):
                     if isinstance(child, ttk.Frame):
                         child.configure(style="White.TFrame")
     
-    def _load_sample_data(self):
-        """Load dữ liệu mẫu cho lớp học"""
-        self.classes_data = [
-            {"class_id": "10A1", "class_name": "Lớp 10A1", "homeroom_teacher": "Nguyễn Văn A", 
-             "student_count": 35, "room": "A101", "schedule": "Sáng"},
-            {"class_id": "10A2", "class_name": "Lớp 10A2", "homeroom_teacher": "Trần Thị B", 
-             "student_count": 32, "room": "A102", "schedule": "Sáng"},
-            {"class_id": "11A1", "class_name": "Lớp 11A1", "homeroom_teacher": "Lê Văn C", 
-             "student_count": 30, "room": "B101", "schedule": "Chiều"},
-            {"class_id": "11A2", "class_name": "Lớp 11A2", "homeroom_teacher": "Phạm Thị D", 
-             "student_count": 28, "room": "B102", "schedule": "Chiều"},
-            {"class_id": "12A1", "class_name": "Lớp 12A1", "homeroom_teacher": "Hoàng Văn E", 
-             "student_count": 33, "room": "C101", "schedule": "Sáng"},
-        ]
+    def _load_classes(self, search: str = ""):
+        """Tải danh sách lớp từ API (lọc theo search phía server)"""
+        try:
+            self.classes_data = api_client.get_classes(search=search)
+        except Exception as e:
+            print(f"Error loading classes: {e}")
+            self.classes_data = []
     
     def _create_toolbar(self):
         """Tạo toolbar với các nút chức năng"""
@@ -151,45 +151,22 @@ class ClassesManagementView(BaseContentView):
         for item in self.tree.get_children():
             self.tree.delete(item)
         
-        # Thêm dữ liệu mới
+        # Thêm dữ liệu mới (iid là id lớp trên server)
         for class_item in self.classes_data:
-            self.tree.insert("", "end", values=(
-                class_item["class_id"],
-                class_item["class_name"],
-                class_item["homeroom_teacher"],
+            self.tree.insert("", "end", iid=str(class_item["id"]), values=(
+                class_item["code"],
+                class_item.get("name") or "",
+                class_item.get("homeroom_teacher") or "",
                 class_item["student_count"],
-                class_item["room"],
-                class_item["schedule"]
+                class_item.get("room") or "",
+                class_item.get("schedule") or ""
             ))
     
     def _on_search(self, event=None):
-        """Xử lý tìm kiếm"""
-        search_term = self.search_var.get().lower()
-        if not search_term:
-            self._load_classes_to_table()
-            return
-        
-        # Filter data
-        filtered_data = [
-            class_item for class_item in self.classes_data
-            if search_term in class_item["class_name"].lower() or 
-               search_term in class_item["homeroom_teacher"].lower() or
-               search_term in class_item["class_id"].lower()
-        ]
-        
-        # Update table
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        for class_item in filtered_data:
-            self.tree.insert("", "end", values=(
-                class_item["class_id"],
-                class_item["class_name"],
-                class_item["homeroom_teacher"],
-                class_item["student_count"],
-                class_item["room"],
-                class_item["schedule"]
-            ))
+        """Tìm kiếm phía server, gọi API sau khi ngừng gõ SEARCH_DELAY_MS"""
+        if self._search_job is not None:
+            self.tree.after_cancel(self._search_job)
+        self._search_job = self.tree.after(SEARCH_DELAY_MS, self.refresh)
     
     def _on_double_click(self, event):
         """Xử lý double click"""
@@ -201,7 +178,7 @@ class ClassesManagementView(BaseContentView):
     
     def _add_class(self):
         """Thêm lớp mới"""
-        messagebox.showinfo("Thông báo", "Chức năng thêm lớp - Đang phát triển")
+        self._show_class_popup()
     
     def _edit_class(self):
         """Sửa thông tin lớp"""
@@ -209,24 +186,61 @@ class ClassesManagementView(BaseContentView):
         if not selected:
             messagebox.showwarning("Cảnh báo", "Vui lòng chọn lớp cần sửa")
             return
-        messagebox.showinfo("Thông báo", "Chức năng sửa lớp - Đang phát triển")
+        class_item = next((c for c in self.classes_data if str(c["id"]) == selected[0]), None)
+        if class_item:
+            self._show_class_popup(class_item)
+    
+    def _show_class_popup(self, class_item=None):
+        """Popup thêm (class_item=None) hoặc sửa lớp"""
+        popup = tk.Toplevel(self.parent_frame.winfo_toplevel())
+        popup.title("Sửa lớp" if class_item else "Thêm lớp")
+        popup.resizable(False, False)
+        popup.transient(self.parent_frame.winfo_toplevel())
+        popup.grab_set()
+        
+        form_frame = ttk.Frame(popup, padding=20)
+        form_frame.pack(fill="both", expand=True)
+        variables = {}
+        for row, (key, label) in enumerate(CLASS_FORM_FIELDS):
+            ttk.Label(form_frame, text=f"{label}:").grid(row=row, column=0, sticky="w", pady=5)
+            variables[key] = tk.StringVar(value=(class_item or {}).get(key) or "")
+            ttk.Entry(form_frame, textvariable=variables[key], width=30).grid(row=row, column=1, padx=(10, 0), pady=5)
+        
+        def save():
+            payload = {key: var.get().strip() or None for key, var in variables.items()}
+            if not payload["code"]:
+                messagebox.showwarning("Cảnh báo", "Vui lòng nhập mã lớp", parent=popup)
+                return
+            try:
+                if class_item:
+                    api_client.update_class(class_item["id"], payload)
+                else:
+                    api_client.create_class(payload)
+            except Exception as e:
+                messagebox.showerror("Lỗi", f"Không thể lưu lớp: {e}", parent=popup)
+                return
+            popup.destroy()
+            self.refresh()
+        
+        button_frame = ttk.Frame(form_frame)
+        button_frame.grid(row=len(CLASS_FORM_FIELDS), column=0, columnspan=2, pady=(15, 0))
+        ttk.Button(button_frame, text="💾 Lưu", command=save).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="Hủy", command=popup.destroy).pack(side="left", padx=5)
     
     def _delete_class(self):
-        """Xóa lớp"""
+        """Xóa lớp (học sinh của lớp thành chưa xếp lớp)"""
         selected = self.tree.selection()
         if not selected:
             messagebox.showwarning("Cảnh báo", "Vui lòng chọn lớp cần xóa")
             return
         
         if messagebox.askyesno("Xác nhận", "Bạn có chắc chắn muốn xóa lớp này?"):
-            # Xóa khỏi data
-            item = self.tree.item(selected[0])
-            class_id = item['values'][0]
-            self.classes_data = [c for c in self.classes_data if c['class_id'] != class_id]
-            
-            # Cập nhật table
-            self._load_classes_to_table()
-            self._update_status()
+            try:
+                api_client.delete_class(int(selected[0]))
+            except Exception as e:
+                messagebox.showerror("Lỗi", f"Không thể xóa lớp: {e}")
+                return
+            self.refresh()
             messagebox.showinfo("Thành công", "Đã xóa lớp thành công")
     
     def _update_status(self):
@@ -236,6 +250,8 @@ class ClassesManagementView(BaseContentView):
     
     def refresh(self):
         """Refresh view"""
+        self._search_job = None
+        self._load_classes(self.search_var.get().strip())
         self._load_classes_to_table()
         self._update_status()
 
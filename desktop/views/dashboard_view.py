@@ -3,9 +3,31 @@ Dashboard View - Trang chủ dashboard
 """
 
 import tkinter as tk
+from datetime import datetime
 from tkinter import ttk
 from .base_view import BaseContentView
 from config.constants import COLORS
+from models.api_client import get_activities, get_statistics
+
+SUBJECT_NAMES = {"math_score": "Toán", "literature_score": "Văn", "english_score": "Anh"}
+
+
+def format_activity(event):
+    """Sự kiện từ GET /activities -> dòng hiển thị"""
+    details = event.get("details") or {}
+    who = details.get("name") or event.get("student_code") or "?"
+    when = datetime.fromtimestamp(event["ts"]).strftime("%d/%m %H:%M")
+    action = event["action"]
+    if action == "create":
+        text = f"Thêm học sinh {who} ({event.get('student_code')})"
+    elif action == "delete":
+        text = f"Xóa học sinh {who} ({event.get('student_code')})"
+    elif action == "grades":
+        scores = ", ".join(f"{SUBJECT_NAMES[k]} {v}" for k, v in details.items() if k in SUBJECT_NAMES)
+        text = f"Cập nhật điểm {who}: {scores}"
+    else:
+        text = f"Cập nhật thông tin học sinh {who}"
+    return f"[{when}] {text}"
 
 
 class DashboardView(BaseContentView):
@@ -15,6 +37,7 @@ class DashboardView(BaseContentView):
         # Khởi tạo dữ liệu trước khi gọi super().__init__()
         self.dashboard_data = {}
         self._load_sample_data()
+        self._load_data_from_api()
         
         super().__init__(parent_frame, "📊 Dashboard")
         self._setup_white_background()
@@ -68,6 +91,18 @@ class DashboardView(BaseContentView):
             ]
         }
     
+    def _load_data_from_api(self):
+        """Tổng số/điểm TB từ /students/statistics, hoạt động gần đây từ /activities"""
+        try:
+            stats = get_statistics()
+            self.dashboard_data['total_students'] = stats.get('total_students', 0)
+            self.dashboard_data['avg_score'] = stats.get('avg_overall_score', 0.0)
+            self.dashboard_data['recent_activities'] = [
+                format_activity(e) for e in get_activities(limit=10)
+            ] or ["Chưa có hoạt động nào"]
+        except Exception as e:
+            print(f"Lỗi khi tải dữ liệu dashboard từ API: {e}")
+    
     def _create_welcome_section(self):
         """Tạo phần chào mừng"""
         welcome_frame = ttk.Frame(self.content_frame, style="White.TFrame")
@@ -150,6 +185,7 @@ class DashboardView(BaseContentView):
     def refresh(self):
         """Refresh dashboard data"""
         self._load_sample_data()
+        self._load_data_from_api()
         # Có thể thêm logic refresh UI ở đây
 
 
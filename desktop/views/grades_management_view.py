@@ -7,6 +7,20 @@ from tkinter import ttk, messagebox
 from .base_view import BaseContentView
 from config.constants import COLORS
 from models import api_client
+from utils.autocomplete import SuggestionPopup
+
+
+# Các cột bảng điểm cần từ API
+GRADE_FIELDS = ("id", "student_code", "first_name", "last_name", "home_town",
+                "math_score", "literature_score", "english_score")
+
+# Môn -> (cột điểm, tham số lọc điểm tối thiểu) của API
+SUBJECT_FILTERS = {
+    "Toán": ("math_score", "min_math"),
+    "Văn": ("literature_score", "min_literature"),
+    "Anh": ("english_score", "min_english"),
+}
+ALL_OPTION = "Tất cả"
 
 
 class GradesManagementView(BaseContentView):
@@ -16,6 +30,13 @@ class GradesManagementView(BaseContentView):
         # Khởi tạo dữ liệu trước khi gọi super().__init__()
         self.grades_data = []
         self.search_var = tk.StringVar()
+        self.home_town_var = tk.StringVar(value=ALL_OPTION)
+        self.subject_var = tk.StringVar(value=ALL_OPTION)
+        self.min_score_var = tk.StringVar()
+        self.home_towns = []
+        self.class_var = tk.StringVar(value=ALL_OPTION)
+        self.class_ids = {}  # mã lớp -> id lớp trên server
+        self._load_classes()
         # self._load_sample_data()
         self.load_students()
         
@@ -55,16 +76,54 @@ class GradesManagementView(BaseContentView):
                     if isinstance(child, ttk.Frame):
                         child.configure(style="White.TFrame")
 
+    def _build_query(self):
+        """Chuyển các bộ lọc trên toolbar thành tham số filters/sort cho API"""
+        filters = {}
+        sort = []
+        home_town = self.home_town_var.get()
+        if home_town and home_town != ALL_OPTION:
+            filters["home_town"] = home_town
+        class_id = self.class_ids.get(self.class_var.get())
+        if class_id is not None:
+            filters["class_id"] = class_id
+        subject = SUBJECT_FILTERS.get(self.subject_var.get())
+        if subject:
+            column, min_param = subject
+            sort.append(f"-{column}")
+            try:
+                min_score = float(self.min_score_var.get())
+                filters[min_param] = min_score
+            except ValueError:
+                pass
+        return filters, sort
+
+    def _load_classes(self):
+        """Danh sách lớp cho combobox lọc"""
+        try:
+            self.class_ids = {c["code"]: c["id"] for c in api_client.get_classes()}
+        except Exception as e:
+            print(f"Error loading classes: {e}")
+            self.class_ids = {}
+
     def load_students(self):
         """Load danh sách học sinh"""
+        search = self.search_var.get()
+        if search == "Tìm kiếm học sinh":
+            search = ""
+        filters, sort = self._build_query()
         try:
-            response = api_client.get_students(page=1, page_size=1000, search= self.search_var.get())
+            response = api_client.get_students(page=1, page_size=1000, search=search,
+                                              fields=GRADE_FIELDS,
+                                              sort=sort, filters=filters)
             # Lấy danh sách học sinh từ response
             if isinstance(response, dict) and "items" in response:
                 self.grades_data = response["items"]
             else:
                 self.grades_data = response if isinstance(response, list) else []
             print("Binh test grades_data 2", self.grades_data)
+            if not filters:
+                # Danh sách quê quán cho combobox lấy từ lần tải không lọc
+                self.home_towns = sorted({g.get("home_town") for g in self.grades_data if g.get("home_town")})
         except Exception as e:
             print(f"Error loading students: {e}")
             self.grades_data = []
@@ -85,6 +144,9 @@ class GradesManagementView(BaseContentView):
             if val == "":
                 self.search_var.set("Tìm kiếm học sinh")
         search_view.bind("<FocusOut>", _on_focus_out)
+        # Gợi ý khi đang gõ; chọn một học sinh thì tải bảng điểm theo mã đó
+        self._suggestions = SuggestionPopup(search_view, self.search_var, lambda _item: self._on_search(),
+                                            "Tìm kiếm học sinh")
         
         edit_btn = ttk.Button(toolbar_frame, text="Tìm kiếm", 
                             command=self._on_search)
@@ -110,18 +172,33 @@ class GradesManagementView(BaseContentView):
         filter_frame.grid(row=0, column=6, sticky="e")
         
         ttk.Label(filter_frame, text="Lớp:", style="White.TLabel").grid(row=0, column=0, padx=(0, 3))
-        self.class_var = tk.StringVar()
-        class_combo = ttk.Combobox(filter_frame, textvariable=self.class_var, width=8)
-        class_combo['values'] = ("Tất cả", "10A1", "10A2", "11A1", "11A2", "12A1")
-        class_combo.set("Tất cả")
+        class_combo = ttk.Combobox(filter_frame, textvariable=self.class_var, width=8, state="readonly")
+        class_combo['values'] = (ALL_OPTION,) + tuple(self.class_ids)
         class_combo.grid(row=0, column=1, padx=(0, 5))
-        
-        ttk.Label(filter_frame, text="Môn:", style="White.TLabel").grid(row=0, column=2, padx=(0, 3))
-        self.subject_var = tk.StringVar()
-        subject_combo = ttk.Combobox(filter_frame, textvariable=self.subject_var, width=8)
-        subject_combo['values'] = ("Tất cả", "Toán", "Lý", "Hóa", "Sinh", "Văn")
-        subject_combo.set("Tất cả")
-        subject_combo.grid(row=0, column=3)
+        class_combo.bind("<<ComboboxSelected>>", lambda e: self._apply_filters())
+        
+        ttk.Label(filter_frame, text="Quê quán:", style="White.TLabel").grid(row=0, column=2, padx=(0, 3))
+        self.home_town_combo = ttk.Combobox(filter_frame, textvariable=self.home_town_var, width=12, state="readonly")
+        self.home_town_combo['values'] = (ALL_OPTION,) + tuple(self.home_towns)
+        self.home_town_combo.grid(row=0, column=3, padx=(0, 5))
+        self.home_town_combo.bind("<<ComboboxSelected>>", lambda e: self._apply_filters())
+        
+        ttk.Label(filter_frame, text="Môn:", style="White.TLabel").grid(row=0, column=4, padx=(0, 3))
+        subject_combo = ttk.Combobox(filter_frame, textvariable=self.subject_var, width=8, state="readonly")
+        subject_combo['values'] = (ALL_OPTION,) + tuple(SUBJECT_FILTERS)
+        subject_combo.grid(row=0, column=5, padx=(0, 5))
+        subject_combo.bind("<<ComboboxSelected>>", lambda e: self._apply_filters())
+        
+        ttk.Label(filter_frame, text="Điểm ≥", style="White.TLabel").grid(row=0, column=6, padx=(0, 3))
+        min_score_entry = ttk.Entry(filter_frame, textvariable=self.min_score_var, width=5)
+        min_score_entry.grid(row=0, column=7)
+        min_score_entry.bind("<Return>", lambda e: self._apply_filters())
+    
+    def _apply_filters(self):
+        """Lọc/sắp xếp phía server theo lớp, quê quán, môn và điểm tối thiểu"""
+        self.load_students()
+        self._load_grades_to_table()
+        self._update_status()
     
     def _create_grades_table(self):
         """Tạo bảng danh sách điểm"""
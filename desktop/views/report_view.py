@@ -9,8 +9,13 @@ import sys
 import os
 from PIL import Image, ImageTk
 import glob
+import tempfile
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from models.api_client import get_students, get_statistics
+from models.api_client import (get_students, get_statistics, start_analysis,
+                               get_analysis_job, get_analysis_file, list_charts, get_chart)
+
+CHART_THUMB_SIZE = (800, 600)
+CHART_CACHE_DIR = os.path.join(tempfile.gettempdir(), "student-mgr-charts")
 
 
 class ReportView(BaseContentView):
@@ -24,6 +29,9 @@ class ReportView(BaseContentView):
         self.chart_images = []
         self.current_chart_index = 0
         self.data_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+        self.analysis_job_id = None
+        self.analysis_status_var = tk.StringVar(value="")
+        self._chart_etags = {}  # đường dẫn ảnh đã tải -> ETag, để hỏi lại server bằng If-None-Match
         self._load_data_from_api()
         self._load_chart_images()
         
@@ -38,6 +46,62 @@ class ReportView(BaseContentView):
         toolbar_frame = ttk.Frame(self.content_frame, style="Content.TFrame")
         toolbar_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=(0, 10))
         toolbar_frame.columnconfigure(1, weight=1)
+        
+        self.analysis_btn = ttk.Button(toolbar_frame, text="▶ Chạy phân tích", command=self._run_analysis)
+        self.analysis_btn.grid(row=0, column=0, padx=(0, 10))
+        ttk.Label(toolbar_frame, textvariable=self.analysis_status_var,
+                  style="Content.TLabel").grid(row=0, column=1, sticky="w")
+    
+    def _run_analysis(self):
+        """Gửi job phân tích lên server rồi theo dõi tiến độ"""
+        try:
+            job = start_analysis()
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Không thể chạy phân tích: {e}")
+            return
+        self.analysis_job_id = job["id"]
+        self.analysis_btn.config(state="disabled")
+        self._on_analysis_update(job)
+    
+    def _poll_analysis(self):
+        try:
+            job = get_analysis_job(self.analysis_job_id)
+        except Exception as e:
+            self.analysis_btn.config(state="normal")
+            self.analysis_status_var.set(f"Lỗi theo dõi phân tích: {e}")
+            return
+        self._on_analysis_update(job)
+    
+    def _on_analysis_update(self, job):
+        if job["status"] in ("queued", "running"):
+            progress = job.get("progress") or {}
+            self.analysis_status_var.set(
+                f"Đang phân tích: {progress.get('step', 'chờ')} ({progress.get('done', 0)}/{progress.get('total', '?')})")
+            self.content_frame.after(1000, self._poll_analysis)
+            return
+        self.analysis_btn.config(state="normal")
+        if job["status"] == "failed":
+            self.analysis_status_var.set("Phân tích thất bại")
+            messagebox.showerror("Lỗi", f"Phân tích thất bại: {job.get('error')}")
+            return
+        self._download_analysis(job)
+    
+    def _download_analysis(self, job):
+        """Tải các PNG của job về thư mục tạm (một thư mục/job) và hiển thị thay cho data/"""
+        job_dir = os.path.join(tempfile.gettempdir(), "student-mgr-analysis", job["id"])
+        os.makedirs(job_dir, exist_ok=True)
+        try:
+            for name in job.get("files", []):
+                path = os.path.join(job_dir, name)
+                if name.endswith(".png") and not os.path.exists(path):
+                    with open(path, "wb") as f:
+                        f.write(get_analysis_file(job["id"], name))
+        except Exception as e:
+            messagebox.showerror("Lỗi", f"Không tải được kết quả phân tích: {e}")
+            return
+        self.data_dir = job_dir
+        self.analysis_status_var.set(f"Đã phân tích {job['result'].get('rows', 0)} học sinh")
+        self.refresh()
     
     def _create_report_content(self):
         content_frame = ttk.Frame(self.content_frame, style="Content.TFrame")
@@ -128,7 +192,8 @@ class ReportView(BaseContentView):
             }
             
             # Lấy dữ liệu học sinh để tính thống kê chi tiết
-            students_response = get_students(page=1, page_size=10000)
+            students_response = get_students(page=1, page_size=10000, fields=(
+                "home_town", "math_score", "literature_score", "english_score"))
             self.students_data = students_response.get('items', [])
             
             # Tính thống kê chi tiết từ dữ liệu học sinh
@@ -250,8 +315,39 @@ class ReportView(BaseContentView):
                                             break
                 self._update_widget_stats(child)
     
+    def _fetch_chart(self, name, path, width=None, height=None):
+        """Tải biểu đồ về path nếu server có bản mới (ETag khác)"""
+        etag = self._chart_etags.get(path) if os.path.exists(path) else None
+        etag, content = get_chart(name, width, height, etag)
+        if content is not None:
+            with open(path, "wb") as f:
+                f.write(content)
+        self._chart_etags[path] = etag
+        return path
+    
+    def _load_server_charts(self):
+        """Biểu đồ vẽ từ dữ liệu hiện tại trên server, cỡ thumbnail"""
+        os.makedirs(CHART_CACHE_DIR, exist_ok=True)
+        charts = []
+        for chart in list_charts():
+            name = chart['name']
+            path = self._fetch_chart(name, os.path.join(CHART_CACHE_DIR, f"{name}_thumb.png"), *CHART_THUMB_SIZE)
+            charts.append({
+                'photo': ImageTk.PhotoImage(Image.open(path)),
+                'path': path,
+                'name': f"{name}.png",
+                'server_name': name,
+            })
+        return charts
+    
     def _load_chart_images(self):
-        """Load tất cả ảnh biểu đồ từ thư mục data"""
+        """Load ảnh biểu đồ từ server; lỗi thì dùng ảnh trong thư mục data"""
+        try:
+            self.chart_images = self._load_server_charts()
+            print(f"Đã tải {len(self.chart_images)} biểu đồ từ server")
+            return
+        except Exception as e:
+            print(f"Không tải được biểu đồ từ server ({e}), dùng ảnh trong {self.data_dir}")
         try:
             png_files = glob.glob(os.path.join(self.data_dir, "*.png"))
             self.chart_images = []
@@ -452,7 +548,11 @@ class ReportView(BaseContentView):
         
         # Load full size image
         try:
-            full_image = Image.open(chart['path'])
+            path = chart['path']
+            if chart.get('server_name'):
+                path = self._fetch_chart(chart['server_name'],
+                                         os.path.join(CHART_CACHE_DIR, f"{chart['server_name']}.png"))
+            full_image = Image.open(path)
             # Resize to fit popup but maintain aspect ratio
             max_width, max_height = 800, 600
             image_width, image_height = full_image.size
@@ -13,6 +13,7 @@ from tkinter import ttk, filedialog, messagebox
 from typing import List, Dict, Optional
 from .base_view import BaseContentView
 from models import api_client
+from utils.autocomplete import SuggestionPopup
 import csv
 
 # API Configuration
@@ -140,6 +141,9 @@ class StudentManagementView(BaseContentView):
             if val == "":
                 self.search_var.set(self._placeholder_text)
         entry.bind("<FocusOut>", _on_focus_out)
+        # Gợi ý khi đang gõ; chọn một học sinh thì lọc danh sách theo mã đó
+        self._suggestions = SuggestionPopup(entry, self.search_var, lambda _item: self._go_page(1),
+                                            self._placeholder_text)
         
         # Search button
         ttk.Button(tools, text="Search", command=lambda: self._go_page(1)).grid(row=0, column=1, padx=(0,6))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+bench_analytics.py
+------------------
+So sánh độ trễ truy vấn thống kê (statistics, xếp hạng quê quán) giữa SQLite và DuckDB
+ở quy mô 1M-10M dòng.
+- Sinh dữ liệu bằng generate_students.py vào một SQLite tạm.
+- SQLite: chạy STATISTICS_SQL / HOMETOWN_SQL của backend/app/analytics.py.
+- DuckDB: cùng câu SQL qua DuckDBEngine (attach hoặc copy).
+Usage:
+    python scripts/bench_analytics.py
+    python scripts/bench_analytics.py --sizes 1000000 --rounds 5 --mode copy
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROJ_ROOT = os.path.dirname(HERE)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, PROJ_ROOT)
+sys.path.insert(0, HERE)
+
+from backend.app import analytics  # noqa: E402
+from generate_students import DEFAULT_MISSING, iter_chunks, write_sqlite  # noqa: E402
+
+
+def _time(fn, rounds: int) -> dict:
+    fn()  # warmup
+    timings = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return {"median_ms": round(statistics.median(timings), 2), "min_ms": round(min(timings), 2)}
+
+
+def bench_size(db_path: str, rounds: int, mode: str) -> dict:
+    queries = {
+        "statistics": analytics.STATISTICS_SQL,
+        "hometowns": analytics.HOMETOWN_SQL + " ORDER BY avg_overall DESC",
+    }
+    out = {}
+    con = sqlite3.connect(db_path)
+    for name, sql in queries.items():
+        out[f"sqlite:{name}"] = _time(lambda: con.execute(sql.format(table="students")).fetchall(), rounds)
+    con.close()
+
+    t0 = time.perf_counter()
+    duck = analytics.DuckDBEngine(db_path, mode=mode, refresh_seconds=3600)
+    out["duckdb:load_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    out["duckdb:mode"] = duck.mode
+    for name, sql in queries.items():
+        out[f"duckdb:{name}"] = _time(lambda: duck.query(sql), rounds)
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark SQLite vs DuckDB cho thống kê")
+    ap.add_argument("--sizes", default="1000000,5000000,10000000")
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--mode", default="attach", choices=["attach", "copy"])
+    args = ap.parse_args(argv)
+
+    report = {}
+    with tempfile.TemporaryDirectory(prefix="bench-analytics-") as tmpdir:
+        for size in (int(s) for s in args.sizes.split(",") if s):
+            db_path = os.path.join(tmpdir, f"students_{size}.db")
+            write_sqlite(db_path, iter_chunks(size, 200_000, 1_000_000, 1, DEFAULT_MISSING, 0.01, True), True)
+            report[size] = bench_size(db_path, args.rounds, args.mode)
+            print(f"{size:>10} rows: {json.dumps(report[size])}", flush=True)
+            os.remove(db_path)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+bench_crud.py
+-------------
+Micro-benchmark cho backend/app/crud.py và endpoint thống kê.
+- Chạy từng hàm (list_students, search, get_student, create_student,
+  update_student, update_grades, các truy vấn kiểm tra trùng student_code/email,
+  get_students_statistics) trên SQLite in-memory và file, ở nhiều kích thước dữ liệu.
+- Mỗi benchmark chạy nhiều vòng (kiểu pytest-benchmark): min/median/mean/stddev.
+- Lưu baseline ra JSON và báo lỗi (exit 1) khi median chậm hơn baseline quá ngưỡng %.
+Usage:
+    python scripts/bench_crud.py --save-baseline
+    python scripts/bench_crud.py --max-regression 20
+    python scripts/bench_crud.py --sizes 1000,10000 --storage memory --only list_students,statistics
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROJ_ROOT = os.path.dirname(HERE)
+DEFAULT_BASELINE = os.path.join(HERE, "bench_baseline.json")
+
+# Không để việc import router chạm vào students.db thật. DB mặc định là file tạm chứ không phải "sqlite://":
+# nhật ký hoạt động (activity.py) ghi vào DB này từ thread nền, cần đủ bảng và thấy được từ thread khác
+DEFAULT_DB_DIR = tempfile.mkdtemp(prefix="bench-crud-default-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(DEFAULT_DB_DIR, 'default.db')}")
+sys.path.insert(0, PROJ_ROOT)
+sys.path.insert(0, HERE)
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from backend.app import crud, models, schemas  # noqa: E402
+from backend.app.activity import activities  # noqa: E402
+from backend.app.db import Base, engine, init_db  # noqa: E402
+from backend.app.routers import students as students_router  # noqa: E402
+from generate_students import COLUMNS, iter_chunks, DEFAULT_MISSING  # noqa: E402
+
+
+# ---------- Môi trường dữ liệu ----------
+
+class BenchDB:
+    """Một SQLite (memory hoặc file) đã seed n học sinh"""
+
+    def __init__(self, storage: str, size: int, tmpdir: str):
+        if storage == "memory":
+            self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False},
+                                        poolclass=StaticPool)
+        else:
+            path = os.path.join(tmpdir, f"bench_{size}.db")
+            self.engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=self.engine)
+        self.Session = sessionmaker(bind=self.engine, autocommit=False, autoflush=False)
+        self.size = size
+        self._seed(size)
+        self._counter = 0
+
+    def _seed(self, size: int):
+        table = models.Student.__table__
+        with self.engine.begin() as conn:
+            for data in iter_chunks(size, 50_000, 1_000_000, 7, DEFAULT_MISSING, 0.0, True):
+                rows = [dict(zip(COLUMNS, r)) for r in zip(*(data[c] for c in COLUMNS))]
+                for r in rows:
+                    if r["dob"]:
+                        r["dob"] = _parse_date(r["dob"])
+                conn.execute(table.insert(), rows)
+
+    def next_code(self) -> str:
+        self._counter += 1
+        return f"B{self._counter:09d}"
+
+    def close(self):
+        self.engine.dispose()
+
+
+def _parse_date(s: str):
+    from datetime import date
+    y, m, d = s.split("-")
+    return date(int(y), int(m), int(d))
+
+
+# ---------- Runner ----------
+
+def run_bench(fn: Callable[[], object], min_rounds: int, max_time: float) -> Dict[str, float]:
+    fn()  # warmup
+    timings: List[float] = []
+    t_end = time.perf_counter() + max_time
+    while len(timings) < min_rounds or time.perf_counter() < t_end:
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+        if len(timings) >= 10_000:
+            break
+    return {
+        "rounds": len(timings),
+        "min_ms": round(min(timings) * 1000, 4),
+        "median_ms": round(statistics.median(timings) * 1000, 4),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 4),
+        "stddev_ms": round(statistics.pstdev(timings) * 1000, 4),
+    }
+
+
+def build_benchmarks(bdb: BenchDB) -> Dict[str, Callable[[], object]]:
+    """Mỗi benchmark là một closure dùng session riêng, giống request thật"""
+    Student = models.Student
+    mid = max(1, bdb.size // 2)
+
+    def with_session(body):
+        def run():
+            db = bdb.Session()
+            try:
+                return body(db)
+            finally:
+                db.close()
+        return run
+
+    def _sample(db):
+        return db.get(Student, mid)
+
+    def create(db):
+        code = bdb.next_code()
+        return crud.create_student(db, schemas.StudentIn(
+            student_code=code, first_name="Bench", last_name="Run",
+            email=f"{code.lower()}@example.com", math_score=7.0))
+
+    def update(db):
+        s = _sample(db)
+        data = schemas.StudentIn(student_code=s.student_code, first_name=s.first_name,
+                                 last_name=s.last_name, email=s.email, dob=s.dob,
+                                 home_town=s.home_town, math_score=5.5,
+                                 literature_score=s.literature_score,
+                                 english_score=s.english_score)
+        return crud.update_student(db, mid, data)
+
+    return {
+        "list_students": with_session(lambda db: crud.list_students(db, 0, 100)),
+        "list_students_search": with_session(lambda db: crud.list_students(db, 0, 100, "nguyen")),
+        "get_student": with_session(lambda db: crud.get_student(db, mid)),
+        "unique_code_check": with_session(
+            lambda db: db.query(Student).filter_by(student_code=str(1_000_000 + mid)).first()),
+        "unique_email_check": with_session(
+            lambda db: db.query(Student).filter_by(email="nobody@example.com").first()),
+        "create_student": with_session(create),
+        "update_student": with_session(update),
+        "update_grades": with_session(lambda db: crud.update_grades(
+            db, str(1_000_000 + mid), schemas.StudentGradesUpdate(math_score=6.5))),
+        "statistics": with_session(lambda db: students_router.get_students_statistics(db=db)),
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], max_regression: float) -> List[str]:
+    failures = []
+    for key, res in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        change = (res["median_ms"] - base["median_ms"]) / base["median_ms"] * 100 if base["median_ms"] else 0.0
+        res["baseline_median_ms"] = base["median_ms"]
+        res["change_pct"] = round(change, 1)
+        if change > max_regression:
+            failures.append(f"{key}: median {res['median_ms']}ms vs baseline {base['median_ms']}ms (+{change:.1f}%)")
+    return failures
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Micro-benchmark crud/statistics")
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--storage", default="memory,disk", help="memory, disk hoặc cả hai")
+    ap.add_argument("--only", help="chỉ chạy các benchmark này (phân tách bằng dấu phẩy)")
+    ap.add_argument("--min-rounds", type=int, default=5)
+    ap.add_argument("--max-time", type=float, default=1.0, help="thời gian tối đa mỗi benchmark (giây)")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--max-regression", type=float, default=25.0, help="ngưỡng chậm hơn baseline (%%)")
+    ap.add_argument("--out", help="ghi kết quả JSON ra file")
+    args = ap.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    storages = [s.strip() for s in args.storage.split(",") if s.strip()]
+    only: Optional[set] = set(args.only.split(",")) if args.only else None
+
+    init_db(engine)
+    results: Dict[str, Dict] = {}
+    with tempfile.TemporaryDirectory(prefix="bench-crud-") as tmpdir:
+        for storage in storages:
+            for size in sizes:
+                bdb = BenchDB(storage, size, tmpdir)
+                try:
+                    for name, fn in build_benchmarks(bdb).items():
+                        if only and name not in only:
+                            continue
+                        key = f"{storage}:{size}:{name}"
+                        results[key] = run_bench(fn, args.min_rounds, args.max_time)
+                        print(f"{key:<40} median={results[key]['median_ms']:>10.3f}ms "
+                              f"min={results[key]['min_ms']:>10.3f}ms rounds={results[key]['rounds']}")
+                finally:
+                    bdb.close()
+    activities.flush()
+    engine.dispose()
+    shutil.rmtree(DEFAULT_DB_DIR, ignore_errors=True)
+
+    failures: List[str] = []
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Saved baseline -> {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            failures = compare(results, json.load(f), args.max_regression)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if failures:
+        print("\nREGRESSION:")
+        for line in failures:
+            print(" -", line)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+bench_grade_history.py
+----------------------
+Benchmark lịch sử điểm (bảng grade_events) ở quy mô hàng chục triệu sự kiện.
+- Sinh học sinh bằng generate_students.py, tạo schema backend (init_db: bảng, index, trigger).
+- Nạp N sự kiện ngẫu nhiên rải trong --days ngày bằng CTE đệ quy ngay trong SQLite
+  (bỏ index trước khi nạp, tạo lại sau; trigger cộng dồn grade_daily vẫn chạy cho từng dòng).
+- Đo crud.grade_history (timeline một học sinh) và crud.grade_period_averages
+  (theo tháng/tuần, một môn/mọi môn, theo quê quán) — median/p95.
+- Đo độ trễ crud.update_grades (trigger ghi thêm vào bảng lớn) và in EXPLAIN QUERY PLAN.
+Usage:
+    python scripts/bench_grade_history.py --events 20000000 --students 200000
+    python scripts/bench_grade_history.py --events 1000000 --rounds 20
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROJ_ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+
+def _time(fn, rounds: int) -> dict:
+    fn()  # warmup
+    timings = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    timings.sort()
+    return {"median_ms": round(statistics.median(timings), 2),
+            "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2)}
+
+
+def load_events(db_path: str, n_events: int, n_students: int, days: int) -> dict:
+    """Nạp sự kiện giả lập; trả về thời gian nạp và tạo lại index"""
+    from backend.app import models
+
+    end = int(time.time())
+    start = end - days * 86400
+    con = sqlite3.connect(db_path, isolation_level=None)
+    con.execute("PRAGMA journal_mode=OFF")
+    con.execute("PRAGMA synchronous=OFF")
+    con.execute("PRAGMA cache_size=-400000")
+    indexes = [r for r in con.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type='index' AND tbl_name='grade_events' AND sql IS NOT NULL")]
+    con.execute("BEGIN")
+    for name, _ in indexes:
+        con.execute(f"DROP INDEX {name}")
+    subjects = list(models.GRADE_SUBJECTS)
+    t0 = time.perf_counter()
+    con.execute(f"""
+        INSERT INTO grade_events (student_id, subject, score, ts)
+        WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < {n_events})
+        SELECT abs(random()) % {n_students} + 1,
+               CASE abs(random()) % 3 WHEN 0 THEN '{subjects[0]}' WHEN 1 THEN '{subjects[1]}' ELSE '{subjects[2]}' END,
+               (abs(random()) % 101) / 10.0,
+               {start} + abs(random()) % {end - start}
+        FROM c""")
+    load_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _, sql in indexes:
+        con.execute(sql)
+    con.execute("COMMIT")
+    con.execute("ANALYZE")
+    index_s = time.perf_counter() - t0
+    daily_rows = con.execute("SELECT COUNT(*) FROM grade_daily").fetchone()[0]
+    con.close()
+    return {"load_s": round(load_s, 1), "index_s": round(index_s, 1),
+            "events_per_s": round(n_events / load_s), "grade_daily_rows": daily_rows}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark grade_events (lịch sử điểm)")
+    ap.add_argument("--events", type=int, default=20_000_000)
+    ap.add_argument("--students", type=int, default=200_000)
+    ap.add_argument("--days", type=int, default=730, help="khoảng thời gian rải sự kiện")
+    ap.add_argument("--rounds", type=int, default=10)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="bench-grades-") as tmpdir:
+        db_path = os.path.join(tmpdir, "students.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+        sys.path.insert(0, PROJ_ROOT)
+        from generate_students import DEFAULT_MISSING, iter_chunks, write_sqlite
+        write_sqlite(db_path, iter_chunks(args.students, 100_000, 1_000_000, 3, DEFAULT_MISSING, 0.0, True), True)
+
+        from backend.app import crud, schemas
+        from backend.app.db import SessionLocal, engine, init_db
+        init_db(engine)  # tạo grade_events + trigger, chép điểm hiện có làm mốc
+        report = {"events": args.events, "students": args.students,
+                  "load": load_events(db_path, args.events, args.students, args.days)}
+        print(json.dumps(report["load"]), flush=True)
+
+        rnd = random.Random(0)
+        today = date.today()
+        db = SessionLocal()
+        try:
+            benches = {
+                "history_one_student": lambda: crud.grade_history(db, rnd.randint(1, args.students)),
+                "history_one_subject_90d": lambda: crud.grade_history(
+                    db, rnd.randint(1, args.students), "math", today - timedelta(days=90)),
+                "periods_month_math_1y": lambda: crud.grade_period_averages(
+                    db, "month", "math", today - timedelta(days=365)),
+                "periods_week_all_90d": lambda: crud.grade_period_averages(
+                    db, "week", None, today - timedelta(days=90)),
+                "periods_month_all_full": lambda: crud.grade_period_averages(db, "month"),
+                "periods_month_hometown_1y": lambda: crud.grade_period_averages(
+                    db, "month", None, today - timedelta(days=365), None, "HaNoi"),
+            }
+            for name, fn in benches.items():
+                report[name] = _time(fn, args.rounds)
+                print(f"{name:<28} {json.dumps(report[name])}", flush=True)
+
+            def write():
+                code = str(1_000_000 + rnd.randint(0, args.students - 1))
+                crud.update_grades(db, code, schemas.StudentGradesUpdate(math_score=round(rnd.uniform(0, 10), 1)))
+            report["update_grades_with_trigger"] = _time(write, args.rounds * 5)
+            print(f"{'update_grades_with_trigger':<28} {json.dumps(report['update_grades_with_trigger'])}")
+        finally:
+            db.close()
+
+        con = sqlite3.connect(db_path)
+        for label, sql in (
+            ("history", "SELECT subject, score, ts FROM grade_events WHERE student_id = 1 ORDER BY ts, id"),
+            ("periods", "SELECT day, subject, sum(total) / sum(n) FROM grade_daily "
+                        "WHERE subject = 'math' AND day >= 20000 GROUP BY 1, 2"),
+        ):
+            plan = [r[3] for r in con.execute("EXPLAIN QUERY PLAN " + sql)]
+            report[f"plan_{label}"] = plan
+            print(f"plan {label}: {plan}")
+        con.close()
+        engine.dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+bench_search.py
+---------------
+So sánh tìm kiếm học sinh: ILIKE quét bảng (cũ) với index trigram tên bỏ dấu (backend/app/search.py).
+- Tạo DB tạm theo schema backend (init_db), nạp N học sinh có dấu (generate_students.py, mặc định 1 triệu),
+  đo thời gian dựng index (search.catch_up, như maintenance.py làm khi server chạy) rồi ANALYZE.
+- Mỗi chuỗi tìm (họ phổ biến, tên hiếm, gõ sai, có dấu / không dấu, nhiều từ, tiền tố mã, chuỗi con email)
+  chạy qua crud.list_students cả hai cách: median ms và số kết quả. ILIKE không khớp "nguyen" với "Nguyễn" hay
+  từ gõ sai.
+- Đo thêm độ trễ của một lần ghi API đổi tên (đồng bộ index trong cùng transaction) và của gợi ý theo tiền tố
+  (crud.suggest_students, GET /students/suggest) khi đang gõ.
+Usage:
+    python scripts/bench_search.py
+    python scripts/bench_search.py --rows 100000 --rounds 5
+    python scripts/bench_search.py --db /tmp/search.db --keep --queries "nguyen,Trần Minh,hoang anhh"
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROJ_ROOT = os.path.dirname(HERE)
+sys.path.insert(0, PROJ_ROOT)
+sys.path.insert(0, HERE)
+
+DEFAULT_QUERIES = ["nguyen", "Nguyễn", "nguyne", "Trần Minh", "tran minh", "hoang anhh", "{rare}", "{rare_typo}",
+                   "nguyen {code}", "gmail"]
+
+
+def seed(db_path: str, rows: int) -> float:
+    from generate_students import COLUMNS, DEFAULT_MISSING, iter_chunks
+
+    t0 = time.perf_counter()
+    con = sqlite3.connect(db_path, isolation_level=None)
+    con.execute("BEGIN")
+    sql = f"INSERT INTO students ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+    for data in iter_chunks(rows, 100_000, 1_000_000, 42, DEFAULT_MISSING, 0.0, False):
+        con.executemany(sql, zip(*(data[c] for c in COLUMNS)))
+    con.execute("COMMIT")
+    con.close()
+    return time.perf_counter() - t0
+
+
+def timed(fn, rounds: int):
+    result = fn()  # warmup
+    timings = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return result, statistics.median(timings) * 1000
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="ILIKE vs trigram search benchmark")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--db", help="file SQLite (mặc định thư mục tạm)")
+    ap.add_argument("--keep", action="store_true", help="giữ lại DB sau khi chạy")
+    ap.add_argument("--queries", help="các chuỗi tìm, phân tách bằng dấu phẩy")
+    args = ap.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp(prefix="bench-search-")
+    db_path = args.db or os.path.join(tmpdir, "students.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["SLOW_QUERY_LOG_FILE"] = ""
+
+    from backend.app import crud, schemas, search
+    from backend.app.activity import activities
+    from backend.app.db import SessionLocal, engine, init_db
+
+    init_db(engine)
+    print(f"seed {args.rows:,} rows: {seed(db_path, args.rows):.1f}s")
+    t0 = time.perf_counter()
+    n = search.catch_up(engine)
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+        terms, postings = conn.exec_driver_sql(
+            "SELECT (SELECT count(*) FROM search_terms), (SELECT count(*) FROM search_postings)").first()
+        email_prefix = conn.exec_driver_sql(
+            "SELECT email FROM students WHERE email IS NOT NULL LIMIT 1").scalar()[:12]
+        rare, code = conn.exec_driver_sql(
+            "SELECT t.term, s.student_code FROM search_terms t JOIN search_postings p ON p.term_id = t.id "
+            "JOIN students s ON s.id = p.student_id WHERE t.df > 0 AND length(t.term) >= 4 "
+            "ORDER BY t.df, t.term LIMIT 1").first()
+    print(f"build index for {n:,} students: {time.perf_counter() - t0:.1f}s "
+          f"({terms:,} terms, {postings:,} postings, {os.path.getsize(db_path) / 2**20:.0f} MB db)")
+
+    fill = {"rare": rare, "rare_typo": rare[:-1] + ("x" if rare[-1] != "x" else "y"), "code": code[:5]}
+    queries = args.queries.split(",") if args.queries else [q.format(**fill) for q in DEFAULT_QUERIES]
+
+    def run(q, indexed):
+        search.SEARCH_INDEX = indexed
+        db = SessionLocal()
+        try:
+            return crud.list_students(db, 0, 100, q, ["id"])
+        finally:
+            db.close()
+
+    print(f"\n{'query':<22} {'ilike ms':>10} {'ilike n':>9} {'trigram ms':>11} {'trigram n':>10} {'speedup':>8}")
+    for q in queries:
+        old, old_ms = timed(lambda: run(q, False), args.rounds)
+        new, new_ms = timed(lambda: run(q, True), args.rounds)
+        print(f"{q:<22} {old_ms:>10.1f} {len(old):>9,} {new_ms:>11.1f} {len(new):>10,} {old_ms / new_ms:>7.1f}x")
+
+    print(f"\n{'suggest prefix':<22} {'ms':>8} {'n':>4}  first")
+    for prefix in ("1", code[:4], "n", "ngu", "Nguyễn V", "tran thi h", email_prefix, "zzz"):
+        db = SessionLocal()
+        rows, ms = timed(lambda: crud.suggest_students(db, prefix, 10), args.rounds)
+        db.close()
+        first = f"{rows[0]['match']}: {rows[0]['student_code']} {rows[0]['last_name']} {rows[0]['first_name']}" \
+            if rows else "-"
+        print(f"{prefix:<22} {ms:>8.2f} {len(rows):>4}  {first}")
+
+    # Ghi đổi tên: index cập nhật trong cùng transaction (crud._synced)
+    search.SEARCH_INDEX = True
+    db = SessionLocal()
+    s = db.get(crud.models.Student, 1)
+    names = [schemas.StudentIn(student_code=s.student_code, first_name=first, last_name="Phạm", email=s.email)
+             for first in ("Thị Hoà", "Văn Hùng")]
+    db.close()
+    turn = iter(range(10**9))
+    _, write_ms = timed(lambda: crud.update_student(SessionLocal(), 1, names[next(turn) % 2]), args.rounds)
+    print(f"\nrename via crud.update_student (index synced in the same commit): {write_ms:.1f} ms")
+
+    activities.flush()  # nhật ký ghi nền, ghi xong trước khi xóa DB
+    engine.dispose()
+    if args.keep:
+        print(f"db kept at {db_path}")
+    else:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
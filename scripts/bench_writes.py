@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+bench_writes.py
+---------------
+Đo độ trễ ghi khi nhiều người cùng sửa điểm (optimistic locking theo cột version).
+- Seed DB tạm (như load_test.py) rồi khởi động API bằng uvicorn.
+- Mỗi editor lặp: GET /students/{id} lấy version, PATCH /students/by-code/{code}/grades
+  kèm version; gặp 409 thì đọc lại và thử lại (tối đa --max-retries lần).
+- --hot: số học sinh bị sửa chung (càng nhỏ càng nhiều xung đột).
+- Báo cáo p50/p95/p99 của từng PATCH, độ trễ cả chu trình sửa, tỉ lệ 409 và số lần sửa thất bại.
+- --writers: đo throughput ghi (group commit, xem backend/app/writer.py): N writer đồng thời PATCH điểm
+  học sinh ngẫu nhiên (không gửi version), chạy lần lượt với WRITE_GROUP_COMMIT=1 và =0 để so sánh
+  writes/s, p50/p95/p99 và số lỗi (vd 500 "database is locked").
+Usage:
+    python scripts/bench_writes.py --editors 1,8,32 --duration 10 --hot 5
+    python scripts/bench_writes.py --writers 1,10,50,100,250,500 --duration 10
+    python scripts/bench_writes.py --writers 100 --group-commit on
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from load_test import HttpConnection, _free_port, _percentile, seed_database, start_server  # noqa: E402
+
+
+async def _editor(port: int, keys, duration: float, max_retries: int, seed: int, stats: dict):
+    conn = HttpConnection("127.0.0.1", port)
+    rnd = random.Random(seed)
+    deadline = time.perf_counter() + duration
+    try:
+        while time.perf_counter() < deadline:
+            sid, code = rnd.choice(keys)
+            t_edit = time.perf_counter()
+            for _ in range(max_retries + 1):
+                status, body = await conn.request("GET", f"/students/{sid}")
+                if status != 200:
+                    stats["errors"] += 1
+                    break
+                version = json.loads(body)["version"]
+                t0 = time.perf_counter()
+                status, _ = await conn.request("PATCH", f"/students/by-code/{code}/grades", {
+                    "math_score": round(rnd.uniform(0, 10), 1), "version": version})
+                stats["patch_ms"].append((time.perf_counter() - t0) * 1000)
+                if status == 200:
+                    stats["edits_ms"].append((time.perf_counter() - t_edit) * 1000)
+                    break
+                if status != 409:
+                    stats["errors"] += 1
+                    break
+                stats["conflicts"] += 1
+            else:
+                stats["gave_up"] += 1
+    finally:
+        await conn.close()
+
+
+async def run_editors(port: int, keys, editors: int, duration: float, max_retries: int) -> dict:
+    stats = {"patch_ms": [], "edits_ms": [], "conflicts": 0, "errors": 0, "gave_up": 0}
+    t0 = time.perf_counter()
+    await asyncio.gather(*[_editor(port, keys, duration, max_retries, i, stats) for i in range(editors)])
+    elapsed = time.perf_counter() - t0
+    patch, edits = sorted(stats["patch_ms"]), sorted(stats["edits_ms"])
+    return {
+        "editors": editors,
+        "patches": len(patch),
+        "edits": len(edits),
+        "edits_per_s": round(len(edits) / elapsed, 1),
+        "conflict_rate": round(stats["conflicts"] / len(patch), 4) if patch else 0.0,
+        "gave_up": stats["gave_up"],
+        "errors": stats["errors"],
+        "patch_p50_ms": round(_percentile(patch, 50), 2),
+        "patch_p95_ms": round(_percentile(patch, 95), 2),
+        "patch_p99_ms": round(_percentile(patch, 99), 2),
+        "edit_p50_ms": round(_percentile(edits, 50), 2),
+        "edit_p95_ms": round(_percentile(edits, 95), 2),
+    }
+
+
+async def _writer(port: int, keys, stop_at: float, seed: int, stats: dict):
+    conn = HttpConnection("127.0.0.1", port)
+    rnd = random.Random(seed)
+    try:
+        while time.perf_counter() < stop_at:
+            _, code = rnd.choice(keys)
+            t0 = time.perf_counter()
+            try:
+                status, _ = await conn.request("PATCH", f"/students/by-code/{code}/grades",
+                                               {"math_score": round(rnd.uniform(0, 10), 1)})
+            except ConnectionError:
+                status = 0
+            if status == 200:
+                stats["ms"].append((time.perf_counter() - t0) * 1000)
+            else:
+                stats["errors"][status] = stats["errors"].get(status, 0) + 1
+    finally:
+        await conn.close()
+
+
+async def run_writers(port: int, keys, writers: int, duration: float) -> dict:
+    stats = {"ms": [], "errors": {}}
+    t0 = time.perf_counter()
+    await asyncio.gather(*[_writer(port, keys, t0 + duration, i, stats) for i in range(writers)])
+    elapsed = time.perf_counter() - t0
+    ms = sorted(stats["ms"])
+    return {
+        "writers": writers,
+        "writes": len(ms),
+        "writes_per_s": round(len(ms) / elapsed, 1),
+        "errors": sum(stats["errors"].values()),
+        "errors_by_status": stats["errors"],
+        "p50_ms": round(_percentile(ms, 50), 2),
+        "p95_ms": round(_percentile(ms, 95), 2),
+        "p99_ms": round(_percentile(ms, 99), 2),
+    }
+
+
+def throughput(args) -> list:
+    """Throughput ghi theo số writer, có/không group commit (mỗi chế độ một server, DB seed mới)"""
+    modes = {"on": ["1"], "off": ["0"], "both": ["1", "0"]}[args.group_commit]
+    report = []
+    for mode in modes:
+        with tempfile.TemporaryDirectory(prefix="bench-writes-") as tmpdir:
+            db_path = os.path.join(tmpdir, "students.db")
+            keys = seed_database(db_path)
+            port = _free_port()
+            proc = start_server(db_path, port, extra_env={"WRITE_GROUP_COMMIT": mode, "SLOW_QUERY_LOG_FILE": ""})
+            try:
+                for n in (int(x) for x in args.writers.split(",") if x):
+                    res = dict(asyncio.run(run_writers(port, keys, n, args.duration)), group_commit=mode == "1")
+                    print(json.dumps(res), flush=True)
+                    report.append(res)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=10)
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark ghi đồng thời với optimistic locking")
+    ap.add_argument("--editors", default="1,8,32", help="số editor đồng thời (phân tách bằng dấu phẩy)")
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--hot", type=int, default=5, help="số học sinh bị sửa chung")
+    ap.add_argument("--max-retries", type=int, default=5)
+    ap.add_argument("--writers", help="đo throughput ghi với số writer đồng thời này, vd 1,10,100,500")
+    ap.add_argument("--group-commit", choices=["on", "off", "both"], default="both")
+    args = ap.parse_args(argv)
+
+    if args.writers:
+        report = throughput(args)
+        print(json.dumps(report, indent=2))
+        return
+
+    report = []
+    with tempfile.TemporaryDirectory(prefix="bench-writes-") as tmpdir:
+        db_path = os.path.join(tmpdir, "students.db")
+        keys = seed_database(db_path)[:args.hot]
+        port = _free_port()
+        proc = start_server(db_path, port)
+        try:
+            for n in (int(x) for x in args.editors.split(",") if x):
+                res = asyncio.run(run_editors(port, keys, n, args.duration, args.max_retries))
+                print(json.dumps(res), flush=True)
+                report.append(res)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+    print(json.dumps(report, indent=2))
+    if any(r["errors"] for r in report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
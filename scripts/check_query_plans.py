@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+check_query_plans.py
+--------------------
+Kiểm tra hồi quy query plan: index bị mất (đổi crud.py/models.py) thì báo lỗi ngay.
+- Tạo DB tạm theo schema backend (init_db), nạp N học sinh (generate_students.py), vài lớp, rồi ANALYZE.
+- Gọi từng API thật qua TestClient (list, search, lọc, by-code, batch, login, thống kê, facets, ghi/sửa/xóa,
+  lịch sử điểm, lớp...) và các truy vấn kiểm tra trùng student_code/email; ghi lại mọi câu SQL phát sinh.
+- Chạy EXPLAIN QUERY PLAN cho từng câu: mỗi case phải dùng các index kỳ vọng và không có
+  `SCAN students` / `SCAN grade_events` ngoài các case được phép quét (list, thống kê).
+- Exit 1 khi có case sai; chạy vài giây nên dùng được cho mọi commit.
+Usage:
+    python scripts/check_query_plans.py
+    python scripts/check_query_plans.py --rows 20000 --verbose
+    python scripts/check_query_plans.py --no-analyze --only by_code,login_email
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROJ_ROOT = os.path.dirname(HERE)
+sys.path.insert(0, PROJ_ROOT)
+sys.path.insert(0, HERE)
+
+# Bảng lớn: quét toàn bảng là lỗi trừ khi case cho phép
+BIG_TABLES = ("students", "grade_events")
+
+
+def idx(column_expr: str, table: str = "students") -> str:
+    """Regex cho dòng plan 'SEARCH <table> USING [COVERING] INDEX <tên> (<column_expr>...)'"""
+    return rf"^SEARCH {table} USING (COVERING )?INDEX \S+ \({re.escape(column_expr)}"
+
+
+PK = r"^SEARCH students USING INTEGER PRIMARY KEY \(rowid=\?\)"
+POSTINGS = r"^SEARCH (p|search_postings) USING PRIMARY KEY \(term_id=\?"  # index tìm kiếm tên (backend/app/search.py)
+# Mã/email chứa chuỗi con (token có chữ số/'@'): quét index hẹp (covering), không quét bảng students.
+# Case cho phép bằng "students:index"
+SUBSTRING = r"^SCAN students USING COVERING INDEX \S+$"
+
+
+def nocase(column: str, index: str) -> str:
+    """Range scan tiền tố trên index COLLATE NOCASE (gợi ý GET /students/suggest, từ tên khớp mã/email khi search)"""
+    return rf"^SEARCH students USING (COVERING )?INDEX {index} \({column}>\? AND {column}<\?\)"
+
+
+KEY_PREFIX = [nocase("student_code", "ix_students_code_nocase"), nocase("email", "ix_students_email_nocase")]
+
+
+def cases(code: str, email: str, sid: int, class_id: int):
+    """(tên, method, path, json, regex plan bắt buộc, bảng được phép SCAN)"""
+    return [
+        ("list", "GET", "/students", None, [], {"students"}),
+        ("list_sorted", "GET", "/students?sort=home_town,-math_score", None, [], {"students"}),
+        ("search", "GET", "/students?search=nguyen", None, [POSTINGS] + KEY_PREFIX, set()),
+        ("search_typo_words", "GET", "/students?search=Nguyne%20Minh", None, [POSTINGS] + KEY_PREFIX, set()),
+        ("search_code_prefix", "GET", f"/students?search={code[:5]}", None, [SUBSTRING], {"students:index"}),
+        ("search_email_word", "GET", "/students?search=gmail", None, KEY_PREFIX, set()),
+        ("search_email_domain", "GET", "/students?search=@gmail", None, [SUBSTRING], {"students:index"}),
+        ("suggest_code", "GET", f"/students/suggest?q={code[:4]}", None,
+         [nocase("student_code", "ix_students_code_nocase")], set()),
+        ("suggest_name", "GET", "/students/suggest?q=nguyen%20v", None, [POSTINGS, PK], set()),
+        ("suggest_email", "GET", f"/students/suggest?q={email.split('@')[0].upper()}", None,
+         [nocase("email", "ix_students_email_nocase")], set()),
+        ("filter_home_town", "GET", "/students?home_town=HaNoi", None, [idx("home_town=?")], set()),
+        ("filter_home_town_math", "GET", "/students?home_town=HaNoi&min_math=8", None,
+         [idx("home_town=? AND math_score>?")], set()),
+        ("filter_dob", "GET", "/students?born_after=2007-06-01", None, [idx("dob>?")], set()),
+        ("filter_class", "GET", f"/students?class_id={class_id}", None, [idx("class_id=?")], set()),
+        ("get_by_id", "GET", f"/students/{sid}", None, [PK], set()),
+        ("by_code", "GET", f"/students/by-code/{code}", None, [idx("student_code=?")], set()),
+        ("batch_ids", "GET", f"/students/batch?ids={sid},{sid + 1},{sid + 2}", None, [PK], set()),
+        ("lookup_codes", "POST", "/students/lookup", {"student_codes": [code]}, [idx("student_code=?")], set()),
+        ("login_code", "POST", "/students/login", {"username": code, "password": "x"},
+         [idx("student_code=?"), idx("email=?")], set()),
+        ("login_email", "POST", "/students/login", {"username": email, "password": "x"},
+         [idx("student_code=?"), idx("email=?")], set()),
+        ("statistics", "GET", "/students/statistics", None, [], {"students"}),
+        ("statistics_hometowns", "GET", "/students/statistics/hometowns", None, [], {"students"}),
+        ("facets", "GET", "/students/facets", None, [], {"students"}),
+        ("facets_home_town", "GET", "/students/facets?home_town=HaNoi", None, [idx("home_town=?")], set()),
+        ("create_duplicate_code", "POST", "/students", {"student_code": code}, [], set()),
+        ("update_student", "PUT", f"/students/{sid}", {"student_code": code, "email": email}, [PK], set()),
+        ("update_grades", "PATCH", f"/students/by-code/{code}/grades", {"math_score": 9.5},
+         [idx("student_code=?")], set()),
+        ("grade_history", "GET", f"/students/{sid}/grades/history", None,
+         [idx("student_id=?", "grade_events")], set()),
+        ("grade_periods", "GET", "/students/grades/periods?subject=math&since=2024-01-01", None,
+         [idx("day>?", "grade_daily")], set()),
+        ("classes", "GET", "/classes?roster=true&limit=10", None, [idx("class_id=?")], {"classes"}),
+        ("class_detail", "GET", f"/classes/{class_id}", None, [idx("class_id=?")], set()),
+        ("delete_student", "DELETE", f"/students/{sid + 3}", None, [PK], set()),
+    ]
+
+
+def session_cases(code: str, email: str):
+    """Truy vấn kiểm tra trùng (chạy trực tiếp qua Session như bench_crud) và gợi ý khi index tìm kiếm chưa đồng bộ
+    (đánh dấu mọi học sinh vào search_dirty trong transaction không commit, như sau khi nạp hàng loạt)"""
+    from sqlalchemy import text
+    from backend.app import crud
+    from backend.app.models import Student
+
+    def suggest_dirty(db):
+        db.execute(text("INSERT INTO search_dirty (student_id) SELECT id FROM students"))
+        return crud.suggest_students(db, "nguyen v", 10)
+
+    return [
+        ("suggest_name_dirty", suggest_dirty, [nocase("last_name", "ix_students_last_name_nocase"),
+                                               nocase("first_name", "ix_students_first_name_nocase")],
+         {"students:index"}),  # quét index là của câu INSERT đánh dấu
+        ("unique_code_check", lambda db: db.query(Student).filter_by(student_code=code).first(),
+         [idx("student_code=?")], set()),
+        ("unique_email_check", lambda db: db.query(Student).filter_by(email=email).first(),
+         [idx("email=?")], set()),
+    ]
+
+
+def seed(db_path: str, rows: int, analyze: bool):
+    from generate_students import COLUMNS, DEFAULT_MISSING, iter_chunks
+
+    con = sqlite3.connect(db_path, isolation_level=None)
+    con.execute("BEGIN")
+    n_classes = max(5, rows // 35)  # ~35 học sinh/lớp như thực tế
+    con.executemany("INSERT INTO classes (code, name) VALUES (?, ?)",
+                    [(f"C{i:04d}", f"Lớp {i}") for i in range(1, n_classes + 1)])
+    sql = f"INSERT INTO students ({', '.join(COLUMNS)}, class_id) VALUES ({', '.join('?' * (len(COLUMNS) + 1))})"
+    for data in iter_chunks(rows, 10_000, 1_000_000, 7, DEFAULT_MISSING, 0.0, True):
+        n = len(data["student_code"])
+        con.executemany(sql, zip(*(data[c] for c in COLUMNS), (i % n_classes + 1 for i in range(n))))
+    con.execute("COMMIT")
+    if analyze:
+        con.execute("ANALYZE")
+    code, email, sid = con.execute(
+        "SELECT student_code, email, id FROM students WHERE email IS NOT NULL ORDER BY id LIMIT 1").fetchone()
+    con.close()
+    return code, email, sid
+
+
+def check(plans: list, required: list, allow_scan: set):
+    """Trả về danh sách lỗi của một case"""
+    lines = [line for _, plan in plans for line in plan]
+    errors = [f"missing plan /{r}/" for r in required if not any(re.search(r, line) for line in lines)]
+    for table in BIG_TABLES:
+        if table not in allow_scan:
+            covering = rf"^SCAN {table} USING COVERING INDEX" if f"{table}:index" in allow_scan else None
+            errors += [f"unexpected '{line}'" for line in lines if re.match(rf"^SCAN {table}\b", line)
+                       and not (covering and re.match(covering, line))]
+    return errors
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Query plan regression check")
+    ap.add_argument("--rows", type=int, default=5000)
+    ap.add_argument("--no-analyze", action="store_true", help="không chạy ANALYZE sau khi nạp")
+    ap.add_argument("--only", help="chỉ chạy các case này (phân tách bằng dấu phẩy)")
+    ap.add_argument("--verbose", action="store_true", help="in SQL và plan của mọi case")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="query-plans-") as tmpdir:
+        db_path = os.path.join(tmpdir, "students.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+        os.environ["ANALYTICS_BACKEND"] = "sqlite"
+        os.environ["SLOW_QUERY_LOG_FILE"] = ""
+
+        from fastapi.testclient import TestClient
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        from backend.app.db import SessionLocal, engine
+        from backend.app.main import app  # init_db chạy khi import router
+        from backend.app.response_cache import response_cache
+        from backend.app.search import catch_up
+
+        code, email, sid = seed(db_path, args.rows, not args.no_analyze)
+        catch_up(engine)  # index tìm kiếm cho dữ liệu vừa nạp (maintenance.py làm việc này khi server chạy)
+        captured = []
+
+        # Mọi engine: câu ghi chạy trên engine riêng của writer group commit (backend/app/writer.py)
+        @event.listens_for(Engine, "before_cursor_execute")
+        def _capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")):
+                captured.append((statement, parameters[0] if executemany else parameters))
+
+        explain = sqlite3.connect(db_path)
+        client = TestClient(app)
+        todo = [(name, lambda m=m, p=p, j=j: client.request(m, p, json=j), req, allow)
+                for name, m, p, j, req, allow in cases(code, email, sid, 1)]
+        todo += [(name, lambda fn=fn: _with_session(SessionLocal, fn), req, allow)
+                 for name, fn, req, allow in session_cases(code, email)]
+        if args.only:
+            wanted = set(args.only.split(","))
+            todo = [c for c in todo if c[0] in wanted]
+
+        failed = 0
+        for name, run, required, allow_scan in todo:
+            response_cache.clear()
+            captured.clear()
+            status = getattr(run(), "status_code", "-")
+            plans = [(sql, [r[-1] for r in explain.execute("EXPLAIN QUERY PLAN " + sql, params)])
+                     for sql, params in captured]
+            errors = check(plans, required, allow_scan)
+            failed += bool(errors)
+            print(f"{'FAIL' if errors else 'ok  '} {name:<24} status={status} queries={len(plans)}")
+            for e in errors:
+                print(f"       - {e}")
+            if errors or args.verbose:
+                for sql, plan in plans:
+                    print(f"       {' '.join(sql.split())[:160]}")
+                    for line in plan:
+                        print(f"         {line}")
+        explain.close()
+        engine.dispose()
+    print(f"{len(todo) - failed}/{len(todo)} cases ok in {time.perf_counter() - t0:.1f}s")
+    return 1 if failed else 0
+
+
+def _with_session(SessionLocal, fn):
+    db = SessionLocal()
+    try:
+        return fn(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
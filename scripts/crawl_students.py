@@ -24,6 +24,16 @@ def fetch_student_by_id(id_):
     r.raise_for_status()
     return r.json()
 
+def fetch_students_batch(ids, batch_size=1000):
+    """Lấy chi tiết nhiều học sinh qua POST /students/lookup (thay vì mỗi id một request)"""
+    result = {}
+    for i in range(0, len(ids), batch_size):
+        r = requests.post(f"{API_BASE}/students/lookup", json={"ids": ids[i:i + batch_size]}, timeout=30)
+        r.raise_for_status()
+        for s in r.json():
+            result[s["id"]] = s
+    return result
+
 def save_jsonl(records, path):
     with open(path, "w", encoding="utf-8") as f:
         for rec in records:
@@ -43,10 +53,8 @@ def save_text(records, path):
 def main():
     all_students = fetch_all_students()
 
-    enriched = []
-    for s in all_students:
-        s_detail = fetch_student_by_id(s["id"]) or s
-        enriched.append(s_detail)
+    details = fetch_students_batch([s["id"] for s in all_students])
+    enriched = [details.get(s["id"]) or s for s in all_students]
 
     save_jsonl(enriched, RAW_JSONL)
     save_text(enriched, RAW_TXT)
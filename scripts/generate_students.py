@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+generate_students.py
+--------------------
+Sinh dữ liệu học sinh tổng hợp cho kiểm thử ở quy mô lớn (hàng triệu dòng).
+- Họ tên tiếng Việt (có dấu, hoặc không dấu với --ascii-names), email duy nhất.
+- home_town theo đúng bộ giá trị đang có trong data/students_raw.jsonl
+  (kèm một tỉ lệ nhỏ biến thể "bẩn" như 'Ha noi', 'bac ninh').
+- dob phân bố quanh năm 2003, điểm 3 môn tương quan qua một "năng lực" chung.
+- Tỉ lệ thiếu dữ liệu cấu hình được theo từng cột.
+Đầu ra:
+- SQLite (mặc định students.db): insert hàng loạt trong một transaction,
+  index được tạo sau khi nạp xong.
+- JSONL (--jsonl) hoặc Parquet (--parquet, cần pyarrow).
+Usage:
+    python scripts/generate_students.py --rows 1000000 --replace
+    python scripts/generate_students.py --rows 200000 --db /tmp/bench.db --replace
+    python scripts/generate_students.py --rows 100000 --jsonl data/students_synth.jsonl
+    python scripts/generate_students.py --rows 50000 --missing 0.05 --missing-field math_score=0.2
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+import unicodedata
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROJ_ROOT = os.path.dirname(HERE)
+DEFAULT_DB = os.path.join(PROJ_ROOT, "students.db")
+
+COLUMNS = ["student_code", "first_name", "last_name", "email", "dob", "home_town",
+           "math_score", "literature_score", "english_score"]
+SCORE_COLUMNS = ["math_score", "literature_score", "english_score"]
+
+# Họ phổ biến và tỉ trọng xấp xỉ
+LAST_NAMES = [
+    ("Nguyễn", 38), ("Trần", 11), ("Lê", 9), ("Phạm", 7), ("Hoàng", 5), ("Huỳnh", 4),
+    ("Phan", 4), ("Vũ", 4), ("Võ", 3), ("Đặng", 2), ("Bùi", 2), ("Đỗ", 2), ("Hồ", 2),
+    ("Ngô", 2), ("Dương", 1), ("Lý", 1),
+]
+MIDDLE_NAMES = ["Văn", "Thị", "Minh", "Ngọc", "Đức", "Thu", "Quang", "Hoài", "Thanh", "Gia",
+                "Hữu", "Bảo", "Khánh", "Phương", "Anh", ""]
+FIRST_NAMES = ["An", "Anh", "Bình", "Châu", "Cường", "Dũng", "Dung", "Giang", "Hà", "Hải",
+               "Hạnh", "Hiếu", "Hoa", "Hùng", "Huy", "Hương", "Khoa", "Lan", "Linh", "Long",
+               "Mai", "Minh", "My", "Nam", "Ngân", "Ngọc", "Nhung", "Phúc", "Phương", "Quân",
+               "Quang", "Sơn", "Tâm", "Thảo", "Thắng", "Trang", "Trung", "Tú", "Tuấn", "Vy",
+               "Yến"]
+EMAIL_DOMAINS = ["gmail.com", "gmail.com", "gmail.com", "yahoo.com", "outlook.com", "fpt.edu.vn"]
+
+# Bộ giá trị home_town đang có trong data/students_raw.jsonl
+HOME_TOWNS = [
+    ("HaNoi", 18), ("HCM", 16), ("HaiPhong", 7), ("DaNang", 7), ("CanTho", 5),
+    ("BacNinh", 6), ("BinhDuong", 5), ("Hue", 4), ("NgheAn", 6), ("ThanhHoa", 6),
+    ("LamDong", 3), ("NamDinh", 5), ("ThaiBinh", 4), ("BacGiang", 4), ("QuangNinh", 4),
+]
+DIRTY_HOME_TOWNS = ["Ha noi", "bac ninh", "thuan thanh"]
+
+DEFAULT_MISSING = {
+    "first_name": 0.0, "last_name": 0.0, "email": 0.02, "dob": 0.03, "home_town": 0.03,
+    "math_score": 0.04, "literature_score": 0.04, "english_score": 0.04,
+}
+
+
+def fold_ascii(text: str) -> str:
+    """Bỏ dấu tiếng Việt: 'Nguyễn Đức' -> 'Nguyen Duc'"""
+    text = text.replace("Đ", "D").replace("đ", "d")
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+
+def _weighted(pairs) -> Tuple[List[str], np.ndarray]:
+    names = [p[0] for p in pairs]
+    w = np.array([p[1] for p in pairs], dtype=float)
+    return names, w / w.sum()
+
+
+def generate_chunk(rng: np.random.Generator, start_code: int, n: int,
+                   missing: Dict[str, float], dirty_rate: float = 0.01,
+                   ascii_names: bool = False) -> Dict[str, list]:
+    """Sinh n học sinh dạng cột (dict tên cột -> list giá trị)"""
+    last_vocab, last_p = _weighted(LAST_NAMES)
+    town_vocab, town_p = _weighted(HOME_TOWNS)
+    middle_vocab, first_vocab = MIDDLE_NAMES, FIRST_NAMES
+    if ascii_names:
+        last_vocab = [fold_ascii(s) for s in last_vocab]
+        middle_vocab = [fold_ascii(s) for s in middle_vocab]
+        first_vocab = [fold_ascii(s) for s in first_vocab]
+
+    last_idx = rng.choice(len(last_vocab), size=n, p=last_p)
+    middle_idx = rng.integers(0, len(middle_vocab), size=n)
+    first_idx = rng.integers(0, len(first_vocab), size=n)
+    domain_idx = rng.integers(0, len(EMAIL_DOMAINS), size=n)
+    codes = np.arange(start_code, start_code + n)
+
+    # Email luôn không dấu, duy nhất nhờ mã học sinh
+    last_ascii = [fold_ascii(s).lower() for s in last_vocab]
+    first_ascii = [fold_ascii(s).lower() for s in first_vocab]
+    first_names = [f"{middle_vocab[m]} {first_vocab[f]}".strip() for m, f in zip(middle_idx, first_idx)]
+    last_names = [last_vocab[i] for i in last_idx]
+    emails = [f"{first_ascii[f]}.{last_ascii[l]}{c}@{EMAIL_DOMAINS[d]}"
+              for f, l, c, d in zip(first_idx, last_idx, codes, domain_idx)]
+
+    # Ngày sinh: quanh 2003-06, độ lệch ~2 năm, giới hạn 1998-2008
+    base = np.datetime64("2003-06-15")
+    offsets = np.clip(rng.normal(0, 730, size=n), -1990, 1800).astype("timedelta64[D]")
+    dobs = (base + offsets).astype(str).tolist()
+
+    towns = [town_vocab[i] for i in rng.choice(len(town_vocab), size=n, p=town_p)]
+    if dirty_rate > 0:
+        for i in np.flatnonzero(rng.random(n) < dirty_rate):
+            towns[i] = DIRTY_HOME_TOWNS[i % len(DIRTY_HOME_TOWNS)]
+
+    # Điểm tương quan: năng lực chung + nhiễu riêng từng môn
+    ability = rng.normal(6.8, 1.3, size=n)
+    scores = {}
+    for col, bias in zip(SCORE_COLUMNS, (-0.1, 0.3, -0.2)):
+        s = np.clip(ability + bias + rng.normal(0, 0.9, size=n), 0, 10)
+        scores[col] = np.round(s, 1).tolist()
+
+    data = {
+        "student_code": [str(c) for c in codes],
+        "first_name": first_names,
+        "last_name": last_names,
+        "email": emails,
+        "dob": dobs,
+        "home_town": towns,
+        **scores,
+    }
+    for col, rate in missing.items():
+        if rate > 0:
+            values = data[col]
+            for i in np.flatnonzero(rng.random(n) < rate):
+                values[i] = None
+    return data
+
+
+def iter_chunks(rows: int, chunk_size: int, start_code: int, seed: int,
+                missing: Dict[str, float], dirty_rate: float, ascii_names: bool) -> Iterator[Dict[str, list]]:
+    rng = np.random.default_rng(seed)
+    done = 0
+    while done < rows:
+        n = min(chunk_size, rows - done)
+        yield generate_chunk(rng, start_code + done, n, missing, dirty_rate, ascii_names)
+        done += n
+
+
+# ---------- Writers ----------
+
+def _student_table():
+    """Bảng students theo models.py chưa có UNIQUE/index (tạo sau khi nạp); classes cùng MetaData cho khóa ngoại"""
+    sys.path.insert(0, PROJ_ROOT)
+    from sqlalchemy import MetaData, UniqueConstraint
+    from backend.app import models
+
+    md = MetaData()
+    models.Class.__table__.to_metadata(md)  # class_id REFERENCES classes ON DELETE SET NULL
+    table = models.Student.__table__.to_metadata(md)
+    unique_cols = [c.name for c in table.columns if c.unique]
+    for con in list(table.constraints):
+        if isinstance(con, UniqueConstraint):
+            table.constraints.discard(con)
+            unique_cols.extend(c.name for c in con.columns)
+    for col in table.columns:
+        col.unique = None
+    indexes = list(table.indexes)
+    table.indexes.clear()
+    return table, indexes, sorted(set(unique_cols))
+
+
+# Bảng suy ra từ students bằng trigger (lịch sử điểm, index tìm kiếm): --replace xóa cùng students để không còn
+# dòng của id cũ, rồi init_db tạo lại bảng + trigger (kèm mốc điểm ban đầu) và search.catch_up dựng lại index
+DERIVED_TABLES = ("grade_events", "grade_daily", "search_terms", "search_term_trigrams", "search_postings",
+                  "search_docs", "search_dirty")
+
+
+def _rebuild_derived(db_path: str):
+    from sqlalchemy import create_engine
+    from backend.app.db import init_db
+    from backend.app.search import catch_up
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    try:
+        init_db(engine)
+        catch_up(engine)
+    finally:
+        engine.dispose()
+
+
+def write_sqlite(db_path: str, chunks: Iterator[Dict[str, list]], replace: bool) -> int:
+    from sqlalchemy import create_engine
+    from sqlalchemy.schema import CreateIndex, CreateTable
+
+    table, indexes, unique_cols = _student_table()
+    engine = create_engine(f"sqlite:///{db_path}")
+    dialect = engine.dialect
+    engine.dispose()
+
+    con = sqlite3.connect(db_path, isolation_level=None)
+    con.execute("PRAGMA journal_mode=OFF")
+    con.execute("PRAGMA synchronous=OFF")
+    con.execute("PRAGMA cache_size=-200000")
+    exists = con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='students'").fetchone()
+
+    con.execute("BEGIN")
+    derived = []
+    if exists and replace:
+        derived = [r[0] for r in con.execute(
+            f"SELECT name FROM sqlite_master WHERE type='table' AND name IN ({', '.join('?' * len(DERIVED_TABLES))})",
+            DERIVED_TABLES)]
+        for name in ["students"] + derived:  # trigger trên các bảng này bị xóa theo
+            con.execute(f"DROP TABLE {name}")
+        exists = None
+    dropped = []
+    if exists:
+        # Append: bỏ các index thường, giữ ràng buộc UNIQUE sẵn có
+        dropped = [r[0] for r in con.execute(
+            "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='students' AND sql IS NOT NULL")]
+        for name in dropped:
+            con.execute(f"DROP INDEX {name}")
+    else:
+        classes = table.metadata.tables["classes"]  # bảng cha của khóa ngoại, file mới chưa có
+        con.execute(str(CreateTable(classes, if_not_exists=True).compile(dialect=dialect)))
+        for idx in classes.indexes:
+            con.execute(str(CreateIndex(idx, if_not_exists=True).compile(dialect=dialect)))
+        con.execute(str(CreateTable(table).compile(dialect=dialect)))
+
+    sql = f"INSERT INTO students ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+    total = 0
+    for data in chunks:
+        con.executemany(sql, zip(*(data[c] for c in COLUMNS)))
+        total += len(data["student_code"])
+
+    # Tạo index sau khi nạp xong
+    for idx in indexes:
+        con.execute(str(CreateIndex(idx, if_not_exists=True).compile(dialect=dialect)))
+    for col in unique_cols:
+        if not exists or f"ix_students_{col}" in dropped:
+            con.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS ix_students_{col} ON students ({col})")
+    con.execute("COMMIT")
+    con.execute("ANALYZE")
+    con.close()
+    if derived:
+        _rebuild_derived(db_path)
+    return total
+
+
+def write_jsonl(path: str, chunks: Iterator[Dict[str, list]]) -> int:
+    total = 0
+    dumps = json.dumps
+    with open(path, "w", encoding="utf-8") as f:
+        for data in chunks:
+            cols = [data[c] for c in COLUMNS]
+            f.writelines(dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + "\n" for row in zip(*cols))
+            total += len(data["student_code"])
+    return total
+
+
+def write_parquet(path: str, chunks: Iterator[Dict[str, list]]) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Cần cài pyarrow để ghi Parquet: pip install pyarrow")
+    writer = None
+    total = 0
+    try:
+        for data in chunks:
+            batch = pa.table({c: data[c] for c in COLUMNS})
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema)
+            writer.write_table(batch)
+            total += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
+
+
+def _next_code(db_path: str) -> int:
+    if not os.path.exists(db_path):
+        return 1_000_000
+    con = sqlite3.connect(db_path)
+    try:
+        row = con.execute("SELECT MAX(CAST(student_code AS INTEGER)) FROM students").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        con.close()
+    return max(1_000_000, (row[0] or 0) + 1) if row else 1_000_000
+
+
+def parse_missing(default_rate: Optional[float], overrides: List[str]) -> Dict[str, float]:
+    missing = dict(DEFAULT_MISSING)
+    if default_rate is not None:
+        missing = {c: default_rate for c in missing}
+    for item in overrides:
+        col, _, rate = item.partition("=")
+        if col not in missing:
+            raise SystemExit(f"Cột không hợp lệ cho --missing-field: {col}")
+        missing[col] = float(rate)
+    return missing
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Sinh dữ liệu học sinh tổng hợp")
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--db", default=None, help=f"SQLite đích (mặc định {DEFAULT_DB})")
+    ap.add_argument("--replace", action="store_true",
+                    help="xóa bảng students cũ (và lịch sử điểm, index tìm kiếm) trước khi nạp")
+    ap.add_argument("--jsonl", help="ghi ra file JSONL thay vì SQLite")
+    ap.add_argument("--parquet", help="ghi ra file Parquet thay vì SQLite")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--chunk-size", type=int, default=100_000)
+    ap.add_argument("--code-start", type=int, help="mã học sinh bắt đầu")
+    ap.add_argument("--missing", type=float, help="tỉ lệ thiếu chung cho mọi cột")
+    ap.add_argument("--missing-field", action="append", default=[], help="vd math_score=0.1")
+    ap.add_argument("--dirty-rate", type=float, default=0.01, help="tỉ lệ home_town viết sai chuẩn")
+    ap.add_argument("--ascii-names", action="store_true", help="họ tên không dấu")
+    args = ap.parse_args(argv)
+
+    missing = parse_missing(args.missing, args.missing_field)
+    db_path = args.db or DEFAULT_DB
+    if args.code_start is not None:
+        start = args.code_start
+    elif args.jsonl or args.parquet or args.replace:
+        start = 1_000_000
+    else:
+        start = _next_code(db_path)
+    chunks = iter_chunks(args.rows, args.chunk_size, start, args.seed,
+                         missing, args.dirty_rate, args.ascii_names)
+
+    t0 = time.perf_counter()
+    if args.jsonl:
+        target, total = args.jsonl, write_jsonl(args.jsonl, chunks)
+    elif args.parquet:
+        target, total = args.parquet, write_parquet(args.parquet, chunks)
+    else:
+        target, total = db_path, write_sqlite(db_path, chunks, args.replace)
+    elapsed = time.perf_counter() - t0
+    print(f"Generated {total} students -> {target} in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+load_test.py
+------------
+Load test cho Student API (asyncio, không cần dịch vụ ngoài).
+- Tạo một SQLite DB tạm, seed từ data/students_raw.jsonl (nhân bản theo --scale).
+- Khởi động `backend.app.main:app` bằng uvicorn trỏ vào DB tạm (DATABASE_URL).
+- Phát lại một mix request list/search/get/by-code/grades/login/statistics
+  với N kết nối keep-alive song song.
+- In kết quả JSON: throughput và p50/p95/p99 (ms) theo từng route.
+Usage:
+    python scripts/load_test.py --duration 20 --concurrency 32
+    python scripts/load_test.py --mix list=1,search=4,get=10,grades=2 --out bench.json
+    python scripts/load_test.py --url http://127.0.0.1:8000   # dùng server có sẵn
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROJ_ROOT = os.path.dirname(HERE)
+DATA_DIR = os.path.join(PROJ_ROOT, "data")
+RAW_JSONL = os.path.join(DATA_DIR, "students_raw.jsonl")
+
+DEFAULT_MIX = {
+    "list": 10,
+    "search": 15,
+    "get": 30,
+    "by_code": 20,
+    "grades": 10,
+    "login": 10,
+    "statistics": 5,
+}
+
+SEARCH_TERMS = ["Nguyen", "Tran", "an", "gmail", "1946", "Linh", "Pham"]
+
+
+# ---------- Seed DB ----------
+
+def _load_raw_students(path: str) -> List[Dict]:
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                rows.append(json.loads(line))
+    return rows
+
+
+def seed_database(db_path: str, scale: int = 1) -> List[Tuple[int, str]]:
+    """Tạo DB tạm với schema của backend, trả về danh sách (id, student_code)"""
+    import sqlite3
+    sys.path.insert(0, PROJ_ROOT)
+    from sqlalchemy import create_engine
+    from backend.app.db import Base
+    from backend.app import models  # noqa: F401  (đăng ký bảng vào metadata)
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    raw = _load_raw_students(RAW_JSONL)
+    cols = ["student_code", "first_name", "last_name", "email", "dob", "home_town",
+            "math_score", "literature_score", "english_score"]
+    rows = []
+    for copy in range(scale):
+        suffix = "" if copy == 0 else f"-{copy}"
+        for r in raw:
+            rec = dict(r)
+            rec["student_code"] = f"{r['student_code']}{suffix}"
+            if r.get("email") and suffix:
+                user, _, domain = r["email"].partition("@")
+                rec["email"] = f"{user}{suffix}@{domain}"
+            rows.append(tuple(rec.get(c) for c in cols))
+
+    con = sqlite3.connect(db_path)
+    with con:
+        con.executemany(
+            f"INSERT INTO students ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+            rows,
+        )
+    keys = con.execute("SELECT id, student_code FROM students").fetchall()
+    con.close()
+    return keys
+
+
+# ---------- Server ----------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path: str, port: int, workers: int = 1, extra_env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", **(extra_env or {}))
+    cmd = [sys.executable, "-m", "uvicorn", "backend.app.main:app",
+           "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+           "--workers", str(workers)]
+    proc = subprocess.Popen(cmd, cwd=PROJ_ROOT, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn exited early")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not start in 30s")
+
+
+# ---------- HTTP client (keep-alive, HTTP/1.1) ----------
+
+class HttpConnection:
+    """Kết nối HTTP/1.1 keep-alive tối giản trên asyncio streams"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, body: Optional[dict] = None,
+                      headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        if self.writer is None:
+            await self._connect()
+        payload = json.dumps(body).encode() if body is not None else b""
+        head = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+        )
+        if body is not None:
+            head += "Content-Type: application/json\r\n"
+        for name, value in (headers or {}).items():
+            head += f"{name}: {value}\r\n"
+        self.writer.write(head.encode() + b"\r\n" + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            await self.close()
+            raise ConnectionError("server closed connection")
+        status = int(status_line.split()[1])
+        length, chunked, close = 0, False, False
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name, value = name.strip().lower(), value.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "transfer-encoding" and "chunked" in value:
+                chunked = True
+            elif name == "connection" and value == "close":
+                close = True
+        if chunked:
+            data = b""
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                data += chunk[:-2]
+        else:
+            data = await self.reader.readexactly(length) if length else b""
+        if close:
+            await self.close()
+        return status, data
+
+
+# ---------- Workload ----------
+
+def build_request(op: str, keys: List[Tuple[int, str]], rnd: random.Random):
+    """Trả về (method, path, body) cho một loại request"""
+    sid, code = rnd.choice(keys)
+    if op == "list":
+        return "GET", f"/students?limit=100&skip={rnd.randrange(0, max(1, len(keys) - 100))}", None
+    if op == "search":
+        return "GET", f"/students?search={rnd.choice(SEARCH_TERMS)}", None
+    if op == "get":
+        return "GET", f"/students/{sid}", None
+    if op == "by_code":
+        return "GET", f"/students/by-code/{code}", None
+    if op == "grades":
+        grades = {"math_score": round(rnd.uniform(0, 10), 1),
+                  "english_score": round(rnd.uniform(0, 10), 1)}
+        return "PATCH", f"/students/by-code/{code}/grades", grades
+    if op == "login":
+        return "POST", "/students/login", {"username": code, "password": "x"}
+    if op == "statistics":
+        return "GET", "/students/statistics", None
+    raise ValueError(f"unknown op: {op}")
+
+
+async def _worker(conn: HttpConnection, ops: List[str], weights: List[int],
+                  keys, deadline: float, results: Dict[str, List[float]],
+                  errors: Dict[str, int], seed: int):
+    rnd = random.Random(seed)
+    while time.perf_counter() < deadline:
+        op = rnd.choices(ops, weights)[0]
+        method, path, body = build_request(op, keys, rnd)
+        t0 = time.perf_counter()
+        try:
+            status, _ = await conn.request(method, path, body)
+            ok = status < 400
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+            await conn.close()
+            ok = False
+        elapsed = (time.perf_counter() - t0) * 1000
+        if ok:
+            results.setdefault(op, []).append(elapsed)
+        else:
+            errors[op] = errors.get(op, 0) + 1
+    await conn.close()
+
+
+def _percentile(sorted_vals: List[float], pct: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, int(round(pct / 100 * len(sorted_vals) + 0.5)) - 1))
+    return sorted_vals[k]
+
+
+def summarize(results: Dict[str, List[float]], errors: Dict[str, int], duration: float) -> Dict:
+    routes = {}
+    total = 0
+    for op in sorted(set(results) | set(errors)):
+        lat = sorted(results.get(op, []))
+        total += len(lat)
+        routes[op] = {
+            "requests": len(lat),
+            "errors": errors.get(op, 0),
+            "rps": round(len(lat) / duration, 1),
+            "p50_ms": round(_percentile(lat, 50), 2),
+            "p95_ms": round(_percentile(lat, 95), 2),
+            "p99_ms": round(_percentile(lat, 99), 2),
+            "max_ms": round(lat[-1], 2) if lat else 0.0,
+        }
+    return {
+        "duration_s": round(duration, 2),
+        "total_requests": total,
+        "total_errors": sum(errors.values()),
+        "throughput_rps": round(total / duration, 1),
+        "routes": routes,
+    }
+
+
+async def run_load(base_url: str, keys, mix: Dict[str, int], concurrency: int,
+                   duration: float, seed: int = 0) -> Dict:
+    parts = urlsplit(base_url)
+    ops = [op for op, w in mix.items() if w > 0]
+    weights = [mix[op] for op in ops]
+    results: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*[
+        _worker(HttpConnection(parts.hostname, parts.port or 80), ops, weights,
+                keys, deadline, results, errors, seed + i)
+        for i in range(concurrency)
+    ])
+    return summarize(results, errors, time.perf_counter() - start)
+
+
+def parse_mix(text: Optional[str]) -> Dict[str, int]:
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        op, _, weight = part.partition("=")
+        op = op.strip()
+        if op not in DEFAULT_MIX:
+            raise SystemExit(f"Route không hợp lệ trong --mix: {op} (hỗ trợ: {', '.join(DEFAULT_MIX)})")
+        mix[op] = int(weight or 1)
+    return mix
+
+
+def _fetch_keys(base_url: str) -> List[Tuple[int, str]]:
+    import requests
+    keys: List[Tuple[int, str]] = []
+    while len(keys) < 100000:  # GET /students giới hạn limit <= 1000: lấy theo trang
+        r = requests.get(f"{base_url}/students", timeout=60,
+                         params={"skip": len(keys), "limit": 1000, "fields": "id,student_code"})
+        r.raise_for_status()
+        batch = r.json()
+        keys += [(s["id"], s["student_code"]) for s in batch]
+        if len(batch) < 1000:
+            break
+    return keys
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Load test cho Student API")
+    ap.add_argument("--duration", type=float, default=15, help="thời gian chạy (giây)")
+    ap.add_argument("--concurrency", type=int, default=16, help="số kết nối song song")
+    ap.add_argument("--mix", help="trọng số route, vd list=10,get=30,grades=5")
+    ap.add_argument("--scale", type=int, default=10, help="nhân bản dữ liệu seed N lần")
+    ap.add_argument("--workers", type=int, default=1, help="số worker uvicorn")
+    ap.add_argument("--url", help="dùng server có sẵn thay vì tự khởi động")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="ghi kết quả JSON ra file")
+    args = ap.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    proc = None
+    tmpdir = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+            keys = _fetch_keys(base_url)
+        else:
+            tmpdir = tempfile.TemporaryDirectory(prefix="loadtest-")
+            db_path = os.path.join(tmpdir.name, "students.db")
+            keys = seed_database(db_path, args.scale)
+            port = _free_port()
+            proc = start_server(db_path, port, args.workers)
+            base_url = f"http://127.0.0.1:{port}"
+        if not keys:
+            raise SystemExit("Không có dữ liệu học sinh để chạy load test")
+
+        report = asyncio.run(run_load(base_url, keys, mix, args.concurrency, args.duration, args.seed))
+        report.update({"concurrency": args.concurrency, "mix": mix, "rows": len(keys)})
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+    out = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(out + "\n")
+    print(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+tenant_stress.py
+----------------
+Kiểm thử đồng thời nhiều tenant (mỗi trường một SQLite riêng).
+- Khởi động API với TENANT_DATA_DIR tạm và MAX_OPEN_TENANTS nhỏ hơn số tenant
+  (để LRU phải đóng/mở engine liên tục).
+- Mỗi tenant: tạo N học sinh, sửa điểm, đọc lại danh sách — tất cả chạy song song.
+- Kiểm tra cô lập dữ liệu: tenant chỉ thấy học sinh của mình, điểm đã sửa được lưu.
+- Một nửa tenant dùng header X-Tenant-ID, nửa còn lại dùng tiền tố /t/{tenant}.
+Usage:
+    python scripts/tenant_stress.py --tenants 300 --students 5 --max-open 32
+Exit code 1 nếu có lỗi hoặc dữ liệu lẫn giữa các tenant.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from load_test import HttpConnection, _free_port, start_server  # noqa: E402
+
+
+async def run_tenant(port: int, tenant: str, n_students: int, use_prefix: bool) -> list:
+    """Chạy kịch bản cho một tenant, trả về danh sách lỗi"""
+    conn = HttpConnection("127.0.0.1", port)
+    prefix = f"/t/{tenant}" if use_prefix else ""
+    headers = None if use_prefix else {"X-Tenant-ID": tenant}
+    errors = []
+    try:
+        for i in range(n_students):
+            code = f"{tenant}-{i}"
+            status, body = await conn.request("POST", f"{prefix}/students", {
+                "student_code": code, "first_name": tenant, "last_name": str(i),
+                "email": f"{code}@example.com", "math_score": 5.0,
+            }, headers)
+            if status != 201:
+                errors.append(f"{tenant}: create {code} -> {status} {body[:120]!r}")
+        for i in range(n_students):
+            status, body = await conn.request(
+                "PATCH", f"{prefix}/students/by-code/{tenant}-{i}/grades", {"math_score": 9.0}, headers)
+            if status != 200:
+                errors.append(f"{tenant}: grades -> {status} {body[:120]!r}")
+        status, body = await conn.request("GET", f"{prefix}/students?limit=1000", None, headers)
+        if status != 200:
+            errors.append(f"{tenant}: list -> {status}")
+        else:
+            rows = json.loads(body)
+            if len(rows) != n_students or any(r["first_name"] != tenant for r in rows):
+                errors.append(f"{tenant}: expected {n_students} own rows, got {len(rows)}")
+            if any(r["math_score"] != 9.0 for r in rows):
+                errors.append(f"{tenant}: grade update lost")
+    except Exception as e:
+        errors.append(f"{tenant}: {type(e).__name__}: {e}")
+    finally:
+        await conn.close()
+    return errors
+
+
+async def run_all(port: int, n_tenants: int, n_students: int) -> list:
+    results = await asyncio.gather(*[
+        run_tenant(port, f"school-{i:04d}", n_students, use_prefix=(i % 2 == 1))
+        for i in range(n_tenants)
+    ])
+    return [e for errs in results for e in errs]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Stress test multi-tenant storage")
+    ap.add_argument("--tenants", type=int, default=300)
+    ap.add_argument("--students", type=int, default=5)
+    ap.add_argument("--max-open", type=int, default=32, help="MAX_OPEN_TENANTS của server")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="tenants-") as tmpdir:
+        port = _free_port()
+        proc = start_server(os.path.join(tmpdir, "default.db"), port, extra_env={
+            "TENANT_DATA_DIR": os.path.join(tmpdir, "tenants"),
+            "MAX_OPEN_TENANTS": str(args.max_open),
+        })
+        try:
+            t0 = time.perf_counter()
+            errors = asyncio.run(run_all(port, args.tenants, args.students))
+            elapsed = time.perf_counter() - t0
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+        n_files = len(os.listdir(os.path.join(tmpdir, "tenants")))
+
+    total_requests = args.tenants * (2 * args.students + 1)
+    print(json.dumps({
+        "tenants": args.tenants, "tenant_files": n_files, "requests": total_requests,
+        "elapsed_s": round(elapsed, 2), "rps": round(total_requests / elapsed, 1),
+        "errors": len(errors),
+    }, indent=2))
+    if errors or n_files != args.tenants:
+        for line in errors[:20]:
+            print(" -", line)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()